@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Content-addressed blob store for template archives.
+
+Most of every template archive is the same reference files (e.g. the
+vite-reference UI components). Instead of repeating them in each zip, this
+packaging mode writes every distinct file once, keyed by its SHA-256, plus a
+small per-template manifest mapping paths to blob hashes:
+
+    <store>/blobs/<aa>/<sha256>          raw file contents, written once
+    <store>/manifests/<template>.json    {"name", "files": [{"path", "sha256", "size", "mode"}]}
+
+Consumers fetch a manifest and only the blobs they do not already have, then
+rebuild the tree with `materialize`. The store can be a local directory or an
+http(s) base URL (e.g. the public R2 bucket).
+
+    python3 blob_store.py publish build/vite-cfagents-runner --store blobs/
+    python3 blob_store.py materialize vite-cfagents-runner ./out --store blobs/ --cache ~/.cache/vibesdk-blobs
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import stat
+import sys
+import threading
+import urllib.request
+from pathlib import Path
+
+from create_zip import iter_archive_files
+
+MANIFEST_VERSION = 1
+
+
+def blob_relpath(digest):
+    """Relative path of a blob inside the store (two-character fan-out directory)"""
+    return f"blobs/{digest[:2]}/{digest}"
+
+
+def write_atomic(path, data):
+    """Write bytes to path via a temporary file and rename"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per thread too: deploy_pipeline writes from a thread pool
+    tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def publish_tree(source_dir, store_dir, name=None, exclude_patterns=None):
+    """
+    Add a template tree to the blob store and write its manifest.
+
+    Blobs already present in the store are not rewritten, so publishing many
+    templates that share a reference stores each shared file once.
+
+    Args:
+        source_dir: Template directory to publish
+        store_dir: Blob store root
+        name: Template name (defaults to the directory name)
+        exclude_patterns: Archive exclusion patterns (defaults to create_zip's)
+
+    Returns:
+        Tuple of (manifest dict, bytes of new blobs written)
+    """
+    source_path = Path(source_dir)
+    store_path = Path(store_dir)
+    name = name or source_path.name
+
+    entries = []
+    new_bytes = 0
+    for file_path, arc_path in sorted(iter_archive_files(source_path, exclude_patterns), key=lambda item: item[1].as_posix()):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = store_path / blob_relpath(digest)
+        if not blob_path.exists():
+            write_atomic(blob_path, data)
+            new_bytes += len(data)
+        entries.append({
+            "path": arc_path.as_posix(),
+            "sha256": digest,
+            "size": len(data),
+            "mode": stat.S_IMODE(os.stat(file_path).st_mode),
+        })
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "name": name,
+        "files": entries,
+    }
+    write_atomic(store_path / "manifests" / f"{name}.json",
+                 json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8') + b'\n')
+    return manifest, new_bytes
+
+
+def _is_url(location):
+    return str(location).startswith(('http://', 'https://'))
+
+
+def _read(store, relpath):
+    """Read a file from a local store directory or an http(s) base URL"""
+    if _is_url(store):
+        with urllib.request.urlopen(f"{str(store).rstrip('/')}/{relpath}") as response:
+            return response.read()
+    with open(Path(store) / relpath, 'rb') as f:
+        return f.read()
+
+
+def load_manifest(name, store):
+    """Load a template manifest from the store"""
+    data = json.loads(_read(store, f"manifests/{name}.json").decode('utf-8'))
+    if data.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version: {data.get('version')}")
+    return data
+
+
+def fetch_blob(digest, store, cache_dir=None):
+    """
+    Return blob contents, consulting a local cache before the store.
+
+    Contents are verified against the digest; a corrupt cached copy is refetched.
+    """
+    cache_path = Path(cache_dir) / blob_relpath(digest) if cache_dir else None
+    if cache_path is not None and cache_path.exists():
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() == digest:
+            return data
+    data = _read(store, blob_relpath(digest))
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise ValueError(f"Blob {digest} failed integrity check")
+    if cache_path is not None:
+        write_atomic(cache_path, data)
+    return data
+
+
+def materialize(name, store, dest_dir, cache_dir=None):
+    """
+    Rebuild a template tree from its manifest and blobs.
+
+    Args:
+        name: Template name
+        store: Blob store directory or http(s) base URL
+        dest_dir: Directory to write the template into
+        cache_dir: Optional local blob cache shared across templates
+
+    Returns:
+        Number of files written
+    """
+    manifest = load_manifest(name, store)
+    dest_path = Path(dest_dir)
+    for entry in manifest["files"]:
+        # Reject manifests that would write outside the destination
+        if os.path.isabs(entry["path"]) or '..' in Path(entry["path"]).parts:
+            raise ValueError(f"Unsafe path in manifest: {entry['path']}")
+        target = dest_path / entry["path"]
+        write_atomic(target, fetch_blob(entry["sha256"], store, cache_dir))
+        os.chmod(target, entry.get("mode", 0o644))
+    return len(manifest["files"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed blob store for template archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish_parser = subparsers.add_parser("publish", help="Add template directories to the store")
+    publish_parser.add_argument("sources", nargs="+", help="Template directories")
+    publish_parser.add_argument("--store", required=True, help="Blob store directory")
+
+    materialize_parser = subparsers.add_parser("materialize", help="Rebuild a template from the store")
+    materialize_parser.add_argument("name", help="Template name")
+    materialize_parser.add_argument("dest", help="Destination directory")
+    materialize_parser.add_argument("--store", required=True, help="Blob store directory or http(s) base URL")
+    materialize_parser.add_argument("--cache", help="Local blob cache directory")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        total_bytes = 0
+        stored_bytes = 0
+        for source in args.sources:
+            if not Path(source).is_dir():
+                print(f"Error: Source directory '{source}' does not exist", file=sys.stderr)
+                sys.exit(1)
+            manifest, new_bytes = publish_tree(source, args.store)
+            size = sum(e["size"] for e in manifest["files"])
+            total_bytes += size
+            stored_bytes += new_bytes
+            print(f"✅ Published {manifest['name']}: {len(manifest['files'])} files, {new_bytes} of {size} bytes new")
+        if total_bytes:
+            print(f"📦 Stored {stored_bytes} new bytes for {total_bytes} bytes of templates "
+                  f"({100 * (1 - stored_bytes / total_bytes):.1f}% deduplicated)")
+    else:
+        try:
+            count = materialize(args.name, args.store, args.dest, args.cache)
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to materialize {args.name}: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"✅ Materialized {args.name} ({count} files) into {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
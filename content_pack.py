@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Important-files content packs for templates.
+
+Each template lists the files an agent should read first in
+.important_files.json. Downloading and unzipping the whole archive just to
+read those is most of the cold-start time for a consumer picking up a
+template, so packaging also emits one small JSON file per template with their
+contents, resolved against exactly the files the zip contains:
+
+    {"version": 1, "name": "vite-cfagents-runner",
+     "files": [{"path", "sha256", "size", "content"[, "encoding": "base64"][, "donttouch": true]}],
+     "donttouch": ["package.json", "worker/index.ts", ...]}
+
+- .important_files.json entries are file paths, or directories ending in "/"
+  (every archived file under them)
+- files matched by .redacted_files.json are left out, even if important
+- files matched by .donttouch_files.json are flagged; "donttouch" lists every
+  archived path the template says not to modify, important or not
+
+Contents are UTF-8 text, or base64 for binary files; sha256 and size describe
+the original bytes. Files are sorted by path, so unchanged templates produce
+identical packs.
+
+    python3 content_pack.py build build/vite-cfagents-runner -o zips/vite-cfagents-runner.pack.json
+    python3 content_pack.py show https://<bucket>.r2.dev/vite-cfagents-runner.pack.json --extract ./out
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+
+from create_zip import iter_archive_files
+
+PACK_VERSION = 1
+
+IMPORTANT_FILES = ".important_files.json"
+DONTTOUCH_FILES = ".donttouch_files.json"
+REDACTED_FILES = ".redacted_files.json"
+
+
+def read_file_list(template_dir, list_name):
+    """
+    Read one of the template's file lists (a JSON array of paths).
+
+    Returns:
+        List of entries; empty if the template has no such list
+
+    Raises:
+        ValueError: if the list is not a JSON array of strings
+    """
+    try:
+        with open(Path(template_dir) / list_name, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return []
+    if not isinstance(entries, list) or not all(isinstance(e, str) for e in entries):
+        raise ValueError(f"{list_name} must be a JSON array of paths")
+    return entries
+
+
+def path_matcher(entries):
+    """Predicate for archive paths named by a file list (exact paths, or directory prefixes ending in "/")"""
+    exact = set()
+    prefixes = []
+    for entry in entries:
+        entry = entry.strip()
+        if entry.startswith('./'):
+            entry = entry[2:]
+        if entry.endswith('/'):
+            prefixes.append(entry)
+        elif entry:
+            exact.add(entry)
+    prefixes = tuple(prefixes)
+    return lambda path: path in exact or path.startswith(prefixes)
+
+
+def build_content_pack(source_dir, name=None, exclude_patterns=None):
+    """
+    Resolve a template's file lists against its archive contents.
+
+    Args:
+        source_dir: Template directory
+        name: Template name (defaults to the directory name)
+        exclude_patterns: Archive exclusion patterns (defaults to create_zip's)
+
+    Returns:
+        Content pack dictionary
+    """
+    source_path = Path(source_dir)
+    archived = sorted((arc_path.as_posix(), file_path)
+                      for file_path, arc_path in iter_archive_files(source_path, exclude_patterns))
+    is_important = path_matcher(read_file_list(source_path, IMPORTANT_FILES))
+    is_donttouch = path_matcher(read_file_list(source_path, DONTTOUCH_FILES))
+    is_redacted = path_matcher(read_file_list(source_path, REDACTED_FILES))
+
+    files = []
+    for path, file_path in archived:
+        if not is_important(path) or is_redacted(path):
+            continue
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        entry = {"path": path, "sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+        try:
+            entry["content"] = data.decode('utf-8')
+        except UnicodeDecodeError:
+            entry["content"] = base64.b64encode(data).decode('ascii')
+            entry["encoding"] = "base64"
+        if is_donttouch(path):
+            entry["donttouch"] = True
+        files.append(entry)
+    return {
+        "version": PACK_VERSION,
+        "name": name or source_path.name,
+        "files": files,
+        "donttouch": [path for path, _ in archived if is_donttouch(path)],
+    }
+
+
+def serialize_pack(pack):
+    """Compact UTF-8 JSON bytes of a content pack"""
+    return json.dumps(pack, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_content_pack(source_dir, pack_path, name=None, exclude_patterns=None):
+    """
+    Build a template's content pack and write it atomically.
+
+    Returns:
+        The written pack dictionary
+    """
+    from blob_store import write_atomic
+    from build_lock import read_stable
+
+    # Lock-free like create_zip: a rebuild swapped in while reading is read again
+    name = name or Path(source_dir).name
+    pack = read_stable(Path(source_dir), lambda path: build_content_pack(path, name, exclude_patterns))
+    write_atomic(pack_path, serialize_pack(pack))
+    return pack
+
+
+def file_bytes(entry):
+    """Original bytes of a pack file entry"""
+    if entry.get("encoding") == "base64":
+        return base64.b64decode(entry["content"])
+    return entry["content"].encode('utf-8')
+
+
+def load_content_pack(location):
+    """
+    Load and verify a content pack from a local path or http(s) URL.
+
+    Raises:
+        ValueError: for an unsupported version or a file failing its integrity check
+    """
+    if str(location).startswith(('http://', 'https://')):
+        import urllib.request
+
+        with urllib.request.urlopen(str(location)) as response:
+            data = response.read()
+    else:
+        with open(location, 'rb') as f:
+            data = f.read()
+    pack = json.loads(data.decode('utf-8'))
+    if pack.get("version") != PACK_VERSION:
+        raise ValueError(f"Unsupported content pack version: {pack.get('version')}")
+    for entry in pack["files"]:
+        content = file_bytes(entry)
+        if len(content) != entry["size"] or hashlib.sha256(content).hexdigest() != entry["sha256"]:
+            raise ValueError(f"{entry['path']} failed integrity check")
+    return pack
+
+
+def extract_pack(pack, dest_dir):
+    """Write a pack's files under dest_dir; returns the number of files written"""
+    from blob_store import write_atomic
+
+    dest_path = Path(dest_dir)
+    for entry in pack["files"]:
+        # Reject packs that would write outside the destination
+        if os.path.isabs(entry["path"]) or '..' in Path(entry["path"]).parts:
+            raise ValueError(f"Unsafe path in content pack: {entry['path']}")
+        write_atomic(dest_path / entry["path"], file_bytes(entry))
+    return len(pack["files"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Important-files content packs for templates")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Write the content pack of a template directory")
+    build_parser.add_argument("source", help="Template directory")
+    build_parser.add_argument("--output", "-o", required=True, help="Pack file to write")
+
+    show_parser = subparsers.add_parser("show", help="Verify a pack and list its files")
+    show_parser.add_argument("pack", help="Pack file or http(s) URL")
+    show_parser.add_argument("--extract", metavar="DIR", help="Also write the packed files under DIR")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "build":
+            if not Path(args.source).is_dir():
+                print(f"Error: Source directory '{args.source}' does not exist", file=sys.stderr)
+                sys.exit(1)
+            pack = write_content_pack(args.source, args.output)
+            print(f"✅ Wrote {args.output}: {len(pack['files'])} files, "
+                  f"{len(pack['donttouch'])} don't-touch paths ({os.path.getsize(args.output)}B)")
+        else:
+            pack = load_content_pack(args.pack)
+            for entry in pack["files"]:
+                flag = "  (don't touch)" if entry.get("donttouch") else ""
+                print(f"{entry['size']:>9}  {entry['path']}{flag}")
+            if args.extract:
+                count = extract_pack(pack, args.extract)
+                print(f"✅ Extracted {count} files into {args.extract}")
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,48 @@ Create a zip archive from a directory, compatible with unzip command.
 This script replaces the zip command for environments where it's not available.
 """
 
-import zipfile
+import argparse
 import os
 import sys
 from pathlib import Path
 
-def create_zip(source_dir, zip_path, exclude_patterns=None):
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+
+DEFAULT_EXCLUDE_PATTERNS = [
+    "node_modules/*", ".git/*", "*.log", ".DS_Store",
+    "dist/*", "build/*", ".next/*", "coverage/*",
+    ".nyc_output/*", "*.tgz", "*.tar.gz",
+    ".wrangler/*", ".dev.vars*", ".env.*"
+]
+
+def iter_archive_files(source_path, exclude_patterns=None):
+    """
+    Yield (file_path, arc_path) for every file that belongs in a template archive.
+    
+    Args:
+        source_path: Path to the source directory
+        exclude_patterns: List of patterns to exclude (defaults to DEFAULT_EXCLUDE_PATTERNS)
+    """
+    if exclude_patterns is None:
+        exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
+    
+    for root, dirs, files in os.walk(source_path):
+        # Convert to relative path from source directory
+        rel_root = Path(root).relative_to(source_path)
+        
+        # Filter directories and files based on exclusion patterns
+        dirs[:] = [d for d in dirs if not should_exclude(rel_root / d, exclude_patterns)]
+        files = [f for f in files if not should_exclude(rel_root / f, exclude_patterns)]
+        
+        for file in files:
+            file_path = Path(root) / file
+            arc_path = rel_root / file if str(rel_root) != '.' else Path(file)
+            yield file_path, arc_path
+
+# Timestamp for --deterministic archives (the earliest a zip can represent)
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+def create_zip(source_dir, zip_path, exclude_patterns=None, ranged=False, deterministic=False, with_tree=None):
     """
     Create a zip file from a directory with exclusion patterns.
     
@@ -17,38 +53,59 @@ def create_zip(source_dir, zip_path, exclude_patterns=None):
         source_dir: Path to the source directory
         zip_path: Path where the zip file will be created
         exclude_patterns: List of patterns to exclude (e.g., ["node_modules/*", ".git/*"])
+        ranged: Order entries for range requests, key files first (see range_zip.py)
+        deterministic: Sort entries and fix timestamps, so identical trees give identical archives
+        with_tree: Optional function called with the source path within the same stable read as
+            the archive, so what it builds describes exactly the archived tree; it is run again
+            if the tree is replaced meanwhile
     """
-    if exclude_patterns is None:
-        exclude_patterns = [
-            "node_modules/*", ".git/*", "*.log", ".DS_Store",
-            "dist/*", "build/*", ".next/*", "coverage/*",
-            ".nyc_output/*", "*.tgz", "*.tar.gz",
-            ".wrangler/*", ".dev.vars*", ".env.*"
-        ]
-    
+    # Imported here so `--help` and importers of iter_archive_files stay fast to start
+    import shutil
+    import zipfile
+
+    from build_lock import read_stable
+
     source_path = Path(source_dir)
     if not source_path.exists():
         print(f"Error: Source directory '{source_dir}' does not exist", file=sys.stderr)
         return False
     
-    try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
-            for root, dirs, files in os.walk(source_path):
-                # Convert to relative path from source directory
-                rel_root = Path(root).relative_to(source_path)
-                
-                # Filter directories and files based on exclusion patterns
-                dirs[:] = [d for d in dirs if not should_exclude(rel_root / d, exclude_patterns)]
-                files = [f for f in files if not should_exclude(rel_root / f, exclude_patterns)]
-                
-                for file in files:
-                    file_path = Path(root) / file
-                    arc_path = rel_root / file if str(rel_root) != '.' else Path(file)
+    # Written next to the destination and renamed into place, so concurrent
+    # readers of zip_path never see a partial archive
+    tmp_path = os.path.join(os.path.dirname(os.fspath(zip_path)), f".{os.path.basename(zip_path)}.tmp-{os.getpid()}")
+    
+    def write_archive(path):
+        entries = iter_archive_files(path, exclude_patterns)
+        if ranged:
+            from range_zip import order_entries
+            entries = order_entries(path, entries)
+        elif deterministic:
+            entries = sorted(entries, key=lambda entry: entry[1].as_posix())
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
+            for file_path, arc_path in entries:
+                if deterministic:
+                    info = zipfile.ZipInfo.from_file(file_path, arc_path)
+                    info.date_time = FIXED_DATE_TIME
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    # ZipFile.open() does not apply the archive's level to a caller's
+                    # ZipInfo; set it the way ZipFile.write() does
+                    info._compresslevel = zipf.compresslevel
+                    with open(file_path, 'rb') as src, zipf.open(info, 'w') as dest:
+                        shutil.copyfileobj(src, dest, 1024 * 1024)
+                else:
                     zipf.write(file_path, arc_path)
-        
+        if with_tree is not None:
+            with_tree(path)
+    
+    try:
+        # No lock needed: a rebuild swapped in mid-archive is detected and the archive rewritten
+        read_stable(source_path, write_archive)
+        os.replace(tmp_path, zip_path)
         return True
     except Exception as e:
         print(f"Error creating zip file: {e}", file=sys.stderr)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
 def should_exclude(path, exclude_patterns):
@@ -79,19 +136,64 @@ def should_exclude(path, exclude_patterns):
     return False
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 create_zip.py <source_directory> <output_zip_file>", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Create a zip archive from a directory, compatible with unzip command."
+    )
+    parser.add_argument("source_directory", help="Directory to archive")
+    parser.add_argument("output_zip_file", help="Zip file to create")
+    parser.add_argument(
+        "--blob-store",
+        metavar="DIR",
+        help="Also publish the tree into a content-addressed blob store (see blob_store.py)"
+    )
+    parser.add_argument(
+        "--delta-dir",
+        metavar="DIR",
+        help="Keep <zip>.manifest.json and write a delta from the previous version into DIR (see zip_delta.py)"
+    )
+    parser.add_argument(
+        "--content-pack",
+        metavar="PATH",
+        help="Also write the template's important-files content pack to PATH (see content_pack.py)"
+    )
+    parser.add_argument(
+        "--ranged",
+        action="store_true",
+        help="Put key files first and write a <zip>.index.json of entry offsets for range requests (see range_zip.py)"
+    )
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="Sort entries and fix timestamps so identical trees produce identical archives"
+    )
+    args = parser.parse_args()
     
-    source_dir = sys.argv[1]
-    zip_file = sys.argv[2]
+    source_dir = args.source_directory
+    zip_file = args.output_zip_file
     
     # Create parent directory if it doesn't exist
     zip_dir = os.path.dirname(zip_file)
     if zip_dir:
         os.makedirs(zip_dir, exist_ok=True)
     
-    if create_zip(source_dir, zip_file):
+    sidecars = {}
+    if args.delta_dir:
+        from zip_delta import build_manifest, load_manifest, write_manifest, create_delta
+        manifest_path = f"{zip_file}.manifest.json"
+        name = Path(zip_file).name[:-len('.zip')] if zip_file.endswith('.zip') else Path(zip_file).name
+        previous = load_manifest(manifest_path)
+    
+    def read_sidecars(path):
+        if args.blob_store:
+            from blob_store import publish_tree
+            # Blobs are content-addressed, so a repeated read only rewrites the manifest
+            sidecars["published"] = publish_tree(path, args.blob_store)
+        if args.delta_dir:
+            sidecars["manifest"] = build_manifest(path, name=name)
+            if previous is not None:
+                sidecars["delta"] = create_delta(previous, sidecars["manifest"], path, args.delta_dir)
+    
+    if create_zip(source_dir, zip_file, ranged=args.ranged, deterministic=args.deterministic, with_tree=read_sidecars):
         # Get file size for output
         size = os.path.getsize(zip_file)
         if size < 1024:
@@ -102,6 +204,27 @@ def main():
             size_str = f"{size // (1024 * 1024)}M"
         
         print(f"✅ Created {zip_file} ({size_str})")
+        
+        if args.ranged:
+            from range_zip import write_range_index
+            index = write_range_index(zip_file)
+            print(f"✅ Created range index {zip_file}.index.json ({len(index['entries'])} entries, "
+                  f"key files in the first {index['head_length']}B)")
+        
+        if args.blob_store:
+            manifest, new_bytes = sidecars["published"]
+            print(f"✅ Published {manifest['name']} to {args.blob_store} ({new_bytes} new blob bytes)")
+        
+        if args.content_pack:
+            from content_pack import write_content_pack
+            pack = write_content_pack(source_dir, args.content_pack)
+            print(f"✅ Created content pack {args.content_pack} ({len(pack['files'])} files, "
+                  f"{os.path.getsize(args.content_pack)}B)")
+        
+        if args.delta_dir:
+            if sidecars.get("delta") is not None:
+                print(f"✅ Created delta {sidecars['delta']} ({os.path.getsize(sidecars['delta'])}B)")
+            write_manifest(sidecars["manifest"], manifest_path)
         sys.exit(0)
     else:
         print(f"❌ Failed to create {zip_file}", file=sys.stderr)
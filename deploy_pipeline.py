@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Pipelined template deployment.
+
+Runs generate -> zip -> upload as an independent chain per template instead of
+in global phases, so one slow template no longer delays the others:
+
+- a template is zipped as soon as it has been generated, and its
+  important-files content pack (see content_pack.py) written alongside
+- its zip and pack are uploaded as soon as they exist (with --ranged-zips,
+  also the zip's range index; see range_zip.py)
+- with --deltas, the manifest of the published archive is fetched back
+  through the uploader (or read from the previous local run) and a delta
+  from it is uploaded under deltas/<template>/, followed by the new
+  manifest (see zip_delta.py)
+- the catalog is built from build/ and uploaded once every template is done
+
+CPU-bound stages (generation, compression) and I/O-bound stages (upload) run
+in separate thread pools with their own limits; zlib and file I/O release the
+GIL, so threads overlap well here.
+
+With --build-cache, templates whose inputs are unchanged are restored from a
+shared cache (see tools/build_cache.py), and so are their zips and catalog
+entries; fresh artifacts are pushed back for the next run.
+
+Uploaders are pluggable:
+    dir:<path>          copy objects into a local directory (testing)
+    http(s)://host/...  HTTP PUT each object under a base URL (stub servers)
+    s3:<bucket>         pooled S3-compatible API uploads (see s3_upload.py); zips are
+                        written deterministically so unchanged ones keep their ETag
+    wrangler:<bucket>   `wrangler r2 object put` per object (default: $R2_BUCKET_NAME)
+
+Usage:
+    python3 deploy_pipeline.py --clean --uploader wrangler:my-bucket
+    python3 deploy_pipeline.py -t vite-cfagents-runner --uploader dir:/tmp/r2
+    python3 deploy_pipeline.py --uploader dir:/tmp/r2 --build-cache dir:.build-cache
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+
+from build_lock import read_stable
+from generate_templates import TemplateGenerator, log_info, log_warn, log_error
+from generate_template_catalog import CatalogWriter, find_template_dirs, is_valid_template, process_template
+from content_pack import write_content_pack
+from create_zip import create_zip
+from range_zip import write_range_index
+from zip_delta import MANIFEST_VERSION, build_manifest, create_delta, load_manifest, write_manifest
+from s3_upload import S3Client, content_type_for
+
+
+class Uploader:
+    """Uploads a local file under an object key"""
+
+    # Uploaders that skip objects whose remote ETag matches need byte-identical zips for unchanged trees
+    skips_unchanged = False
+
+    def upload(self, local_path: Path, key: str) -> bool:
+        """Upload a file; returns False if the object was already up to date"""
+        raise NotImplementedError
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        """Contents of a published object, or None if it does not exist (or cannot be read back)"""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class DirectoryUploader(Uploader):
+    """Copies objects into a local directory (e.g. an NFS mount or a test fixture)"""
+
+    def __init__(self, dest_dir: Path):
+        self.dest_dir = Path(dest_dir)
+
+    def upload(self, local_path: Path, key: str) -> bool:
+        target = self.dest_dir / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        shutil.copyfile(local_path, tmp)
+        os.replace(tmp, target)
+        return True
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        try:
+            return (self.dest_dir / key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+
+class HttpPutUploader(Uploader):
+    """PUTs each object to <base_url>/<key>"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def upload(self, local_path: Path, key: str) -> bool:
+        with open(local_path, 'rb') as f:
+            data = f.read()
+        request = urllib.request.Request(f"{self.base_url}/{key}", data=data, method='PUT')
+        with urllib.request.urlopen(request) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"PUT {key} returned HTTP {response.status}")
+        return True
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/{key}") as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code in (403, 404):
+                return None
+            raise
+
+
+class WranglerUploader(Uploader):
+    """Uploads through `wrangler r2 object put` (one process per object)"""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    def upload(self, local_path: Path, key: str) -> bool:
+        proc = subprocess.run(
+            ["wrangler", "r2", "object", "put", f"{self.bucket}/{key}", f"--file={local_path}", "--remote"],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"wrangler exited with {proc.returncode}: {proc.stdout.strip()}")
+        return True
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        # wrangler does not tell a missing object from other failures; either way there is nothing to use
+        with tempfile.TemporaryDirectory(prefix="r2-get-") as tmp_dir:
+            target = Path(tmp_dir) / "object"
+            proc = subprocess.run(
+                ["wrangler", "r2", "object", "get", f"{self.bucket}/{key}", f"--file={target}", "--remote"],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            )
+            if proc.returncode != 0 or not target.exists():
+                return None
+            return target.read_bytes()
+
+
+class S3Uploader(Uploader):
+    """Uploads through the S3-compatible API over pooled connections, skipping unchanged objects"""
+
+    skips_unchanged = True
+
+    def __init__(self, client: S3Client):
+        self.client = client
+
+    def upload(self, local_path: Path, key: str) -> bool:
+        return self.client.upload_file(local_path, key, content_type=content_type_for(key))
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        return self.client.get_object(key)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+UPLOADER_FACTORIES: Dict[str, Callable[[str], Uploader]] = {
+    "dir": lambda arg: DirectoryUploader(Path(arg)),
+    "s3": lambda arg: S3Uploader(S3Client.from_env(arg)),
+    "wrangler": lambda arg: WranglerUploader(arg),
+}
+
+
+def make_uploader(spec: str) -> Uploader:
+    """
+    Create an uploader from a spec string.
+
+    Args:
+        spec: "dir:<path>", "s3:<bucket>", "wrangler:<bucket>", or an http(s) base URL
+
+    Returns:
+        Uploader instance
+
+    Raises:
+        ValueError: for an unknown spec or missing uploader configuration
+    """
+    if spec.startswith(('http://', 'https://')):
+        return HttpPutUploader(spec)
+    kind, _, arg = spec.partition(':')
+    factory = UPLOADER_FACTORIES.get(kind)
+    if factory is None or not arg:
+        raise ValueError(f"Unknown uploader spec: {spec}")
+    return factory(arg)
+
+
+# (published manifest or None, manifest of the archived tree, delta archive or None)
+DeltaResult = Tuple[Optional[Dict], Dict, Optional[Path]]
+
+
+class DeployPipeline:
+    """Per-template generate -> zip -> upload chains with a final catalog step"""
+
+    def __init__(self, generator: TemplateGenerator, uploader: Uploader, zips_dir: Path, catalog_file: Path,
+                 cpu_jobs: Optional[int] = None, io_jobs: int = 8, ranged: bool = False, deltas: bool = False):
+        self.generator = generator
+        self.uploader = uploader
+        self.zips_dir = zips_dir
+        self.catalog_file = catalog_file
+        self.ranged = ranged
+        self.deterministic = ranged or uploader.skips_unchanged
+        self.deltas = deltas
+        self.delta_paths: Dict[str, Path] = {}
+        self.cpu_pool = ThreadPoolExecutor(max_workers=cpu_jobs or os.cpu_count() or 4, thread_name_prefix="cpu")
+        self.io_pool = ThreadPoolExecutor(max_workers=io_jobs, thread_name_prefix="io")
+        self._pending = 0
+        self._done = threading.Condition()
+        self.failures: List[str] = []
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def _submit(self, pool: ThreadPoolExecutor, template_name: str, stage: str, fn: Callable[[], None],
+                then: Optional[Callable[[], None]] = None) -> None:
+        with self._done:
+            self._pending += 1
+
+        def run() -> None:
+            start = time.perf_counter()
+            fn()
+            self.timings.setdefault(template_name, {})[stage] = time.perf_counter() - start
+
+        def finished(future: Future) -> None:
+            error = future.exception()
+            if error is not None:
+                log_error(f"{stage} failed for {template_name}: {error}")
+                with self._done:
+                    self.failures.append(f"{stage} {template_name}")
+            elif then is not None:
+                then()
+            with self._done:
+                self._pending -= 1
+                self._done.notify_all()
+
+        pool.submit(run).add_done_callback(finished)
+
+    def _generate(self, template_name: str) -> None:
+        if not self.generator.generate_specific_template(template_name):
+            raise RuntimeError("generation failed")
+
+    def _zip(self, template_name: str) -> None:
+        template_dir = self.generator.build_dir / template_name
+        if not is_valid_template(template_dir):
+            log_warn(f"⏭️  Skipping {template_name} (not a valid template)")
+            return
+        zip_path = self.zips_dir / f"{template_name}.zip"
+        tmp_path = zip_path.with_name(f".{zip_path.name}.tmp-{os.getpid()}")
+        previous = self._previous_manifest(template_name) if self.deltas else None
+        delta: List[DeltaResult] = []
+
+        def read_delta(path: Path) -> None:
+            delta[:] = [self._build_delta(template_name, previous, path)]
+
+        cache = self.generator.build_cache
+        fingerprint = self.generator.fingerprints.get(template_name)
+        if cache is not None and fingerprint is not None:
+            data = cache.get_artifact(fingerprint, self._archive_artifact)
+            if data is not None and self._zip_intact(data):
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, zip_path)
+                log_info(f"✅ Restored {zip_path} from build cache ({len(data) // 1024}K)")
+                if self.deltas:
+                    # The cached archive was built from this fingerprint's tree, which is what build/ holds
+                    read_stable(template_dir, read_delta)
+                self._sidecars(template_name, template_dir, delta[0] if delta else None)
+                return
+        if not create_zip(template_dir, tmp_path, ranged=self.ranged, deterministic=self.deterministic,
+                          with_tree=read_delta if self.deltas else None):
+            raise RuntimeError("zip creation failed")
+        os.replace(tmp_path, zip_path)
+        log_info(f"✅ Created {zip_path} ({zip_path.stat().st_size // 1024}K)")
+        if cache is not None and fingerprint is not None:
+            cache.put_artifact(fingerprint, self._archive_artifact, zip_path.read_bytes())
+        self._sidecars(template_name, template_dir, delta[0] if delta else None)
+
+    @property
+    def _archive_artifact(self) -> str:
+        # Ranged and deterministic archives differ in entry order or timestamps, so they are cached separately
+        if self.ranged:
+            return "archive-ranged.zip"
+        return "archive-deterministic.zip" if self.deterministic else "archive.zip"
+
+    def _sidecars(self, template_name: str, template_dir: Path, delta: Optional[DeltaResult] = None) -> None:
+        self._pack(template_name, template_dir)
+        if self.ranged:
+            zip_path = self.zips_dir / f"{template_name}.zip"
+            index = write_range_index(zip_path)
+            log_info(f"✅ Created {zip_path.name}.index.json (key files in the first {index['head_length'] // 1024}K)")
+        if delta is not None:
+            self._delta(template_name, delta)
+
+    def _previous_manifest(self, template_name: str) -> Optional[Dict]:
+        """Manifest of the currently published archive: from the bucket, else from the last local run"""
+        manifest_key = f"{template_name}.zip.manifest.json"
+        try:
+            data = self.uploader.fetch(manifest_key)
+        except Exception as e:
+            log_warn(f"Could not fetch published {manifest_key}: {e}")
+            data = None
+        if data is not None:
+            try:
+                manifest = json.loads(data)
+                if manifest.get("version") == MANIFEST_VERSION:
+                    return manifest
+            except ValueError:
+                pass
+            log_warn(f"Ignoring unreadable published {manifest_key}")
+        return load_manifest(self.zips_dir / manifest_key)
+
+    def _build_delta(self, template_name: str, previous: Optional[Dict], path: Path) -> DeltaResult:
+        """Manifest of the tree at path and its delta from previous; runs within the archive's stable read"""
+        manifest = build_manifest(path, name=template_name)
+        delta_path = create_delta(previous, manifest, path, self.zips_dir / "deltas") if previous is not None else None
+        return previous, manifest, delta_path
+
+    def _delta(self, template_name: str, delta: DeltaResult) -> None:
+        previous, manifest, delta_path = delta
+        if previous is None:
+            log_info(f"⏭️  No published manifest for {template_name}; no delta")
+        elif delta_path is None:
+            log_info(f"⏭️  {template_name} unchanged since the published archive; no delta")
+        else:
+            self.delta_paths[template_name] = delta_path
+            log_info(f"✅ Created delta {delta_path.relative_to(self.zips_dir)} ({delta_path.stat().st_size // 1024}K)")
+        write_manifest(manifest, self.zips_dir / f"{template_name}.zip.manifest.json")
+
+    def _pack(self, template_name: str, template_dir: Path) -> None:
+        # Small enough to rebuild every time; lets consumers skip the zip for the key files
+        pack_path = self.zips_dir / f"{template_name}.pack.json"
+        pack = write_content_pack(template_dir, pack_path, template_name)
+        log_info(f"✅ Created {pack_path} ({len(pack['files'])} files, {pack_path.stat().st_size // 1024}K)")
+
+    @staticmethod
+    def _zip_intact(data: bytes) -> bool:
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                return zf.testzip() is None
+        except zipfile.BadZipFile:
+            return False
+
+    def _upload(self, template_name: str) -> None:
+        names = [f"{template_name}.zip", f"{template_name}.pack.json"]
+        if self.ranged:
+            names.append(f"{template_name}.zip.index.json")
+        if template_name in self.delta_paths:
+            names.append(self.delta_paths[template_name].relative_to(self.zips_dir).as_posix())
+        if self.deltas:
+            # Last, so the published manifest never describes an archive that is not up yet
+            names.append(f"{template_name}.zip.manifest.json")
+        for path in (self.zips_dir / name for name in names):
+            if path.exists():
+                key = path.relative_to(self.zips_dir).as_posix()
+                if self.uploader.upload(path, key):
+                    log_info(f"✅ Uploaded {key}")
+                else:
+                    log_info(f"⏭️  {key} unchanged, not uploaded")
+
+    def _schedule(self, template_name: str) -> None:
+        upload = lambda: self._submit(self.io_pool, template_name, "upload", lambda: self._upload(template_name))
+        zip_then_upload = lambda: self._submit(self.cpu_pool, template_name, "zip", lambda: self._zip(template_name), upload)
+        self._submit(self.cpu_pool, template_name, "generate", lambda: self._generate(template_name), zip_then_upload)
+
+    def _catalog_entry(self, template_dir: Path) -> Dict:
+        cache = self.generator.build_cache
+        fingerprint = self.generator.fingerprints.get(template_dir.name)
+        if cache is None or fingerprint is None:
+            return process_template(template_dir)
+        data = cache.get_artifact(fingerprint, "catalog.json")
+        if data is not None:
+            try:
+                return json.loads(data)
+            except ValueError as e:
+                log_warn(f"Ignoring corrupt cached catalog entry for {template_dir.name}: {e}")
+        entry = process_template(template_dir)
+        cache.put_artifact(fingerprint, "catalog.json", json.dumps(entry).encode())
+        return entry
+
+    def finalize_catalog(self) -> None:
+        """Build the catalog from every valid template in build/ and upload it"""
+        valid_dirs, _ = find_template_dirs(self.generator.build_dir)
+        with CatalogWriter(self.catalog_file, pretty=True) as catalog:
+            for template_dir in sorted(valid_dirs, key=lambda d: d.name):
+                catalog.write(self._catalog_entry(template_dir))
+        log_info(f"✅ Generated {self.catalog_file} ({catalog.count} templates)")
+        if self.uploader.upload(self.catalog_file, self.catalog_file.name):
+            log_info(f"✅ Uploaded {self.catalog_file.name}")
+        else:
+            log_info(f"⏭️  {self.catalog_file.name} unchanged, not uploaded")
+
+    def run(self, template_names: List[str]) -> bool:
+        """
+        Run every template's chain, then finalize the catalog.
+
+        The catalog is only uploaded when every chain succeeded, so consumers
+        never see entries whose archives failed to publish.
+
+        Returns:
+            True if everything succeeded
+        """
+        self.generator.build_dir.mkdir(parents=True, exist_ok=True)
+        self.zips_dir.mkdir(parents=True, exist_ok=True)
+        self.generator.collect_stale_staging()
+        try:
+            for name in template_names:
+                self._schedule(name)
+            with self._done:
+                self._done.wait_for(lambda: self._pending == 0)
+            if self.failures:
+                log_error(f"{len(self.failures)} stage(s) failed: {', '.join(sorted(self.failures))}")
+                log_error("Catalog not uploaded")
+                return False
+            self.finalize_catalog()
+            return True
+        finally:
+            self.cpu_pool.shutdown()
+            self.io_pool.shutdown()
+            self.uploader.close()
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Generate, zip and upload templates as per-template pipelines")
+    parser.add_argument("--root", "-r", default=".", help="Root directory containing reference/, definitions/ and build/")
+    parser.add_argument("--template", "-t", action="append", help="Template to deploy (repeatable; default: all definitions)")
+    parser.add_argument("--clean", "-c", action="store_true", help="Clean build directory before generation")
+    parser.add_argument("--uploader", "-u", help="Uploader spec: dir:<path>, s3:<bucket>, wrangler:<bucket> or an http(s) base URL "
+                                                 "(default: wrangler:$R2_BUCKET_NAME)")
+    parser.add_argument("--zips-dir", default="zips", help="Directory for zip archives (default: zips)")
+    parser.add_argument("--catalog", default="template_catalog.json", help="Catalog output file (default: template_catalog.json)")
+    parser.add_argument("--cpu-jobs", type=int, help="Concurrent generate/zip tasks (default: CPU count)")
+    parser.add_argument("--io-jobs", type=int, default=8, help="Concurrent uploads (default: 8)")
+    parser.add_argument("--ranged-zips", action="store_true",
+                        help="Deterministic zips ordered for range requests, with a <zip>.index.json sidecar (see range_zip.py)")
+    parser.add_argument("--deltas", action="store_true",
+                        help="Write and upload deltas/<template>/<base-tree-hash>.zip from the published archive manifest (see zip_delta.py)")
+    parser.add_argument("--build-cache", help="Shared build cache: dir:<path> or an http(s) base URL (see tools/build_cache.py)")
+    args = parser.parse_args()
+
+    root_dir = Path(args.root).resolve()
+    generator = TemplateGenerator(root_dir)
+    if args.build_cache:
+        from build_cache import make_build_cache
+
+        try:
+            generator.build_cache = make_build_cache(args.build_cache)
+        except ValueError as e:
+            log_error(str(e))
+            sys.exit(1)
+
+    uploader_spec = args.uploader
+    if uploader_spec is None:
+        bucket = os.environ.get("R2_BUCKET_NAME")
+        if not bucket:
+            log_error("No --uploader given and R2_BUCKET_NAME is not set")
+            sys.exit(1)
+        uploader_spec = f"wrangler:{bucket}"
+    try:
+        uploader = make_uploader(uploader_spec)
+    except ValueError as e:
+        log_error(str(e))
+        sys.exit(1)
+
+    if args.clean and generator.build_dir.exists():
+        log_info("Cleaning build directory...")
+        generator.clean_build_dir()
+
+    names = args.template or sorted(p.stem for p in generator.definitions_dir.glob("*.yaml"))
+    pipeline = DeployPipeline(
+        generator,
+        uploader,
+        zips_dir=(root_dir / args.zips_dir),
+        catalog_file=(root_dir / args.catalog),
+        cpu_jobs=args.cpu_jobs,
+        io_jobs=args.io_jobs,
+        ranged=args.ranged_zips,
+        deltas=args.deltas,
+    )
+    start = time.perf_counter()
+    ok = pipeline.run(names)
+    log_info(f"Pipeline finished in {time.perf_counter() - start:.2f}s")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
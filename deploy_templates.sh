@@ -4,138 +4,35 @@ set -euo pipefail
 
 echo "🚀 Starting template deployment process..."
 
-# 1) Generate templates into build/
-echo "🧱 Generating templates into build/..."
-python3 tools/generate_templates.py --clean
-echo "✅ Templates generated"
-
-# 2) Generate template catalog (generate_template_catalog.py now defaults to ./build)
-echo "📋 Generating template catalog..."
-python3 generate_template_catalog.py --output template_catalog.json --pretty
-echo "✅ Generated template catalog"
-
-# Create optimized zip files for templates
-echo "📦 Creating optimized zip files for templates..."
-
-# Create zips directory
-mkdir -p zips
-
-# Function to create fast-extracting zip files using Python
-create_template_zip() {
-  local template_dir="$1"
-  local template_name=$(basename "$template_dir")
-  local zip_file="zips/${template_name}.zip"
-  
-  echo "Creating zip for: $template_name"
-  
-  # Use Python script to create zip (compatible with environments without zip command)
-  if python3 create_zip.py "$template_dir" "$zip_file"; then
-    # Verify the zip file was created
-    if [ -f "$zip_file" ]; then
-      local size=$(du -h "$zip_file" | cut -f1)
-      echo "✅ Created $zip_file ($size)"
-    else
-      echo "❌ Failed to create $zip_file"
-      return 1
-    fi
-  else
-    echo "❌ Failed to create $zip_file using Python"
-    return 1
-  fi
-}
-
-# 3) Create zip for each valid template directory in build/ in parallel
-pids=()
-for dir in build/*/; do
-  # Skip non-directories and hidden directories
-  if [[ ! -d "$dir" || "$dir" == .* ]]; then
-    continue
-  fi
-  
-  dir_name=$(basename "$dir")
-  
-  # Skip non-template directories if any appear
-  if [[ "$dir_name" == ".git" || "$dir_name" == "node_modules" || "$dir_name" == ".github" ]]; then
-    continue
-  fi
-  
-  # Check if it's a valid template (has required files)
-  if [[ -f "$dir/package.json" && (-f "$dir/wrangler.jsonc" || -f "$dir/wrangler.toml") && -d "$dir/prompts" ]]; then
-    create_template_zip "$dir" &
-    pids+=($!)
-  else
-    echo "⏭️  Skipping $dir_name (not a valid template)"
-  fi
-done
+# Prefer the pooled S3-compatible uploader when R2 API credentials are
+# configured; fall back to one `wrangler r2 object put` per file otherwise.
+if [ -n "${R2_ACCESS_KEY_ID:-}" ] && [ -n "${R2_SECRET_ACCESS_KEY:-}" ]; then
+  echo "⚙️  Using S3-compatible API uploads"
+  uploader="s3:${R2_BUCKET_NAME}"
+else
+  # Verify Wrangler CLI is available
+  echo "⚙️  Verifying Wrangler CLI..."
+  wrangler --version
+  echo "✅ Wrangler CLI ready"
+  uploader="wrangler:${R2_BUCKET_NAME}"
+fi
 
-# Wait for all zip creation processes to complete
-echo "⏳ Waiting for all zip creation processes to complete..."
-for pid in "${pids[@]}"; do
-  wait "$pid"
-done
+# Generate, zip and upload each template as its own pipeline: a template is
+# zipped as soon as it is generated and uploaded as soon as its zip exists.
+# The catalog is built from build/ and uploaded once every template succeeded.
+echo "🧱📦🚀 Generating, zipping and uploading templates to R2 bucket: ${R2_BUCKET_NAME}..."
+# A shared build cache (dir:<path> or an http(s) base URL) restores templates
+# whose definition, reference and overlay did not change since a cached build.
+cache_args=()
+if [ -n "${TEMPLATE_BUILD_CACHE:-}" ]; then
+  echo "♻️  Using build cache: ${TEMPLATE_BUILD_CACHE}"
+  cache_args=(--build-cache "${TEMPLATE_BUILD_CACHE}")
+fi
+python3 deploy_pipeline.py --clean --deltas --uploader "${uploader}" ${cache_args[@]+"${cache_args[@]}"}
 
 echo "📦 All template zips created successfully"
 ls -la zips/
 
-# Verify Wrangler CLI is available
-echo "⚙️  Verifying Wrangler CLI..."
-wrangler --version
-echo "✅ Wrangler CLI ready"
-
-# Upload files to Cloudflare R2
-echo "🚀 Uploading files to Cloudflare R2..."
-
-# Function to upload a file to R2
-upload_to_r2() {
-  local file_path="$1"
-  local r2_key="$2"
-  local description="$3"
-  
-  echo "Uploading: $description"
-  if wrangler r2 object put "${R2_BUCKET_NAME}/$r2_key" --file="$file_path" --remote; then
-    echo "✅ Successfully uploaded $description"
-    return 0
-  else
-    echo "❌ Failed to upload $description"
-    return 1
-  fi
-}
-
-# Upload template catalog JSON and all zip files in parallel
-echo "📄📦 Uploading template catalog and zip files in parallel..."
-upload_pids=()
-failed_uploads=()
-
-# Start catalog upload in background
-upload_to_r2 "template_catalog.json" "template_catalog.json" "template_catalog.json" &
-upload_pids+=($!)
-
-# Start zip file uploads in background
-for zip_file in zips/*.zip; do
-  if [ -f "$zip_file" ]; then
-    filename=$(basename "$zip_file")
-    upload_to_r2 "$zip_file" "$filename" "$filename" &
-    upload_pids+=($!)
-  fi
-done
-
-# Wait for all uploads to complete and check for failures
-echo "⏳ Waiting for all uploads to complete..."
-for pid in "${upload_pids[@]}"; do
-  if ! wait "$pid"; then
-    failed_uploads+=("Upload process $pid failed")
-  fi
-done
-
-# Check if any uploads failed
-if [ ${#failed_uploads[@]} -gt 0 ]; then
-  echo "❌ Some uploads failed:"
-  for failure in "${failed_uploads[@]}"; do
-    echo "  - $failure"
-  done
-  exit 1
-fi
-
 echo "🎉 All files uploaded successfully to R2 bucket: ${R2_BUCKET_NAME}"
 
 # Skip verification as wrangler doesn't have a list command
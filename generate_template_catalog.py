@@ -9,13 +9,22 @@ A valid template must have:
 - prompts/ directory with selection.md and usage.md files
 """
 
+import contextlib
+import functools
 import json
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import argparse
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+
+from build_lock import read_stable
+
+# gzip, hashlib, brotli and the index/search modules are imported by the
+# options that use them, so a plain catalog run starts quickly
+
 
 class Colors:
     """ANSI color codes for terminal output"""
@@ -71,6 +80,119 @@ def is_valid_template(template_dir: Path) -> bool:
     return True
 
 
+# Framework detection patterns, checked in order; a dependency maps to the
+# first pattern it contains. Built once at import (duplicates removed, first
+# occurrence kept) instead of on every extract_frameworks call.
+FRAMEWORK_PATTERNS: Tuple[str, ...] = tuple(dict.fromkeys([
+    # Frontend Frameworks
+    "react", "next", "vue", "angular", "svelte", "nuxt", "astro", "remix", 
+    "solid-js", "preact", "lit", "stencil",
+    
+    # Backend Frameworks
+    "express", "fastify", "koa", "hono",
+    
+    # Build Tools & Bundlers
+    "vite", "webpack", "rollup", "parcel", "swc", "critters",
+    
+    # Cloudflare Services
+    "cloudflare", "workers", "wrangler", "durable-objects", "d1", "r2", 
+    "kv", "queues", "agents", "vectorize", "hyperdrive", "analytics",
+    "@cloudflare/workers-types", "@cloudflare/vite-plugin", "@opennextjs/cloudflare",
+    
+    # UI Libraries & Component Systems
+    "tailwind", "bootstrap", "material-ui", "@mui", "antd", "chakra-ui", 
+    "@radix-ui", "@headlessui", "shadcn", "@dnd-kit", "lucide-react",
+    
+    # Styling & Animation
+    "styled-components", "emotion", "sass", "less", "stylus", "framer-motion",
+    "tailwind-merge", "tailwindcss-animate", "class-variance-authority",
+    "tw-animate-css",
+    
+    # State Management
+    "redux", "zustand", "mobx", "recoil", "jotai", "valtio", "immer",
+    "@tanstack/react-query", "swr", "apollo", "relay",
+    
+    # Form Handling & Validation
+    "formik", "react-hook-form", "@hookform/resolvers", "zod", "yup", "joi",
+    
+    # Routing
+    "react-router", "react-router-dom", "@reach/router", "next/router",
+    
+    # Authentication
+    "next-auth", "auth0", "passport", "supabase", "firebase", "clerk",
+    
+    # Database & ORM
+    "prisma", "drizzle", "mongoose", "sequelize", "typeorm", "knex",
+    
+    # GraphQL
+    "apollo", "graphql", "relay", "@apollo/client", "urql",
+    
+    # tRPC
+    "trpc", "@trpc/client", "@trpc/server", "@trpc/react-query",
+    
+    # AI & Machine Learning
+    "openai", "langchain", "@ai-sdk", "vercel/ai", "anthropic", "cohere",
+    "@modelcontextprotocol", "mcp-client", "mcp-remote", "agents",
+    
+    # Real-time Communication
+    "socket.io", "pusher", "ably", "supabase-realtime",
+    
+    # Data Visualization
+    "d3", "chart.js", "recharts", "victory", "nivo", "plotly", "observable",
+    "react-flow", "embla-carousel",
+    
+    # Maps & Geolocation
+    "leaflet", "mapbox", "google-maps",
+    
+    # Utilities
+    "lodash", "ramda", "date-fns", "moment", "dayjs", "luxon", "clsx", "classnames",
+    "axios", "fetch", "ky", "got", "node-fetch",
+    
+    # Development Tools (excluding linting which are dev-only)
+    "typescript", "babel", "postcss", "autoprefixer",
+    
+    # Testing Frameworks
+    "jest", "vitest", "cypress", "playwright", "testing-library", "mocha", "jasmine",
+    
+    # Storybook
+    "storybook", "@storybook",
+    
+    # Security & Crypto
+    "jsonwebtoken", "bcrypt", "helmet", "cors", "crypto-js",
+    
+    # Email & Notifications
+    "nodemailer", "sendgrid", "mailgun", "resend",
+    
+    # Storage & File Handling
+    "multer", "sharp", "jimp", "canvas",
+    
+    # Deployment & DevOps
+    "docker", "kubernetes", "terraform", "serverless",
+    
+    # Monitoring & Analytics
+    "sentry", "datadog", "newrelic", "mixpanel", "amplitude",
+    
+    # UI Specific Components
+    "react-select", "react-day-picker", "react-resizable-panels", "react-hotkeys-hook",
+    "sonner", "vaul", "input-otp", "cmdk", "react-virtualized", "react-window",
+    
+    # Themes & Styling Systems
+    "next-themes", "@next/themes", "theme-ui",
+    
+    # Concurrency & Process Management
+    "concurrently", "pm2", "nodemon"
+]))
+
+
+@functools.lru_cache(maxsize=None)
+def match_framework(dependency: str) -> Optional[str]:
+    """First framework pattern contained in a lower-cased dependency name, or None"""
+    for pattern in FRAMEWORK_PATTERNS:
+        if pattern in dependency:
+            return pattern
+    return None
+
+
 def extract_frameworks(package_json_path: Path) -> List[str]:
     """
     Extract frameworks from package.json dependencies.
@@ -93,119 +215,111 @@ def extract_frameworks(package_json_path: Path) -> List[str]:
     dev_dependencies = package_data.get('devDependencies', {})
     all_deps = list(dependencies.keys()) + list(dev_dependencies.keys())
     
-    # Framework detection patterns
-    framework_patterns = [
-        # Frontend Frameworks
-        "react", "next", "vue", "angular", "svelte", "nuxt", "astro", "remix", 
-        "solid-js", "preact", "lit", "stencil",
-        
-        # Backend Frameworks
-        "express", "fastify", "koa", "hono",
-        
-        # Build Tools & Bundlers
-        "vite", "webpack", "rollup", "parcel", "swc", "critters",
-        
-        # Cloudflare Services
-        "cloudflare", "workers", "wrangler", "durable-objects", "d1", "r2", 
-        "kv", "queues", "agents", "vectorize", "hyperdrive", "analytics",
-        "@cloudflare/workers-types", "@cloudflare/vite-plugin", "@opennextjs/cloudflare",
-        
-        # UI Libraries & Component Systems
-        "tailwind", "bootstrap", "material-ui", "@mui", "antd", "chakra-ui", 
-        "@radix-ui", "@headlessui", "shadcn", "@dnd-kit", "lucide-react",
-        
-        # Styling & Animation
-        "styled-components", "emotion", "sass", "less", "stylus", "framer-motion",
-        "tailwind-merge", "tailwindcss-animate", "class-variance-authority",
-        "tw-animate-css",
-        
-        # State Management
-        "redux", "zustand", "mobx", "recoil", "jotai", "valtio", "immer",
-        "@tanstack/react-query", "swr", "apollo", "relay",
-        
-        # Form Handling & Validation
-        "formik", "react-hook-form", "@hookform/resolvers", "zod", "yup", "joi",
-        
-        # Routing
-        "react-router", "react-router-dom", "@reach/router", "next/router",
-        
-        # Authentication
-        "next-auth", "auth0", "passport", "supabase", "firebase", "clerk",
-        
-        # Database & ORM
-        "prisma", "drizzle", "mongoose", "sequelize", "typeorm", "knex",
-        
-        # GraphQL
-        "apollo", "graphql", "relay", "@apollo/client", "urql",
-        
-        # tRPC
-        "trpc", "@trpc/client", "@trpc/server", "@trpc/react-query",
-        
-        # AI & Machine Learning
-        "openai", "langchain", "@ai-sdk", "vercel/ai", "anthropic", "cohere",
-        "@modelcontextprotocol", "mcp-client", "mcp-remote", "agents",
-        
-        # Real-time Communication
-        "socket.io", "pusher", "ably", "supabase-realtime",
-        
-        # Data Visualization
-        "d3", "chart.js", "recharts", "victory", "nivo", "plotly", "observable",
-        "react-flow", "embla-carousel",
-        
-        # Maps & Geolocation
-        "leaflet", "mapbox", "google-maps",
-        
-        # Utilities
-        "lodash", "ramda", "date-fns", "moment", "dayjs", "luxon", "clsx", "classnames",
-        "axios", "fetch", "ky", "got", "node-fetch",
-        
-        # Development Tools (excluding linting which are dev-only)
-        "typescript", "babel", "postcss", "autoprefixer",
-        
-        # Testing Frameworks
-        "jest", "vitest", "cypress", "playwright", "testing-library", "mocha", "jasmine",
-        
-        # Storybook
-        "storybook", "@storybook",
-        
-        # Security & Crypto
-        "jsonwebtoken", "bcrypt", "helmet", "cors", "crypto-js",
-        
-        # Email & Notifications
-        "nodemailer", "sendgrid", "mailgun", "resend",
-        
-        # Storage & File Handling
-        "multer", "sharp", "jimp", "canvas",
-        
-        # Deployment & DevOps
-        "docker", "kubernetes", "terraform", "serverless",
-        
-        # Monitoring & Analytics
-        "sentry", "datadog", "newrelic", "mixpanel", "amplitude",
-        
-        # UI Specific Components
-        "react-select", "react-day-picker", "react-resizable-panels", "react-hotkeys-hook",
-        "sonner", "vaul", "input-otp", "cmdk", "react-virtualized", "react-window",
-        
-        # Themes & Styling Systems
-        "next-themes", "@next/themes", "theme-ui",
-        
-        # Concurrency & Process Management
-        "concurrently", "pm2", "nodemon"
-    ]
-    
     # Find matching frameworks
-    detected_frameworks = []
-    for dep in all_deps:
-        for pattern in framework_patterns:
-            if pattern in dep.lower():
-                if pattern not in detected_frameworks:
-                    detected_frameworks.append(pattern)
-                break
+    detected_frameworks = {match_framework(dep.lower()) for dep in all_deps}
+    detected_frameworks.discard(None)
     
     return sorted(detected_frameworks)
 
 
+# wrangler config key -> Cloudflare integration name (names follow tools/template_schema.py)
+WRANGLER_INTEGRATIONS = {
+    "durable_objects": "durable-objects",
+    "kv_namespaces": "kv",
+    "r2_buckets": "r2",
+    "d1_databases": "d1",
+    "queues": "queues",
+    "vectorize": "vectorize",
+    "hyperdrive": "hyperdrive",
+    "ai": "ai",
+    "containers": "containers",
+    "assets": "assets",
+}
+
+
+def strip_jsonc(text: str) -> str:
+    """
+    Strip // and /* */ comments and trailing commas from JSONC text.
+    
+    String literals are tracked so values such as "/api/*" are left intact.
+    
+    Args:
+        text: JSONC document
+        
+    Returns:
+        Plain JSON text
+    """
+    out: List[str] = []
+    i, n = 0, len(text)
+    in_string = False
+    while i < n:
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if c == '\\' and i + 1 < n:
+                out.append(text[i + 1])
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif text.startswith('//', i):
+            while i < n and text[i] != '\n':
+                i += 1
+            continue
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif c in '}]':
+            # Drop a trailing comma before the closing bracket
+            j = len(out) - 1
+            while j >= 0 and out[j] in ' \t\r\n':
+                j -= 1
+            if j >= 0 and out[j] == ',':
+                del out[j]
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def extract_integrations(template_dir: Path) -> List[str]:
+    """
+    Extract Cloudflare integrations from the template's wrangler configuration.
+    
+    Args:
+        template_dir: Path to the template directory
+        
+    Returns:
+        Sorted list of detected integrations
+    """
+    config: Dict[str, Any] = {}
+    jsonc_path = template_dir / "wrangler.jsonc"
+    toml_path = template_dir / "wrangler.toml"
+    try:
+        if jsonc_path.exists():
+            with open(jsonc_path, 'r', encoding='utf-8') as f:
+                config = json.loads(strip_jsonc(f.read()))
+        elif toml_path.exists():
+            import tomllib
+            with open(toml_path, 'rb') as f:
+                config = tomllib.load(f)
+    except Exception as e:
+        log_warn(f"Could not parse wrangler config in {template_dir}: {e}")
+        return []
+    
+    detected = set()
+    if config.get("main"):
+        detected.add("workers")
+    for key, integration in WRANGLER_INTEGRATIONS.items():
+        if config.get(key):
+            detected.add(integration)
+    return sorted(detected)
+
+
 def read_file_content(file_path: Path) -> str:
     """
     Read file content safely, handling encoding issues.
@@ -244,9 +358,12 @@ def process_template(template_dir: Path) -> Dict[str, Any]:
     Returns:
         Dictionary containing template information
     """
-    template_name = template_dir.name
-    log_info(f"Processing template: {template_name}")
-    
+    log_info(f"Processing template: {template_dir.name}")
+    # Lock-free: if a new build is swapped in while reading, read it again
+    return read_stable(template_dir, _read_template)
+
+
+def _read_template(template_dir: Path) -> Dict[str, Any]:
     # Extract frameworks from package.json
     frameworks = extract_frameworks(template_dir / "package.json")
     
@@ -256,7 +373,7 @@ def process_template(template_dir: Path) -> Dict[str, Any]:
     usage_content = read_file_content(prompts_dir / "usage.md")
     
     return {
-        "name": template_name,
+        "name": template_dir.name,
         "language": "typescript",  # Hardcoded as requested
         "frameworks": frameworks,
         "description": {
@@ -266,6 +383,348 @@ def process_template(template_dir: Path) -> Dict[str, Any]:
     }
 
 
+def find_template_dirs(scan_dir: Path) -> Tuple[List[Path], int]:
+    """
+    Find valid template directories directly under scan_dir.
+    
+    Hidden directories (including in-progress build staging directories) and
+    node_modules are not considered.
+    
+    Args:
+        scan_dir: Directory to scan
+        
+    Returns:
+        Tuple of (valid template directories in scan order, number skipped as invalid)
+    """
+    valid_dirs: List[Path] = []
+    skipped_count = 0
+    for item in scan_dir.iterdir():
+        # Skip non-directories and hidden/special directories
+        if not item.is_dir() or item.name.startswith('.') or item.name in ('node_modules',):
+            continue
+        
+        if is_valid_template(item):
+            log_info(f"✓ Valid template found: {item.name}")
+            valid_dirs.append(item)
+        else:
+            log_warn(f"✗ Skipping invalid template: {item.name}")
+            skipped_count += 1
+    return valid_dirs, skipped_count
+
+
+def serialize_json(data: Any, pretty: bool) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes exactly as they are written to disk.
+    
+    Args:
+        data: JSON-serializable data
+        pretty: Indent output when True
+        
+    Returns:
+        Encoded JSON document
+    """
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=None)
+def load_brotli():
+    """Return the optional brotli module (only needed for .br variants of --compress), or None"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def content_digests(data: bytes) -> Dict[str, Any]:
+    """
+    Compute the size and content hashes advertised for a catalog file.
+    
+    The etag is the hex MD5 of the bytes, which is what R2/S3 return as the
+    ETag for single-part uploads, so clients can send it in If-None-Match.
+    
+    Args:
+        data: File content
+        
+    Returns:
+        Dictionary with size, sha256 and etag
+    """
+    import hashlib
+    
+    return {
+        "size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "etag": hashlib.md5(data).hexdigest(),
+    }
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    # Concurrent catalog runs and readers only ever see complete files
+    tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_catalog_file(output_file: Path, data: bytes, compress: bool) -> Dict[str, Any]:
+    """
+    Write a catalog file and, optionally, precompressed .gz and .br variants.
+    
+    Gzip output uses a fixed mtime so unchanged content yields identical bytes
+    (and therefore identical ETags) across builds.
+    
+    Args:
+        output_file: Destination path
+        data: Uncompressed file content
+        compress: Also write precompressed variants when True
+        
+    Returns:
+        Mapping of encoding name to {"path", "size"} for the variants written
+    """
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(output_file, data)
+    
+    encodings: Dict[str, Any] = {}
+    if not compress:
+        return encodings
+    
+    gz_path = output_file.with_name(output_file.name + '.gz')
+    import gzip
+
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    _write_atomic(gz_path, gz_data)
+    encodings["gzip"] = {"path": gz_path.name, "size": len(gz_data)}
+    
+    brotli = load_brotli()
+    if brotli is not None:
+        br_path = output_file.with_name(output_file.name + '.br')
+        br_data = brotli.compress(data, quality=11)
+        _write_atomic(br_path, br_data)
+        encodings["br"] = {"path": br_path.name, "size": len(br_data)}
+    
+    return encodings
+
+
+class _StreamSink:
+    """One output file, written to a temp file (compressed on the fly) and renamed into place"""
+
+    def __init__(self, path: Path, encoding: Optional[str] = None):
+        self.path = path
+        self.tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        self.encoding = encoding
+        self.size = 0
+        self._file = open(self.tmp_path, 'wb')
+        if encoding == "gzip":
+            import gzip
+            import zlib
+
+            # Same bytes as gzip.compress(data, compresslevel=9, mtime=0) in write_catalog_file
+            self._crc = 0
+            self._length = 0
+            self._compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._emit(gzip.compress(b'', compresslevel=9, mtime=0)[:10])
+        elif encoding == "br":
+            self._compressor = load_brotli().Compressor(quality=11)
+
+    def _emit(self, data: bytes) -> None:
+        self._file.write(data)
+        self.size += len(data)
+
+    def write(self, data: bytes) -> None:
+        if self.encoding == "gzip":
+            import zlib
+
+            self._crc = zlib.crc32(data, self._crc)
+            self._length += len(data)
+            self._emit(self._compressor.compress(data))
+        elif self.encoding == "br":
+            self._emit(self._compressor.process(data))
+        else:
+            self._emit(data)
+
+    def commit(self) -> None:
+        if self.encoding == "gzip":
+            import struct
+
+            self._emit(self._compressor.flush())
+            self._emit(struct.pack('<II', self._crc, self._length & 0xffffffff))
+        elif self.encoding == "br":
+            self._emit(self._compressor.finish())
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class CatalogWriter:
+    """
+    Stream catalog entries to disk as they are produced.
+    
+    Output is byte-identical to write_catalog_file(path, serialize_json(entries,
+    pretty), compress), or one compact entry per line with ndjson=True, but only
+    one entry is held in memory at a time. Every file (including .gz/.br
+    variants) is written to a temp file and renamed into place when the writer
+    is committed; leaving the with-block through an exception discards them.
+    
+    Usage:
+        with CatalogWriter(Path("template_catalog.json"), pretty=True) as catalog:
+            for template_dir in sorted(dirs):
+                catalog.write(process_template(template_dir))
+    """
+    
+    def __init__(self, output_file: Path, pretty: bool, compress: bool = False, ndjson: bool = False):
+        self.output_file = output_file
+        self.pretty = pretty
+        self.ndjson = ndjson
+        self.count = 0
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._sinks = [_StreamSink(output_file)]
+        if compress:
+            self._sinks.append(_StreamSink(output_file.with_name(output_file.name + '.gz'), "gzip"))
+            if load_brotli() is not None:
+                self._sinks.append(_StreamSink(output_file.with_name(output_file.name + '.br'), "br"))
+    
+    def _emit(self, data: bytes) -> None:
+        for sink in self._sinks:
+            sink.write(data)
+    
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Append one catalog entry"""
+        if self.ndjson:
+            self._emit(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n')
+        elif self.pretty:
+            # Strings never contain raw newlines, so indenting every line nests the entry
+            text = json.dumps(entry, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            self._emit(('[\n  ' if self.count == 0 else ',\n  ').encode('utf-8') + text.encode('utf-8'))
+        else:
+            self._emit((b'[' if self.count == 0 else b', ') + json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+        self.count += 1
+    
+    def commit(self) -> Dict[str, Any]:
+        """
+        Finish the document and rename every file into place.
+        
+        Returns:
+            Mapping of encoding name to {"path", "size"} for the compressed variants
+        """
+        if not self.ndjson:
+            if self.count == 0:
+                self._emit(b'[]')
+            else:
+                self._emit(b'\n]' if self.pretty else b']')
+        encodings: Dict[str, Any] = {}
+        for sink in self._sinks:
+            sink.commit()
+            if sink.encoding:
+                encodings[sink.encoding] = {"path": sink.path.name, "size": sink.size}
+        return encodings
+    
+    def abort(self) -> None:
+        """Discard the temp files"""
+        for sink in self._sinks:
+            sink.abort()
+    
+    def __enter__(self) -> 'CatalogWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+def write_pack_reference(template_dir: Path, packs_dir: Path) -> Dict[str, Any]:
+    """
+    Write a template's content pack (see content_pack.py) and describe it for its catalog entry.
+    
+    Args:
+        template_dir: Template directory
+        packs_dir: Directory receiving <name>.pack.json
+        
+    Returns:
+        Dictionary with the pack's path (relative to packs_dir), size, sha256 and etag
+    """
+    from content_pack import serialize_pack, write_content_pack
+    
+    pack_path = packs_dir / f"{template_dir.name}.pack.json"
+    pack = write_content_pack(template_dir, pack_path)
+    reference = {"path": pack_path.name}
+    reference.update(content_digests(serialize_pack(pack)))
+    return reference
+
+
+def write_shard(template: Dict[str, Any], output_dir: Path, pretty: bool, compress: bool) -> Dict[str, Any]:
+    """
+    Write one template's detail shard for the sharded layout.
+    
+    Args:
+        template: Catalog entry as produced by process_template
+        output_dir: Sharded catalog directory
+        pretty: Pretty-print JSON output
+        compress: Also write precompressed .gz/.br variants
+        
+    Returns:
+        The template's index.json entry
+    """
+    shard_rel = f"templates/{template['name']}.json"
+    shard_data = serialize_json(template, pretty)
+    encodings = write_catalog_file(output_dir / shard_rel, shard_data, compress)
+    
+    entry = {
+        "name": template["name"],
+        "language": template["language"],
+        "frameworks": template["frameworks"],
+        "path": shard_rel,
+    }
+    entry.update(content_digests(shard_data))
+    if encodings:
+        entry["encodings"] = {
+            name: {"path": f"templates/{info['path']}", "size": info["size"]}
+            for name, info in encodings.items()
+        }
+    return entry
+
+
+def write_shard_index(index_entries: List[Dict[str, Any]], output_dir: Path, pretty: bool, compress: bool) -> Path:
+    """Write index.json for shards written by write_shard; returns its path"""
+    index = {
+        "version": 1,
+        "templates": sorted(index_entries, key=lambda e: e["name"]),
+    }
+    index_path = output_dir / "index.json"
+    write_catalog_file(index_path, serialize_json(index, pretty), compress)
+    return index_path
+
+
+def write_sharded_catalog(templates: List[Dict[str, Any]], output_dir: Path, pretty: bool, compress: bool) -> Path:
+    """
+    Write the catalog as a small index plus one detail shard per template.
+    
+    Layout:
+        <output_dir>/index.json               name, language, frameworks, shard hashes and sizes
+        <output_dir>/templates/<name>.json    full catalog entry including prompt text
+    
+    Args:
+        templates: Catalog entries as produced by process_template
+        output_dir: Directory to write the layout into
+        pretty: Pretty-print JSON output
+        compress: Also write precompressed .gz/.br variants of every file
+        
+    Returns:
+        Path to the written index file
+    """
+    index_entries = [write_shard(template, output_dir, pretty, compress) for template in templates]
+    return write_shard_index(index_entries, output_dir, pretty, compress)
+
+
 def main() -> None:
     """Main function to generate template catalog"""
     parser = argparse.ArgumentParser(description="Generate Cloudflare template catalog")
@@ -287,6 +746,42 @@ def main() -> None:
         action="store_true",
         help="Pretty-print JSON output"
     )
+    parser.add_argument(
+        "--layout",
+        choices=["single", "sharded"],
+        default="single",
+        help="Catalog layout: one monolithic file (default) or an index plus per-template shards"
+    )
+    parser.add_argument(
+        "--shard-dir",
+        default="catalog",
+        help="Output directory for --layout sharded (default: catalog)"
+    )
+    parser.add_argument(
+        "--ndjson",
+        metavar="PATH",
+        help="Also write the catalog as newline-delimited JSON (one entry per line) to PATH"
+    )
+    parser.add_argument(
+        "--content-packs",
+        metavar="DIR",
+        help="Also write each template's important-files content pack to DIR/<name>.pack.json and reference it from its entry"
+    )
+    parser.add_argument(
+        "--framework-index",
+        metavar="PATH",
+        help="Also write a framework/integration -> templates inverted index to PATH"
+    )
+    parser.add_argument(
+        "--search-index",
+        metavar="PATH",
+        help="Also write a BM25 search index over selection/usage prompts to PATH (updated incrementally if it exists)"
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Also write precompressed .gz (and .br if the brotli module is installed) variants"
+    )
     args = parser.parse_args()
     
     # Get the directory to scan
@@ -296,32 +791,75 @@ def main() -> None:
     log_info("Starting template catalog generation...")
     log_info(f"Scanning directory: {scan_dir}")
     
-    templates = []
+    # Entries are written as they are processed; only what the indexes need is kept
+    index_entries: List[Dict[str, Any]] = []
+    shard_entries: List[Dict[str, Any]] = []
+    search_entries: List[Dict[str, Any]] = []
+    integrations_by_template: Dict[str, List[str]] = {}
     template_count = 0
-    skipped_count = 0
     
-    # Scan directories
-    for item in scan_dir.iterdir():
-        # Skip non-directories and hidden/special directories
-        if not item.is_dir() or item.name.startswith('.') or item.name in ('node_modules',):
-            continue
-        
-        if is_valid_template(item):
-            log_info(f"✓ Valid template found: {item.name}")
-            template_data = process_template(item)
-            templates.append(template_data)
-            template_count += 1
-        else:
-            log_warn(f"✗ Skipping invalid template: {item.name}")
-            skipped_count += 1
+    # Sorted by name so output does not depend on directory listing order
+    valid_dirs, skipped_count = find_template_dirs(scan_dir)
+    valid_dirs.sort(key=lambda d: d.name)
+    
+    if args.compress and load_brotli() is None:
+        log_warn("brotli module not installed; writing gzip variants only")
     
     # Generate JSON catalog
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            if args.pretty:
-                json.dump(templates, f, indent=2, ensure_ascii=False)
-            else:
-                json.dump(templates, f, ensure_ascii=False)
+        with contextlib.ExitStack() as outputs:
+            catalog = None
+            if args.layout == "single":
+                catalog = outputs.enter_context(CatalogWriter(output_file, args.pretty, args.compress))
+            ndjson = None
+            if args.ndjson:
+                ndjson = outputs.enter_context(CatalogWriter(Path(args.ndjson), args.pretty, args.compress, ndjson=True))
+            for item in valid_dirs:
+                template_data = process_template(item)
+                if args.content_packs:
+                    template_data["content_pack"] = write_pack_reference(item, Path(args.content_packs))
+                if catalog is not None:
+                    catalog.write(template_data)
+                if ndjson is not None:
+                    ndjson.write(template_data)
+                if args.layout == "sharded":
+                    shard_entries.append(write_shard(template_data, Path(args.shard_dir), args.pretty, args.compress))
+                if args.framework_index:
+                    index_entries.append({"name": template_data["name"], "frameworks": template_data["frameworks"]})
+                    integrations_by_template[item.name] = extract_integrations(item)
+                if args.search_index:
+                    description = template_data.get("description", {})
+                    search_entries.append({"name": template_data["name"], "description": {
+                        "selection": description.get("selection", ""),
+                        "usage": description.get("usage", ""),
+                    }})
+                template_count += 1
+        
+        if args.layout == "sharded":
+            output_file = write_shard_index(shard_entries, Path(args.shard_dir), args.pretty, args.compress)
+        if args.ndjson:
+            log_info(f"NDJSON catalog saved to: {args.ndjson}")
+        
+        if args.framework_index:
+            from template_index import TemplateIndex
+            
+            index = TemplateIndex.build(index_entries, integrations_by_template)
+            write_catalog_file(Path(args.framework_index), serialize_json(index.to_dict(), args.pretty), args.compress)
+            log_info(f"Framework index saved to: {args.framework_index}")
+        
+        if args.search_index:
+            from template_search import TemplateSearchIndex
+            
+            search_path = Path(args.search_index)
+            previous = None
+            if search_path.exists():
+                try:
+                    previous = TemplateSearchIndex.load(search_path)
+                except (ValueError, json.JSONDecodeError) as e:
+                    log_warn(f"Rebuilding search index from scratch: {e}")
+            search_index = TemplateSearchIndex.build(search_entries, previous)
+            write_catalog_file(search_path, serialize_json(search_index.to_dict(), args.pretty), args.compress)
+            log_info(f"Search index saved to: {args.search_index} ({len(search_index.weights)} terms)")
         
         # Summary
         log_info("Template catalog generation complete!")
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Range-request-friendly template archives.
+
+Consumers often need only a few files of zips/<template>.zip (package.json,
+the wrangler config, the prompts), yet download the whole archive. With
+`create_zip.py --ranged` the archive is written in a deliberate order:
+
+    1. package.json, wrangler config, .important_files.json and the other file lists
+    2. prompts/
+    3. files named by .important_files.json
+    4. everything else, sorted by path
+
+and a sidecar <zip>.index.json records where each entry's data lies:
+
+    {"version": 1, "archive": {"size", "sha256", "etag"}, "head_length": N,
+     "entries": [{"path", "offset", "length", "size", "method", "crc32"}]}
+
+offset/length is the entry's compressed data (the bytes after its local
+header); head_length is where groups 1-3 end, so one `Range: bytes=0-(N-1)`
+request returns all key files. RangeZipReader fetches entries from a local
+file or an http(s) URL, coalescing nearby ranges into one request and checking
+every entry's CRC-32, so an archive replaced after its index was read is
+detected rather than misread.
+
+    python3 create_zip.py build/vite-cfagents-runner zips/vite-cfagents-runner.zip --ranged
+    python3 range_zip.py serve zips --port 8080        # local server honouring Range
+    python3 range_zip.py get http://127.0.0.1:8080/vite-cfagents-runner.zip package.json --head
+"""
+
+import argparse
+import hashlib
+import http.server
+import io
+import json
+import os
+import re
+import struct
+import sys
+import zipfile
+import zlib
+from pathlib import Path
+
+INDEX_VERSION = 1
+
+# Read by nearly every consumer, in this order
+HEAD_FILES = (
+    "package.json", "wrangler.jsonc", "wrangler.json", "wrangler.toml",
+    ".important_files.json", ".donttouch_files.json", ".redacted_files.json",
+)
+HEAD_DIRS = ("prompts/",)
+
+# Gaps up to this size between wanted entries are downloaded rather than split into another request
+DEFAULT_MAX_GAP = 64 * 1024
+
+LOCAL_HEADER = struct.Struct('<4s22xHH')
+
+
+def _rank(path, is_important):
+    """Sort key placing key files first (groups 1-3 of the module docstring)"""
+    if path in HEAD_FILES:
+        return (0, HEAD_FILES.index(path), path)
+    if path.startswith(HEAD_DIRS):
+        return (1, 0, path)
+    if is_important(path):
+        return (2, 0, path)
+    return (3, 0, path)
+
+
+def order_entries(source_dir, entries):
+    """
+    Order (file_path, arc_path) archive entries for range requests.
+
+    Args:
+        source_dir: Template directory (its .important_files.json is consulted)
+        entries: Pairs as produced by create_zip.iter_archive_files
+
+    Returns:
+        List of the same pairs, key files first
+    """
+    from content_pack import IMPORTANT_FILES, path_matcher, read_file_list
+
+    is_important = path_matcher(read_file_list(source_dir, IMPORTANT_FILES))
+    return sorted(entries, key=lambda entry: _rank(entry[1].as_posix(), is_important))
+
+
+def build_range_index(zip_path):
+    """
+    Describe where each entry's data lies in an archive.
+
+    Works on any zip; head_length only covers key files if the archive was
+    written with create_zip(..., ranged=True).
+
+    Returns:
+        Range index dictionary
+    """
+    from content_pack import IMPORTANT_FILES, path_matcher
+
+    with open(zip_path, 'rb') as f:
+        data = f.read()
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        important = []
+        if IMPORTANT_FILES in zf.NameToInfo:
+            important = json.loads(zf.read(IMPORTANT_FILES).decode('utf-8'))
+        is_important = path_matcher(important)
+        head_length = 0
+        in_head = True
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            signature, name_length, extra_length = LOCAL_HEADER.unpack_from(data, info.header_offset)
+            if signature != b'PK\x03\x04':
+                raise ValueError(f"{zip_path}: bad local header for {info.filename}")
+            offset = info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+            entries.append({
+                "path": info.filename,
+                "offset": offset,
+                "length": info.compress_size,
+                "size": info.file_size,
+                "method": info.compress_type,
+                "crc32": info.CRC,
+            })
+            # The head is the leading run of key files
+            in_head = in_head and _rank(info.filename, is_important)[0] < 3
+            if in_head:
+                head_length = offset + info.compress_size
+    return {
+        "version": INDEX_VERSION,
+        "archive": {
+            "size": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "etag": hashlib.md5(data).hexdigest(),
+        },
+        "head_length": head_length,
+        "entries": entries,
+    }
+
+
+def write_range_index(zip_path, index_path=None):
+    """Write <zip>.index.json (or index_path) atomically; returns the index"""
+    from blob_store import write_atomic
+
+    index = build_range_index(zip_path)
+    write_atomic(index_path or f"{zip_path}.index.json",
+                 json.dumps(index, separators=(',', ':')).encode('utf-8'))
+    return index
+
+
+def _is_url(location):
+    return str(location).startswith(('http://', 'https://'))
+
+
+class RangeZipReader:
+    """Read single entries of a ranged archive without downloading all of it"""
+
+    def __init__(self, archive, index=None):
+        """
+        Args:
+            archive: Archive path or http(s) URL
+            index: Loaded range index; fetched from <archive>.index.json when omitted
+        """
+        self.archive = str(archive)
+        if index is None:
+            index = json.loads(self._read_whole(f"{self.archive}.index.json").decode('utf-8'))
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported range index version: {index.get('version')}")
+        self.index = index
+        self.entries = {entry["path"]: entry for entry in index["entries"]}
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    @staticmethod
+    def _read_whole(location):
+        if _is_url(location):
+            import urllib.request
+
+            with urllib.request.urlopen(location) as response:
+                return response.read()
+        with open(location, 'rb') as f:
+            return f.read()
+
+    def fetch(self, start, end):
+        """Bytes [start, end) of the archive, in one read or range request"""
+        self.requests += 1
+        if _is_url(self.archive):
+            import urllib.request
+
+            request = urllib.request.Request(self.archive, headers={"Range": f"bytes={start}-{end - 1}"})
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+                if response.status == 200:
+                    # Server ignored the Range header and sent the whole archive
+                    body = body[start:end]
+                elif not response.headers.get("Content-Range", "").startswith(f"bytes {start}-"):
+                    raise ValueError(f"Unexpected Content-Range: {response.headers.get('Content-Range')}")
+        else:
+            with open(self.archive, 'rb') as f:
+                f.seek(start)
+                body = f.read(end - start)
+        if len(body) != end - start:
+            raise ValueError(f"Short read of {self.archive}: {len(body)} of {end - start} bytes")
+        self.bytes_fetched += len(body)
+        return body
+
+    def _decode(self, entry, raw):
+        if entry["method"] == zipfile.ZIP_DEFLATED:
+            try:
+                data = zlib.decompress(raw, -zlib.MAX_WBITS)
+            except zlib.error as e:
+                raise ValueError(f"{entry['path']} is not valid deflate data (archive changed since its index was read?): {e}")
+        elif entry["method"] == zipfile.ZIP_STORED:
+            data = raw
+        else:
+            raise ValueError(f"{entry['path']}: unsupported compression method {entry['method']}")
+        if len(data) != entry["size"] or zlib.crc32(data) != entry["crc32"]:
+            raise ValueError(f"{entry['path']} failed integrity check (archive changed since its index was read?)")
+        return data
+
+    def read_many(self, paths, max_gap=DEFAULT_MAX_GAP):
+        """
+        Read several entries, merging ranges separated by at most max_gap bytes into one request.
+
+        Returns:
+            Mapping of path to contents
+
+        Raises:
+            KeyError: for a path not in the archive
+            ValueError: if fetched data does not match the index
+        """
+        wanted = sorted((self.entries[path] for path in paths), key=lambda entry: entry["offset"])
+        result = {}
+        i = 0
+        while i < len(wanted):
+            group = [wanted[i]]
+            end = wanted[i]["offset"] + wanted[i]["length"]
+            while i + len(group) < len(wanted) and wanted[i + len(group)]["offset"] - end <= max_gap:
+                group.append(wanted[i + len(group)])
+                end = max(end, group[-1]["offset"] + group[-1]["length"])
+            start = group[0]["offset"]
+            body = self.fetch(start, end)
+            for entry in group:
+                raw = body[entry["offset"] - start:entry["offset"] - start + entry["length"]]
+                result[entry["path"]] = self._decode(entry, raw)
+            i += len(group)
+        return result
+
+    def read(self, path):
+        """Contents of one entry"""
+        return self.read_many([path])[path]
+
+    def read_head(self):
+        """Every key-file entry (those within head_length), in a single request"""
+        head_length = self.index.get("head_length", 0)
+        paths = [entry["path"] for entry in self.index["entries"]
+                 if entry["offset"] + entry["length"] <= head_length]
+        return self.read_many(paths, max_gap=head_length)
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler that also honours single byte-range requests (for local testing)"""
+
+    def send_head(self):
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get("Range", "").strip())
+        path = self.translate_path(self.path)
+        if match is None or match.groups() == ('', '') or os.path.isdir(path):
+            return super().send_head()
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            first, last = match.groups()
+            if first:
+                start, end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                start, end = max(size - int(last), 0), size - 1
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            f.seek(start)
+            body = f.read(end - start + 1)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Range-request-friendly template archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Write the range index of an archive")
+    index_parser.add_argument("zip", help="Archive path")
+    index_parser.add_argument("--output", "-o", help="Index file (default: <zip>.index.json)")
+
+    get_parser = subparsers.add_parser("get", help="Fetch entries from an archive by range requests")
+    get_parser.add_argument("archive", help="Archive path or http(s) URL (index at <archive>.index.json)")
+    get_parser.add_argument("paths", nargs="*", help="Entries to fetch")
+    get_parser.add_argument("--head", action="store_true", help="Also fetch every key file in one request")
+    get_parser.add_argument("--output-dir", "-o", help="Write fetched entries under this directory")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve a directory over HTTP with Range support")
+    serve_parser.add_argument("directory", help="Directory to serve")
+    serve_parser.add_argument("--port", type=int, default=8080, help="Port (default: 8080)")
+    serve_parser.add_argument("--bind", default="127.0.0.1", help="Address (default: 127.0.0.1)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        handler = lambda *a, **kw: RangeRequestHandler(*a, directory=args.directory, **kw)
+        with http.server.ThreadingHTTPServer((args.bind, args.port), handler) as server:
+            print(f"Serving {args.directory} on http://{args.bind}:{server.server_address[1]}/", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        return
+
+    try:
+        if args.command == "index":
+            index = write_range_index(args.zip, args.output)
+            print(f"✅ Wrote {args.output or args.zip + '.index.json'} ({len(index['entries'])} entries, "
+                  f"key files in the first {index['head_length']}B)")
+            return
+        reader = RangeZipReader(args.archive)
+        files = reader.read_head() if args.head else {}
+        files.update(reader.read_many([p for p in args.paths if p not in files]))
+        for path in sorted(files):
+            print(f"{len(files[path]):>9}  {path}")
+            if args.output_dir:
+                target = Path(args.output_dir) / path
+                if os.path.isabs(path) or '..' in Path(path).parts:
+                    raise ValueError(f"Unsafe path in archive: {path}")
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(files[path])
+        print(f"✅ {len(files)} entries in {reader.requests} requests, {reader.bytes_fetched} of "
+              f"{reader.index['archive']['size']} archive bytes")
+    except KeyError as e:
+        print(f"❌ Not in archive: {e.args[0]}", file=sys.stderr)
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Pooled, concurrent uploader for S3-compatible object stores (Cloudflare R2).
+
+Uploads a batch of files in one process instead of one `wrangler r2 object put`
+process per file:
+
+- keep-alive HTTP connections are pooled and reused across objects
+- concurrency is bounded (--jobs)
+- files at or above the multipart threshold are sent as multipart uploads
+- requests that fail with a connection error, 429 or 5xx are retried with
+  exponential backoff and jitter
+- objects whose remote ETag already matches the local file are skipped
+
+Requests are signed with AWS Signature V4 using path-style addressing, so any
+S3-compatible endpoint works, including a local stub server for testing.
+
+Configuration comes from the environment unless given on the command line:
+    S3_ENDPOINT_URL                          endpoint (default: https://$CLOUDFLARE_ACCOUNT_ID.r2.cloudflarestorage.com)
+    R2_ACCESS_KEY_ID / AWS_ACCESS_KEY_ID     access key
+    R2_SECRET_ACCESS_KEY / AWS_SECRET_ACCESS_KEY
+    S3_REGION                                signing region (default: auto)
+
+Usage:
+    python3 s3_upload.py --bucket my-bucket zips/*.zip template_catalog.json
+    python3 s3_upload.py --bucket my-bucket --endpoint http://127.0.0.1:9000 build.zip=templates/build.zip
+"""
+
+import argparse
+import datetime
+import hashlib
+import hmac
+import http.client
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MIB = 1024 * 1024
+DEFAULT_MULTIPART_THRESHOLD = 64 * MIB
+DEFAULT_PART_SIZE = 16 * MIB
+MIN_PART_SIZE = 5 * MIB
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class S3Error(Exception):
+    """A request that failed permanently (or ran out of retries)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive connections to a single host"""
+
+    def __init__(self, endpoint: str, timeout: float = 60.0):
+        parsed = urllib.parse.urlsplit(endpoint)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            raise ValueError(f"Invalid endpoint URL: {endpoint}")
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.netloc = parsed.netloc
+        self.base_path = parsed.path.rstrip('/')
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+
+    def acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            return cls(self.host, self.port, timeout=self.timeout)
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _sign(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+
+
+def local_etag(path: Path, multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+               part_size: int = DEFAULT_PART_SIZE) -> str:
+    """
+    ETag an S3-compatible store reports for a file uploaded by this module.
+
+    Single-part objects carry the MD5 of their contents; multipart objects
+    carry the MD5 of the concatenated part MD5s followed by "-<part count>".
+
+    Args:
+        path: Local file
+        multipart_threshold: Size at which uploads switch to multipart
+        part_size: Multipart part size
+
+    Returns:
+        ETag without quotes
+    """
+    size = path.stat().st_size
+    with open(path, 'rb') as f:
+        if size < multipart_threshold:
+            h = hashlib.md5()
+            for chunk in iter(lambda: f.read(MIB), b''):
+                h.update(chunk)
+            return h.hexdigest()
+        digests = [hashlib.md5(chunk).digest() for chunk in iter(lambda: f.read(part_size), b'')]
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class S3Client:
+    """Minimal SigV4 client for the object operations the deploy needs"""
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, region: str = "auto",
+                 max_attempts: int = 5, backoff: float = 0.5,
+                 multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD, part_size: int = DEFAULT_PART_SIZE):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"Part size must be at least {MIN_PART_SIZE} bytes")
+        self.pool = ConnectionPool(endpoint)
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+
+    @classmethod
+    def from_env(cls, bucket: str, endpoint: Optional[str] = None, **kwargs) -> "S3Client":
+        """
+        Create a client from environment variables (see module docstring).
+
+        Raises:
+            ValueError: if the endpoint or credentials are not configured
+        """
+        env = os.environ
+        if endpoint is None:
+            endpoint = env.get("S3_ENDPOINT_URL")
+        if endpoint is None and env.get("CLOUDFLARE_ACCOUNT_ID"):
+            endpoint = f"https://{env['CLOUDFLARE_ACCOUNT_ID']}.r2.cloudflarestorage.com"
+        access_key = env.get("R2_ACCESS_KEY_ID") or env.get("AWS_ACCESS_KEY_ID")
+        secret_key = env.get("R2_SECRET_ACCESS_KEY") or env.get("AWS_SECRET_ACCESS_KEY")
+        if not endpoint:
+            raise ValueError("No endpoint: set S3_ENDPOINT_URL or CLOUDFLARE_ACCOUNT_ID")
+        if not access_key or not secret_key:
+            raise ValueError("No credentials: set R2_ACCESS_KEY_ID and R2_SECRET_ACCESS_KEY")
+        return cls(endpoint, bucket, access_key, secret_key, region=env.get("S3_REGION", "auto"), **kwargs)
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def _object_path(self, key: str) -> str:
+        return f"{self.pool.base_path}/{urllib.parse.quote(self.bucket, safe='')}/{urllib.parse.quote(key, safe='/~')}"
+
+    def _headers(self, method: str, path: str, query: Dict[str, str], payload_hash: str,
+                 extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = amz_date[:8]
+        headers = {
+            "host": self.pool.netloc,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+        }
+        for name, value in (extra or {}).items():
+            headers[name.lower()] = value
+        signed = sorted(headers)
+        canonical_query = '&'.join(
+            f"{urllib.parse.quote(k, safe='~')}={urllib.parse.quote(v, safe='~')}" for k, v in sorted(query.items())
+        )
+        canonical_request = '\n'.join([
+            method,
+            path,
+            canonical_query,
+            ''.join(f"{name}:{headers[name].strip()}\n" for name in signed),
+            ';'.join(signed),
+            payload_hash,
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = '\n'.join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+        ])
+        key = _sign(_sign(_sign(_sign(f"AWS4{self.secret_key}".encode('utf-8'), date), self.region), "s3"), "aws4_request")
+        signature = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={';'.join(signed)}, Signature={signature}"
+        )
+        return headers
+
+    def _request_once(self, method: str, key: str, query: Dict[str, str], body: bytes,
+                      extra: Optional[Dict[str, str]]) -> Tuple[int, Dict[str, str], bytes]:
+        path = self._object_path(key)
+        payload_hash = hashlib.sha256(body).hexdigest() if body else EMPTY_SHA256
+        headers = self._headers(method, path, query, payload_hash, extra)
+        url = path + ('?' + urllib.parse.urlencode(sorted(query.items()), quote_via=urllib.parse.quote) if query else '')
+        conn = self.pool.acquire()
+        try:
+            conn.request(method, url, body=body or None, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise _RetryableError(f"{method} {key}: {e}") from e
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.release(conn)
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        if response.status in RETRYABLE_STATUSES:
+            raise _RetryableError(f"{method} {key}: HTTP {response.status}")
+        return response.status, response_headers, data
+
+    def request(self, method: str, key: str, query: Optional[Dict[str, str]] = None, body: bytes = b'',
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send a signed request, retrying transient failures with backoff.
+
+        Returns:
+            Tuple of (status, lower-cased response headers, body)
+
+        Raises:
+            S3Error: if every attempt failed with a transient error
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return self._request_once(method, key, query or {}, body, headers)
+            except _RetryableError as e:
+                if attempt == self.max_attempts:
+                    raise S3Error(f"{e} (gave up after {attempt} attempts)") from e
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        raise AssertionError("unreachable")
+
+    def _check(self, status: int, data: bytes, what: str) -> None:
+        if status >= 300:
+            detail = data.decode('utf-8', 'replace').strip()[:200]
+            raise S3Error(f"{what} returned HTTP {status}" + (f": {detail}" if detail else ""), status)
+
+    def head_etag(self, key: str) -> Optional[str]:
+        """ETag of an existing object (without quotes), or None if it does not exist"""
+        status, headers, data = self.request("HEAD", key)
+        if status == 404:
+            return None
+        self._check(status, data, f"HEAD {key}")
+        return headers.get("etag", "").strip('"') or None
+
+    def get_object(self, key: str) -> Optional[bytes]:
+        """Contents of an object, or None if it does not exist"""
+        status, _, data = self.request("GET", key)
+        if status == 404:
+            return None
+        self._check(status, data, f"GET {key}")
+        return data
+
+    def put_object(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        status, _, body = self.request("PUT", key, body=data, headers={"content-type": content_type})
+        self._check(status, body, f"PUT {key}")
+
+    def _multipart_upload(self, key: str, path: Path, content_type: str) -> None:
+        status, _, body = self.request("POST", key, {"uploads": ""}, headers={"content-type": content_type})
+        self._check(status, body, f"CreateMultipartUpload {key}")
+        upload_id = next((el.text for el in ET.fromstring(body).iter() if el.tag.endswith("UploadId")), None)
+        if not upload_id:
+            raise S3Error(f"CreateMultipartUpload {key} returned no UploadId")
+        try:
+            parts: List[Tuple[int, str]] = []
+            with open(path, 'rb') as f:
+                for number, chunk in enumerate(iter(lambda: f.read(self.part_size), b''), start=1):
+                    status, headers, body = self.request(
+                        "PUT", key, {"partNumber": str(number), "uploadId": upload_id}, body=chunk)
+                    self._check(status, body, f"UploadPart {key} #{number}")
+                    parts.append((number, headers.get("etag", "")))
+            complete = ''.join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+            )
+            payload = f"<CompleteMultipartUpload>{complete}</CompleteMultipartUpload>".encode('utf-8')
+            status, _, body = self.request("POST", key, {"uploadId": upload_id}, body=payload)
+            # CompleteMultipartUpload can report failure in a 200 response body
+            if status < 300 and b"<Error>" in body:
+                status = 500
+            self._check(status, body, f"CompleteMultipartUpload {key}")
+        except Exception:
+            try:
+                self.request("DELETE", key, {"uploadId": upload_id})
+            except S3Error:
+                pass
+            raise
+
+    def upload_file(self, path: Path, key: str, skip_unchanged: bool = True,
+                    content_type: str = "application/octet-stream") -> bool:
+        """
+        Upload a file, using multipart above the threshold.
+
+        Args:
+            path: Local file
+            key: Object key
+            skip_unchanged: Skip the upload when the remote ETag matches
+            content_type: Content-Type stored with the object
+
+        Returns:
+            True if the object was uploaded, False if it was already up to date
+        """
+        path = Path(path)
+        if skip_unchanged:
+            expected = local_etag(path, self.multipart_threshold, self.part_size)
+            if self.head_etag(key) == expected:
+                return False
+        if path.stat().st_size >= self.multipart_threshold:
+            self._multipart_upload(key, path, content_type)
+        else:
+            self.put_object(key, path.read_bytes(), content_type)
+        return True
+
+
+def content_type_for(key: str) -> str:
+    if key.endswith('.json'):
+        return "application/json"
+    if key.endswith('.zip'):
+        return "application/zip"
+    return "application/octet-stream"
+
+
+def upload_batch(client: S3Client, items: List[Tuple[Path, str]], jobs: int = 8,
+                 skip_unchanged: bool = True) -> Dict[str, List[str]]:
+    """
+    Upload many files concurrently over the client's connection pool.
+
+    Args:
+        client: S3Client to upload with
+        items: (local path, object key) pairs
+        jobs: Maximum concurrent uploads
+        skip_unchanged: Skip objects whose remote ETag matches
+
+    Returns:
+        {"uploaded": [...keys], "skipped": [...keys], "failed": [...keys]}
+    """
+    results: Dict[str, List[str]] = {"uploaded": [], "skipped": [], "failed": []}
+    lock = threading.Lock()
+
+    def upload(item: Tuple[Path, str]) -> None:
+        path, key = item
+        try:
+            uploaded = client.upload_file(path, key, skip_unchanged, content_type_for(key))
+        except (OSError, S3Error) as e:
+            print(f"❌ {key}: {e}", file=sys.stderr)
+            outcome = "failed"
+        else:
+            outcome = "uploaded" if uploaded else "skipped"
+            print(f"{'✅ Uploaded' if uploaded else '⏭️  Unchanged'} {key}")
+        with lock:
+            results[outcome].append(key)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        list(executor.map(upload, items))
+    return results
+
+
+def parse_item(spec: str) -> Tuple[Path, str]:
+    """Parse "path" or "path=key" (the default key is the file name)"""
+    path, sep, key = spec.partition('=')
+    return Path(path), (key if sep else Path(path).name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Upload files to an S3-compatible bucket (e.g. R2)")
+    parser.add_argument("files", nargs="+", help="Files to upload, as PATH or PATH=KEY (default key: file name)")
+    parser.add_argument("--bucket", "-b", default=os.environ.get("R2_BUCKET_NAME"), help="Bucket name (default: $R2_BUCKET_NAME)")
+    parser.add_argument("--endpoint", help="Endpoint URL (default: $S3_ENDPOINT_URL or the R2 endpoint for $CLOUDFLARE_ACCOUNT_ID)")
+    parser.add_argument("--jobs", "-j", type=int, default=8, help="Concurrent uploads (default: 8)")
+    parser.add_argument("--force", action="store_true", help="Upload even if the remote ETag matches")
+    parser.add_argument("--multipart-threshold-mb", type=int, default=DEFAULT_MULTIPART_THRESHOLD // MIB,
+                        help=f"Use multipart upload at this size (default: {DEFAULT_MULTIPART_THRESHOLD // MIB})")
+    parser.add_argument("--part-size-mb", type=int, default=DEFAULT_PART_SIZE // MIB,
+                        help=f"Multipart part size (default: {DEFAULT_PART_SIZE // MIB})")
+    args = parser.parse_args()
+
+    if not args.bucket:
+        print("❌ No --bucket given and R2_BUCKET_NAME is not set", file=sys.stderr)
+        sys.exit(1)
+    try:
+        client = S3Client.from_env(
+            args.bucket,
+            endpoint=args.endpoint,
+            multipart_threshold=args.multipart_threshold_mb * MIB,
+            part_size=args.part_size_mb * MIB,
+        )
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    items = [parse_item(spec) for spec in args.files]
+    missing = [str(path) for path, _ in items if not path.is_file()]
+    if missing:
+        print(f"❌ Not a file: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        results = upload_batch(client, items, jobs=args.jobs, skip_unchanged=not args.force)
+    finally:
+        client.close()
+    print(f"📊 {len(results['uploaded'])} uploaded, {len(results['skipped'])} unchanged, {len(results['failed'])} failed")
+    sys.exit(1 if results["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
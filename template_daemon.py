@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Long-lived template generator daemon with warm caches.
+
+Keeps one TemplateGenerator (source tree indexes, parsed definitions, file
+digests) and the per-template catalog entries in memory, and serves requests
+over a Unix socket (default) or a localhost TCP port. The same script is the
+client:
+
+    python3 template_daemon.py serve &                     # listens on ./.template-daemon.sock
+    python3 template_daemon.py generate vite-cfagents-runner
+    python3 template_daemon.py verify vite-cfagents-runner --summary-only
+    python3 template_daemon.py catalog -o template_catalog.json
+    python3 template_daemon.py status
+    python3 template_daemon.py stop
+
+Before every request the daemon stats reference/, definitions/ and originals/
+and compares the result with the previous snapshot; any added, removed or
+modified file invalidates the affected caches. Definition, digest and catalog
+entries are additionally keyed by (size, mtime, inode), so edits are picked up
+even between snapshots.
+
+Protocol: the client sends one JSON object per connection followed by a
+newline ({"op": "generate", "templates": [...]}) and reads one JSON response
+({"ok": bool, "output": "<captured log>", ...}). Requests are served one at a
+time because they all write to build/.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+
+# The generator and catalog modules (and yaml) are imported by the server side
+# only, so client invocations stay cheap
+
+DEFAULT_SOCKET = ".template-daemon.sock"
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Files process_template reads; a catalog entry is reused while all are unchanged
+CATALOG_INPUTS = ("package.json", "prompts/selection.md", "prompts/usage.md")
+
+Snapshot = Dict[str, Tuple[int, int, int]]
+
+
+class GeneratorService:
+    """Serves generate/verify/catalog requests from a warm TemplateGenerator"""
+
+    def __init__(self, root_dir: Path):
+        from generate_templates import TemplateGenerator
+
+        self.root_dir = root_dir
+        self.generator = TemplateGenerator(root_dir)
+        self.generator.cache_digests = True
+        self.watched = {
+            "reference": self.generator.reference_dir,
+            "definitions": self.generator.definitions_dir,
+            "originals": self.generator.originals_dir,
+        }
+        self._snapshots: Dict[str, Snapshot] = {name: self._snapshot(path) for name, path in self.watched.items()}
+        self._catalog_cache: Dict[str, Tuple[tuple, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.invalidations = 0
+
+    def _snapshot(self, root: Path) -> Snapshot:
+        """(size, mtime, inode) of every file under root, skipping DEFAULT_IGNORES"""
+        from tree_index import index_tree
+
+        is_ignored = self.generator._ignore_matcher([])
+        index = index_tree(root, skip_dir=lambda rel, name: is_ignored(rel) is not None)
+        snapshot: Snapshot = {}
+        for rel, entry in index.files.items():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            snapshot[rel] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def refresh(self) -> List[str]:
+        """
+        Detect changes in the watched trees and invalidate what depends on them.
+
+        Returns:
+            Names of the trees that changed
+        """
+        changed = []
+        for name, path in self.watched.items():
+            snapshot = self._snapshot(path)
+            if snapshot != self._snapshots[name]:
+                self._snapshots[name] = snapshot
+                changed.append(name)
+        if "reference" in changed or "definitions" in changed:
+            # Overlay and reference indexes hold DirEntry objects for the old files
+            self.generator.invalidate_source_cache()
+        if changed:
+            from generate_templates import log_info
+
+            self.invalidations += 1
+            log_info(f"Detected changes in {', '.join(changed)}; caches invalidated")
+        return changed
+
+    def _catalog_entry(self, template_dir: Path) -> Dict[str, Any]:
+        from generate_template_catalog import process_template
+
+        key = []
+        for rel in CATALOG_INPUTS:
+            try:
+                st = os.stat(template_dir / rel)
+                key.append((st.st_size, st.st_mtime_ns, st.st_ino))
+            except OSError:
+                key.append(None)
+        stat_key = tuple(key)
+        cached = self._catalog_cache.get(template_dir.name)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        entry = process_template(template_dir)
+        self._catalog_cache[template_dir.name] = (stat_key, entry)
+        return entry
+
+    def op_generate(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        names = request.get("templates") or []
+        self.generator.build_dir.mkdir(parents=True, exist_ok=True)
+        if not names:
+            return {"ok": self.generator.generate_all_templates()}
+        results = {name: self.generator.generate_specific_template(name) for name in names}
+        return {"ok": all(results.values()), "results": results}
+
+    def op_verify(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        names = request.get("templates") or [None]
+        ok = True
+        for name in names:
+            ok = self.generator.verify_all(
+                show_diffs=bool(request.get("diffs")),
+                summary_only=bool(request.get("summary_only")),
+                ignores=request.get("ignores") or [],
+                only_template=name,
+            ) and ok
+        return {"ok": ok}
+
+    def op_catalog(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from generate_template_catalog import CatalogWriter, find_template_dirs
+
+        scan_dir = Path(request.get("directory") or self.generator.build_dir)
+        valid_dirs, skipped = find_template_dirs(scan_dir)
+        valid_dirs.sort(key=lambda d: d.name)
+        response: Dict[str, Any] = {"ok": True, "count": len(valid_dirs), "skipped": skipped}
+        if request.get("output"):
+            output = Path(request["output"])
+            with CatalogWriter(output, bool(request.get("pretty")), ndjson=bool(request.get("ndjson"))) as catalog:
+                for template_dir in valid_dirs:
+                    catalog.write(self._catalog_entry(template_dir))
+            response["output_file"] = str(output)
+        else:
+            response["catalog"] = [self._catalog_entry(d) for d in valid_dirs]
+        return response
+
+    def op_status(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 3),
+            "requests": self.requests,
+            "invalidations": self.invalidations,
+            "cached_source_indexes": len(self.generator._source_index_cache),
+            "cached_definitions": len(self.generator._definition_cache),
+            "cached_digests": len(self.generator._hash_cache),
+            "cached_catalog_entries": len(self._catalog_cache),
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one request with its stdout/stderr captured into the response"""
+        op = request.get("op")
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            return {"ok": False, "error": f"Unknown op: {op}"}
+        with self._lock:
+            self.requests += 1
+            start = time.perf_counter()
+            output = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                    self.refresh()
+                    response = handler(request)
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            response["output"] = output.getvalue()
+            response["seconds"] = round(time.perf_counter() - start, 4)
+            return response
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            response = {"ok": False, "error": f"Bad request: {e}"}
+        else:
+            if request.get("op") == "stop":
+                response = {"ok": True}
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                response = self.server.service.handle(request)
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def parse_address(address: str):
+    """"host:port" for TCP, anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+def serve(service: GeneratorService, address) -> None:
+    """Serve until a stop request or Ctrl+C"""
+    from generate_templates import log_info
+
+    if isinstance(address, tuple):
+        server = TcpServer(address, _RequestHandler)
+    else:
+        if os.path.exists(address):
+            if _ping(address):
+                raise RuntimeError(f"A daemon is already listening on {address}")
+            os.unlink(address)
+        server = UnixServer(address, _RequestHandler)
+        os.chmod(address, 0o600)
+    server.service = service
+    log_info(f"Template daemon (pid {os.getpid()}) listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not isinstance(address, tuple):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(address)
+        log_info("Template daemon stopped")
+
+
+def send_request(address, request: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send one request to a running daemon and return its response"""
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
+
+
+def _ping(address) -> bool:
+    try:
+        send_request(address, {"op": "status"}, timeout=2.0)
+        return True
+    except OSError:
+        return False
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Template generator daemon and client")
+    parser.add_argument("--root", "-r", default=".", help="Root directory containing reference/, definitions/ and build/")
+    parser.add_argument("--address", "-a", help=f"Unix socket path or host:port (default: <root>/{DEFAULT_SOCKET})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("serve", help="Run the daemon in the foreground")
+    gen_parser = subparsers.add_parser("generate", help="Generate templates (default: all)")
+    gen_parser.add_argument("templates", nargs="*", help="Template names")
+    verify_parser = subparsers.add_parser("verify", help="Verify build/ against originals/ (default: all)")
+    verify_parser.add_argument("templates", nargs="*", help="Template names")
+    verify_parser.add_argument("--diffs", action="store_true", help="Show unified diffs for modified text files")
+    verify_parser.add_argument("--summary-only", action="store_true", help="Only show counts, not file lists")
+    verify_parser.add_argument("--ignore", action="append", default=[], help="Extra glob(s) to ignore")
+    catalog_parser = subparsers.add_parser("catalog", help="Build the catalog from build/")
+    catalog_parser.add_argument("--output", "-o", help="Write the catalog to this file (default: print to stdout)")
+    catalog_parser.add_argument("--pretty", "-p", action="store_true", help="Pretty-print JSON output")
+    catalog_parser.add_argument("--ndjson", action="store_true", help="Write --output as newline-delimited JSON")
+    subparsers.add_parser("status", help="Show daemon cache statistics")
+    subparsers.add_parser("stop", help="Stop the daemon")
+    args = parser.parse_args()
+
+    root_dir = Path(args.root).resolve()
+    address = parse_address(args.address) if args.address else str(root_dir / DEFAULT_SOCKET)
+
+    if args.command == "serve":
+        try:
+            serve(GeneratorService(root_dir), address)
+        except (OSError, RuntimeError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    request: Dict[str, Any] = {"op": args.command}
+    if args.command in ("generate", "verify"):
+        request["templates"] = args.templates
+    if args.command == "verify":
+        request.update(diffs=args.diffs, summary_only=args.summary_only, ignores=args.ignore)
+    if args.command == "catalog":
+        # Relative paths are the client's, not the daemon's
+        request.update(output=str(Path(args.output).resolve()) if args.output else None, pretty=args.pretty,
+                       ndjson=args.ndjson)
+
+    try:
+        response = send_request(address, request)
+    except OSError as e:
+        print(f"❌ Cannot reach template daemon at {address}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    sys.stderr.write(response.pop("output", ""))
+    if response.get("error"):
+        print(f"❌ {response['error']}", file=sys.stderr)
+    if args.command == "status":
+        print(json.dumps(response, indent=2))
+    elif args.command == "catalog" and "catalog" in response:
+        print(json.dumps(response["catalog"], indent=2 if args.pretty else None, ensure_ascii=False))
+    sys.exit(0 if response.get("ok") else 1)
+
+
+if __name__ == "__main__":
+    main()
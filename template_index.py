@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Template Inverted Index
+
+Maps each detected framework and Cloudflare integration to the templates that
+use it, so consumers can answer queries such as "react + durable-objects + zod"
+with set intersections instead of scanning every catalog entry.
+
+The index is emitted by generate_template_catalog.py (--framework-index) and
+can be queried from Python or from the command line:
+
+    python3 template_index.py template_index.json react durable-objects zod
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional, Set
+
+
+INDEX_VERSION = 1
+
+
+class TemplateIndex:
+    """Framework/integration -> template name posting lists"""
+
+    def __init__(self, templates: Iterable[str], frameworks: Dict[str, Iterable[str]], integrations: Dict[str, Iterable[str]]):
+        self.templates: List[str] = sorted(set(templates))
+        self.frameworks: Dict[str, Set[str]] = {k: set(v) for k, v in frameworks.items()}
+        self.integrations: Dict[str, Set[str]] = {k: set(v) for k, v in integrations.items()}
+
+    @classmethod
+    def build(cls, entries: Iterable[Dict[str, Any]], integrations_by_template: Optional[Dict[str, List[str]]] = None) -> 'TemplateIndex':
+        """
+        Build an index from catalog entries.
+
+        Args:
+            entries: Catalog entries (dicts with at least "name" and "frameworks")
+            integrations_by_template: Optional mapping of template name to detected integrations
+
+        Returns:
+            TemplateIndex instance
+        """
+        names: List[str] = []
+        frameworks: Dict[str, Set[str]] = {}
+        integrations: Dict[str, Set[str]] = {}
+        for entry in entries:
+            name = entry["name"]
+            names.append(name)
+            for framework in entry.get("frameworks", []):
+                frameworks.setdefault(framework, set()).add(name)
+        for name, detected in (integrations_by_template or {}).items():
+            for integration in detected:
+                integrations.setdefault(integration, set()).add(name)
+        return cls(names, frameworks, integrations)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TemplateIndex':
+        """Create TemplateIndex from its JSON representation"""
+        version = data.get("version")
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported template index version: {version}")
+        return cls(data.get("templates", []), data.get("frameworks", {}), data.get("integrations", {}))
+
+    @classmethod
+    def load(cls, path: Path) -> 'TemplateIndex':
+        """Load a TemplateIndex from a JSON file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a deterministic JSON-compatible dictionary"""
+        return {
+            "version": INDEX_VERSION,
+            "templates": self.templates,
+            "frameworks": {k: sorted(v) for k, v in sorted(self.frameworks.items())},
+            "integrations": {k: sorted(v) for k, v in sorted(self.integrations.items())},
+        }
+
+    def query(self, frameworks: Iterable[str] = (), integrations: Iterable[str] = ()) -> List[str]:
+        """
+        Return templates that use every requested framework and integration.
+
+        Posting lists are intersected smallest-first so the work is bounded by the
+        rarest term. An empty query matches every template.
+
+        Args:
+            frameworks: Framework names (as produced by extract_frameworks)
+            integrations: Cloudflare integration names
+
+        Returns:
+            Sorted list of matching template names
+        """
+        postings: List[Set[str]] = []
+        for framework in frameworks:
+            postings.append(self.frameworks.get(framework, set()))
+        for integration in integrations:
+            postings.append(self.integrations.get(integration, set()))
+        return self._intersect(postings)
+
+    def query_terms(self, terms: Iterable[str]) -> List[str]:
+        """
+        Resolve bare terms against both maps and intersect them.
+
+        A term that names both a framework and an integration (e.g. "d1") matches
+        templates in either posting list.
+
+        Args:
+            terms: Framework or integration names
+
+        Returns:
+            Sorted list of matching template names
+        """
+        postings: List[Set[str]] = []
+        for term in terms:
+            postings.append(self.frameworks.get(term, set()) | self.integrations.get(term, set()))
+        return self._intersect(postings)
+
+    def _intersect(self, postings: List[Set[str]]) -> List[str]:
+        if not postings:
+            return list(self.templates)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return sorted(result)
+
+
+def linear_scan(entries: List[Dict[str, Any]], frameworks: Iterable[str]) -> List[str]:
+    """Reference implementation: filter catalog entries by scanning every frameworks list"""
+    wanted = list(frameworks)
+    return sorted(e["name"] for e in entries if all(f in e.get("frameworks", []) for f in wanted))
+
+
+def main() -> None:
+    """Query a template index from the command line"""
+    parser = argparse.ArgumentParser(description="Query the framework/integration template index")
+    parser.add_argument("index", help="Path to template index JSON")
+    parser.add_argument("terms", nargs="*", help="Framework or integration names to intersect")
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="N",
+        help="Time N lookups; compares against a linear scan when --catalog is given"
+    )
+    parser.add_argument(
+        "--catalog",
+        help="template_catalog.json to use as the linear-scan baseline for --benchmark"
+    )
+    args = parser.parse_args()
+
+    index = TemplateIndex.load(Path(args.index))
+
+    if not args.benchmark:
+        for name in index.query_terms(args.terms):
+            print(name)
+        return
+
+    start = time.perf_counter()
+    for _ in range(args.benchmark):
+        index.query_terms(args.terms)
+    indexed = (time.perf_counter() - start) / args.benchmark
+    print(f"index:  {indexed * 1e6:.2f} us/query")
+
+    if args.catalog:
+        with open(args.catalog, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        start = time.perf_counter()
+        for _ in range(args.benchmark):
+            linear_scan(entries, args.terms)
+        scanned = (time.perf_counter() - start) / args.benchmark
+        print(f"scan:   {scanned * 1e6:.2f} us/query (frameworks only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Template Prompt Search Index
+
+Precomputed BM25 inverted index over each template's prompts/selection.md and
+prompts/usage.md. Terms are lowercase word tokens plus word n-grams (bigrams by
+default), so phrases such as "durable objects" rank above documents that only
+mention "durable" and "objects" separately.
+
+The index is emitted by generate_template_catalog.py (--search-index) and can
+be queried from Python or from the command line:
+
+    python3 template_search.py template_search.json "realtime chat with durable objects"
+
+Per-posting BM25 weights are stored in the file, so a query is a handful of
+dictionary lookups and additions rather than a scan over prompt text.
+"""
+
+import json
+import math
+import re
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Tuple
+
+
+INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was",
+    "will", "with", "you", "your",
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def extract_terms(text: str, ngram: int) -> List[str]:
+    """
+    Extract unigram and word n-gram terms from text.
+
+    Args:
+        text: Input text
+        ngram: Largest n-gram size to emit (1 = unigrams only)
+
+    Returns:
+        List of terms; n-grams are space-joined tokens
+    """
+    tokens = tokenize(text)
+    terms = list(tokens)
+    for n in range(2, ngram + 1):
+        terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return terms
+
+
+class TemplateSearchIndex:
+    """BM25 inverted index over template prompts"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, ngram: int = 2, field_weights: Dict[str, float] = None):
+        self.k1 = k1
+        self.b = b
+        self.ngram = ngram
+        # Selection text describes when to pick a template, so it counts more than usage notes
+        self.field_weights: Dict[str, float] = field_weights or {"selection": 2.0, "usage": 1.0}
+        # name -> {"hash": content hash, "length": weighted term count}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        # term -> {name: weighted term frequency}
+        self.term_freqs: Dict[str, Dict[str, float]] = {}
+        # name -> terms with a posting for it, so a document is removed without scanning the vocabulary;
+        # derived from term_freqs and not serialized
+        self.doc_terms: Dict[str, List[str]] = {}
+        # term -> {name: BM25 weight}; derived from term_freqs and docs
+        self.weights: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def content_hash(fields: Dict[str, str]) -> str:
+        """Hash of a template's prompt fields, used to skip unchanged templates"""
+        h = hashlib.sha256()
+        for name in sorted(fields):
+            h.update(name.encode('utf-8'))
+            h.update(b'\0')
+            h.update(fields[name].encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def update_document(self, name: str, fields: Dict[str, str], reweight: bool = True) -> bool:
+        """
+        Add or replace a template's prompts in the index.
+
+        Only this template's text is tokenized; other templates keep their stored
+        term frequencies. Returns False without touching the index when the
+        content hash is unchanged.
+
+        Args:
+            name: Template name
+            fields: Mapping of field name ("selection", "usage") to text
+            reweight: Recompute BM25 weights immediately (batch callers pass False)
+
+        Returns:
+            True if the index changed, False otherwise
+        """
+        digest = self.content_hash(fields)
+        if self.docs.get(name, {}).get("hash") == digest:
+            return False
+
+        self._remove_term_freqs(name)
+        tf: Dict[str, float] = {}
+        length = 0.0
+        for field_name, text in fields.items():
+            weight = self.field_weights.get(field_name, 1.0)
+            for term in extract_terms(text, self.ngram):
+                tf[term] = tf.get(term, 0.0) + weight
+                length += weight
+        for term, freq in tf.items():
+            self.term_freqs.setdefault(term, {})[name] = freq
+        self.doc_terms[name] = list(tf)
+        self.docs[name] = {"hash": digest, "length": length}
+
+        if reweight:
+            self.compute_weights()
+        return True
+
+    def remove_document(self, name: str, reweight: bool = True) -> bool:
+        """Remove a template from the index; returns False if it was not indexed"""
+        if name not in self.docs:
+            return False
+        self._remove_term_freqs(name)
+        del self.docs[name]
+        if reweight:
+            self.compute_weights()
+        return True
+
+    def _remove_term_freqs(self, name: str) -> None:
+        for term in self.doc_terms.pop(name, []):
+            postings = self.term_freqs[term]
+            del postings[name]
+            if not postings:
+                del self.term_freqs[term]
+
+    def compute_weights(self) -> None:
+        """
+        Recompute per-posting BM25 weights from stored term frequencies.
+
+        This is arithmetic over the stored postings only; no prompt text is read.
+        """
+        n_docs = len(self.docs)
+        avg_len = (sum(d["length"] for d in self.docs.values()) / n_docs) if n_docs else 0.0
+        norms = {
+            name: self.k1 * (1 - self.b + self.b * (d["length"] / avg_len if avg_len else 0.0))
+            for name, d in self.docs.items()
+        }
+        weights: Dict[str, Dict[str, float]] = {}
+        for term, postings in self.term_freqs.items():
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            weights[term] = {
+                name: idf * (tf * (self.k1 + 1)) / (tf + norms[name])
+                for name, tf in postings.items()
+            }
+        self.weights = weights
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Rank templates for a free-text query.
+
+        Args:
+            query: Free-text request
+            limit: Maximum number of results
+
+        Returns:
+            List of (template name, score) sorted by descending score
+        """
+        scores: Dict[str, float] = {}
+        for term in set(extract_terms(query, self.ngram)):
+            postings = self.weights.get(term)
+            if not postings:
+                continue
+            for name, weight in postings.items():
+                scores[name] = scores.get(name, 0.0) + weight
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    @classmethod
+    def build(cls, entries: Iterable[Dict[str, Any]], previous: 'TemplateSearchIndex' = None) -> 'TemplateSearchIndex':
+        """
+        Build an index from catalog entries, reusing an earlier index when given.
+
+        Templates whose prompt hash matches the previous index are not
+        re-tokenized, and templates no longer present are dropped.
+
+        Args:
+            entries: Catalog entries with "name" and "description": {"selection", "usage"}
+            previous: Previously saved index to update incrementally
+
+        Returns:
+            TemplateSearchIndex instance
+        """
+        index = previous if previous is not None else cls()
+        seen = set()
+        for entry in entries:
+            name = entry["name"]
+            seen.add(name)
+            description = entry.get("description", {})
+            index.update_document(name, {
+                "selection": description.get("selection", ""),
+                "usage": description.get("usage", ""),
+            }, reweight=False)
+        for name in [n for n in index.docs if n not in seen]:
+            index.remove_document(name, reweight=False)
+        index.compute_weights()
+        return index
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a deterministic JSON-compatible dictionary"""
+        return {
+            "version": INDEX_VERSION,
+            "params": {
+                "k1": self.k1,
+                "b": self.b,
+                "ngram": self.ngram,
+                "field_weights": self.field_weights,
+            },
+            "docs": {name: self.docs[name] for name in sorted(self.docs)},
+            "postings": {
+                term: {name: [self.term_freqs[term][name], round(self.weights[term][name], 6)] for name in sorted(postings)}
+                for term, postings in sorted(self.term_freqs.items())
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TemplateSearchIndex':
+        """Create TemplateSearchIndex from its JSON representation"""
+        version = data.get("version")
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {version}")
+        params = data.get("params", {})
+        index = cls(
+            k1=params.get("k1", 1.2),
+            b=params.get("b", 0.75),
+            ngram=params.get("ngram", 2),
+            field_weights=params.get("field_weights"),
+        )
+        index.docs = data.get("docs", {})
+        for term, postings in data.get("postings", {}).items():
+            index.term_freqs[term] = {name: tf for name, (tf, _) in postings.items()}
+            index.weights[term] = {name: w for name, (_, w) in postings.items()}
+            for name in postings:
+                index.doc_terms.setdefault(name, []).append(term)
+        return index
+
+    @classmethod
+    def load(cls, path: Path) -> 'TemplateSearchIndex':
+        """Load a TemplateSearchIndex from a JSON file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def main() -> None:
+    """Query a template search index from the command line"""
+    parser = argparse.ArgumentParser(description="Rank templates for a free-text request")
+    parser.add_argument("index", help="Path to template search index JSON")
+    parser.add_argument("query", help="Free-text request")
+    parser.add_argument("--limit", "-n", type=int, default=5, help="Maximum number of results (default: 5)")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time N queries and report the mean latency")
+    args = parser.parse_args()
+
+    index = TemplateSearchIndex.load(Path(args.index))
+
+    if args.benchmark:
+        start = time.perf_counter()
+        for _ in range(args.benchmark):
+            index.search(args.query, args.limit)
+        elapsed = (time.perf_counter() - start) / args.benchmark
+        print(f"{elapsed * 1e6:.2f} us/query over {len(index.docs)} templates")
+        return
+
+    for name, score in index.search(args.query, args.limit):
+        print(f"{score:8.3f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Shared fixtures: import paths for the top-level scripts and tools/, and local HTTP servers."""
+
+import http.server
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "tools"))
+
+
+@pytest.fixture
+def http_server():
+    """
+    Start HTTP servers on ephemeral localhost ports for the duration of a test.
+
+    Returns a function taking a request handler class (and optional keyword
+    arguments for it) and returning the server's base URL.
+    """
+    servers = []
+
+    def start(handler_class, **handler_kwargs):
+        handler = lambda *a, **kw: handler_class(*a, **handler_kwargs, **kw)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,142 @@
+"""RangeZipReader against ranged archives served by local HTTP servers."""
+
+import http.server
+import json
+import random
+import zipfile
+
+import pytest
+
+from create_zip import create_zip
+from range_zip import DEFAULT_MAX_GAP, RangeRequestHandler, RangeZipReader, write_range_index
+
+KEY_FILES = {"package.json", "wrangler.jsonc", ".important_files.json", "prompts/usage.md"}
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Plain static handler that ignores Range"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_template(template_dir):
+    """Small template with key files, important files and incompressible filler between them"""
+    rng = random.Random(1)
+    files = {
+        "package.json": json.dumps({"name": "rangetest", "dependencies": {"react": "^18.0.0"}}, indent='\t').encode(),
+        "wrangler.jsonc": b'{\n\t// rangetest\n\t"name": "rangetest"\n}\n',
+        ".important_files.json": json.dumps(["package.json", "src/main.tsx", "worker/"]).encode(),
+        "prompts/selection.md": b"Pick this template for range request tests.\n",
+        "prompts/usage.md": b"Usage notes.\n" * 50,
+        "src/main.tsx": b"export const main = () => 1;\n",
+        "worker/index.ts": b"export default { fetch() { return new Response('ok'); } };\n",
+        "public/logo.png": rng.randbytes(3000),
+    }
+    # Incompressible files larger than DEFAULT_MAX_GAP keep unrelated entries apart
+    for i in range(3):
+        files[f"src/assets/blob{i}.bin"] = rng.randbytes(DEFAULT_MAX_GAP + 1024)
+        files[f"src/pages/page{i}.tsx"] = f"export const Page{i} = () => null;\n".encode()
+    for rel, data in files.items():
+        path = template_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Ranged archive of the test template: (serve directory, zip path, index, expected entry contents)"""
+    template_dir = tmp_path / "rangetest-runner"
+    write_template(template_dir)
+    serve_dir = tmp_path / "serve"
+    serve_dir.mkdir()
+    zip_path = serve_dir / "template.zip"
+    assert create_zip(template_dir, zip_path, ranged=True, deterministic=True)
+    index = write_range_index(zip_path)
+    with zipfile.ZipFile(zip_path) as zf:
+        expected = {info.filename: zf.read(info) for info in zf.infolist() if not info.is_dir()}
+    return serve_dir, zip_path, index, expected
+
+
+@pytest.fixture
+def ranged_url(archive, http_server):
+    return http_server(RangeRequestHandler, directory=str(archive[0])) + "/template.zip"
+
+
+def test_key_files_come_first(archive):
+    _, _, index, _ = archive
+    names = [entry["path"] for entry in index["entries"]]
+    assert names[0] == "package.json"
+    head = {entry["path"] for entry in index["entries"]
+            if entry["offset"] + entry["length"] <= index["head_length"]}
+    assert KEY_FILES <= head
+
+
+def test_read_fetches_one_entry(archive, ranged_url):
+    _, _, index, expected = archive
+    reader = RangeZipReader(ranged_url)
+    assert reader.read("package.json") == expected["package.json"]
+    assert reader.requests == 1
+    assert reader.bytes_fetched < index["archive"]["size"]
+
+
+def test_read_many_coalesces_adjacent_ranges(archive, ranged_url):
+    _, _, index, expected = archive
+    reader = RangeZipReader(ranged_url)
+    assert reader.read_many(list(expected), max_gap=index["archive"]["size"]) == expected
+    assert reader.requests == 1
+
+
+def test_read_many_without_gap_returns_every_entry(archive, ranged_url):
+    _, _, _, expected = archive
+    assert RangeZipReader(ranged_url).read_many(list(expected), max_gap=0) == expected
+
+
+def test_read_many_splits_distant_ranges(archive, ranged_url):
+    _, _, index, expected = archive
+    first, last = index["entries"][0], index["entries"][-1]
+    assert last["offset"] - (first["offset"] + first["length"]) > DEFAULT_MAX_GAP
+    reader = RangeZipReader(ranged_url)
+    paths = [first["path"], last["path"]]
+    assert reader.read_many(paths) == {p: expected[p] for p in paths}
+    assert reader.requests == 2
+
+
+def test_read_head_fetches_key_files_in_one_request(archive, ranged_url):
+    _, _, index, expected = archive
+    reader = RangeZipReader(ranged_url)
+    head = reader.read_head()
+    assert KEY_FILES <= set(head)
+    assert all(head[p] == expected[p] for p in head)
+    assert reader.requests == 1
+    assert reader.bytes_fetched <= index["head_length"]
+
+
+def test_server_ignoring_range_falls_back_to_whole_body(archive, http_server):
+    serve_dir, _, _, expected = archive
+    url = http_server(QuietHandler, directory=str(serve_dir)) + "/template.zip"
+    assert RangeZipReader(url).read_many(list(expected)) == expected
+
+
+def test_crc_mismatch_raises(archive, ranged_url):
+    _, _, index, _ = archive
+    stale_index = json.loads(json.dumps(index))
+    stale_index["entries"][0]["crc32"] ^= 1
+    with pytest.raises(ValueError):
+        RangeZipReader(ranged_url, index=stale_index).read(stale_index["entries"][0]["path"])
+
+
+def test_corrupted_archive_raises(archive, ranged_url):
+    _, zip_path, index, _ = archive
+    reader = RangeZipReader(ranged_url, index=index)
+    first = index["entries"][0]
+    data = bytearray(zip_path.read_bytes())
+    data[first["offset"]:first["offset"] + first["length"]] = bytes(first["length"])
+    zip_path.write_bytes(data)
+    with pytest.raises(ValueError):
+        reader.read(first["path"])
+
+
+def test_local_file_reads(archive):
+    _, zip_path, _, expected = archive
+    assert RangeZipReader(str(zip_path)).read_many(list(expected)) == expected
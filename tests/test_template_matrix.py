@@ -0,0 +1,53 @@
+"""Matrix definitions: the shipped example expands and each variant matches its single-template definition."""
+
+import filecmp
+import json
+
+import pytest
+import yaml
+
+from conftest import REPO_ROOT
+from generate_templates import TemplateGenerator
+from template_matrix import MatrixBuilder, expand_matrix, load_matrix
+
+EXAMPLE = REPO_ROOT / "definitions" / "matrices" / "vite.yaml"
+
+# Variant -> definition built from the same overlay
+EQUIVALENT = {
+    "vite-matrix-do-runner": "vite-cf-DO-runner",
+    "vite-matrix-do-kv-runner": "vite-cf-DO-KV-runner",
+    "vite-matrix-agents-runner": "vite-cfagents-runner",
+}
+
+
+def test_example_expands():
+    variants = load_matrix(EXAMPLE)
+    assert [v.config.name for v in variants] == list(EQUIVALENT)
+    assert variants[1].config.cloudflare.integrations == ["workers", "durable-objects", "kv"]
+    assert variants[1].overlays == ["vite-cf-DO-KV-runner"]
+
+
+def test_example_variants_match_their_definitions(tmp_path):
+    generator = TemplateGenerator(REPO_ROOT)
+    generator.build_dir = tmp_path / "build"
+    generator.locks_dir = generator.build_dir / ".locks"
+    assert MatrixBuilder(generator).build_all(load_matrix(EXAMPLE))
+    for variant, definition in EQUIVALENT.items():
+        assert generator.generate_specific_template(definition)
+        built, reference = generator.build_dir / variant, generator.build_dir / definition
+        files = sorted(p.relative_to(built) for p in built.rglob("*") if p.is_file())
+        assert files == sorted(p.relative_to(reference) for p in reference.rglob("*") if p.is_file())
+        mismatch = filecmp.cmpfiles(built, reference, [str(f) for f in files], shallow=False)[1]
+        assert mismatch == ["package.json"]
+        # Only the package name differs
+        packages = [json.loads((d / "package.json").read_text()) for d in (built, reference)]
+        assert packages[0].pop("name") == variant
+        packages[1].pop("name")
+        assert packages[0] == packages[1]
+
+
+def test_missing_required_field_is_named():
+    data = yaml.safe_load(EXAMPLE.read_text())
+    del data["display_name"]
+    with pytest.raises(ValueError, match="missing required field 'display_name'"):
+        expand_matrix(data)
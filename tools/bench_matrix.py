@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark matrix variant generation throughput (variants per second).
+
+Builds a synthetic root with one reference, one overlay per framework and per
+integration, and a matrix definition of frameworks x integrations variants,
+each with a package.json patch and a few excludes. Then times:
+
+- planned:  MatrixBuilder.build_all (shared layer stacks resolved once)
+- linked:   the same with link=True (unchanged files hardlinked, not copied)
+- naive:    the regular per-template steps for every variant (copy reference,
+            apply each overlay, patch package.json, apply excludes, swap)
+
+All modes produce identical trees; the best of --runs is reported.
+
+Usage:
+    python3 tools/bench_matrix.py --frameworks 5 --integrations 40 --files 500 [--json out.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bench_pipeline import _file_size, _payload, _write
+from generate_templates import TemplateGenerator
+from template_matrix import MatrixBuilder, MatrixVariant, expand_matrix
+
+FRAMEWORKS = ['react', 'nextjs', 'vue', 'angular', 'svelte']
+
+
+def build_synthetic_matrix(root: Path, frameworks: int, integrations: int, files: int, overlay_files: int,
+                           min_size: int, max_size: int, seed: int) -> Dict[str, Any]:
+    """Write reference/ and definitions/ overlays for a synthetic matrix and return the matrix definition"""
+    rng = random.Random(seed)
+    ref_dir = root / "reference" / "bench-reference"
+    rels = []
+    for i in range(files):
+        rel = f"src/d{i % 23}/f{i:06d}.ts"
+        _write(ref_dir / rel, _payload(rng, _file_size(rng, min_size, max_size), False))
+        rels.append(rel)
+    _write(ref_dir / "package.json", json.dumps({"name": "bench", "dependencies": {"react": "^18.0.0"}}, indent='\t').encode())
+    _write(ref_dir / "wrangler.jsonc", b'{\n  "name": "bench"\n}\n')
+
+    def overlay(name: str) -> None:
+        for rel in rng.sample(rels, min(overlay_files // 2, len(rels))):
+            _write(root / "definitions" / name / rel, _payload(rng, _file_size(rng, min_size, max_size), False))
+        for i in range(overlay_files - overlay_files // 2):
+            _write(root / "definitions" / name / "src" / name / f"o{i:04d}.ts", _payload(rng, 200, False))
+
+    framework_values = {}
+    for f in range(frameworks):
+        key = f"fw{f}"
+        overlay(key)
+        framework_values[key] = {"framework": {"type": FRAMEWORKS[f % len(FRAMEWORKS)]}, "overlays": [key]}
+    integration_values = {}
+    for n in range(integrations):
+        key = f"int{n}"
+        overlay(key)
+        integration_values[key] = {
+            "cloudflare": {"integrations": ["workers"]},
+            "overlays": [key],
+            "excludes": sorted(rng.sample(rels, min(3, len(rels)))),
+            "overrides": {"package_json_patches": {"dependencies": {f"pkg-{key}": "^1.0.0"}}},
+        }
+    return {
+        "matrix": 1,
+        "name": "bench-{framework}-{integration}-runner",
+        "display_name": "Bench {framework} {integration}",
+        "description": "Synthetic matrix variant",
+        "base_reference": "bench-reference",
+        "framework": {"type": "react"},
+        "overrides": {"package_json_patches": {"private": True}},
+        "axes": {"framework": framework_values, "integration": integration_values},
+    }
+
+
+def build_naive(generator: TemplateGenerator, variant: MatrixVariant) -> None:
+    """One variant through the regular generate_template_from_yaml steps"""
+    name = variant.config.name
+    staging_dir = generator.create_staging_dir(name)
+    try:
+        generator.copy_reference_template(variant.config.base_reference, staging_dir)
+        for overlay in variant.overlays:
+            generator.apply_template_specific_files(overlay, staging_dir)
+        if variant.config.overrides.package_json_patches:
+            generator.apply_package_patches(staging_dir, variant.config.overrides.package_json_patches)
+        generator.apply_excludes(staging_dir, variant.excludes)
+        generator.swap_into_place(staging_dir, generator.build_dir / name)
+    finally:
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def best_time(fn, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        # Per-file log lines would dominate the timings
+        with contextlib.redirect_stderr(io.StringIO()):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark matrix variant generation throughput")
+    parser.add_argument("--frameworks", type=int, default=5, help="Framework axis size (default: 5)")
+    parser.add_argument("--integrations", type=int, default=20, help="Integration axis size (default: 20)")
+    parser.add_argument("--files", type=int, default=500, help="Files in the reference (default: 500)")
+    parser.add_argument("--overlay-files", type=int, default=20, help="Files per overlay (default: 20)")
+    parser.add_argument("--min-size", type=int, default=200, help="Minimum file size in bytes (default: 200)")
+    parser.add_argument("--max-size", type=int, default=20000, help="Maximum file size in bytes (default: 20000)")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions; best time is reported (default: 3)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    parser.add_argument("--skip-naive", action="store_true", help="Only time the matrix builder modes")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"params": vars(args).copy()}
+    with tempfile.TemporaryDirectory(prefix="bench-matrix-") as work:
+        root = Path(work)
+        matrix = build_synthetic_matrix(root, args.frameworks, args.integrations, args.files, args.overlay_files,
+                                        args.min_size, args.max_size, args.seed)
+        variants: List[MatrixVariant] = expand_matrix(matrix)
+        results["variants"] = len(variants)
+
+        # Fresh generators per run so index caches do not carry over between runs
+        def planned() -> None:
+            MatrixBuilder(TemplateGenerator(root)).build_all(variants)
+
+        def linked() -> None:
+            MatrixBuilder(TemplateGenerator(root), link=True).build_all(variants)
+
+        def naive() -> None:
+            generator = TemplateGenerator(root)
+            generator.build_dir.mkdir(parents=True, exist_ok=True)
+            for variant in variants:
+                build_naive(generator, variant)
+
+        modes = {"planned": planned, "linked": linked}
+        if not args.skip_naive:
+            modes["naive"] = naive
+        for mode, fn in modes.items():
+            seconds = best_time(fn, args.runs)
+            results[mode] = {"seconds": seconds, "variants_per_second": len(variants) / seconds}
+            print(f"{mode:<8} {len(variants)} variants in {seconds:7.3f}s  {len(variants) / seconds:8.1f} variants/s")
+        if "naive" in results:
+            for mode in ("planned", "linked"):
+                print(f"{mode} speedup over naive: {results['naive']['seconds'] / results[mode]['seconds']:.2f}x")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Results written to {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Synthetic-scale benchmark for every pipeline stage.
+
+Builds synthetic reference/ and definitions/ trees of configurable size, then
+times each stage separately with the real code:
+
+- generate:  TemplateGenerator.generate_all_templates (copy + overlays + excludes)
+- excludes:  TemplateGenerator.apply_excludes on fresh copies of the built trees
+- verify:    TemplateGenerator.verify_all against originals/ (a copy of the build)
+- catalog:   find_template_dirs + process_template + serialize/write
+- zip:       create_zip for every built template
+
+Comma-separated --templates/--files values run every combination as its own
+scenario; each stage reports its best time over --runs repetitions. Results
+are written as JSON; --compare flags stages that got slower than a stored
+baseline by more than --threshold.
+
+Usage:
+    python3 tools/bench_pipeline.py --templates 10,100 --files 100,2000 --json bench.json
+    python3 tools/bench_pipeline.py --templates 10,100 --files 100,2000 --compare bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_templates import TemplateGenerator
+from generate_template_catalog import find_template_dirs, process_template, serialize_json, write_catalog_file
+from create_zip import create_zip
+
+STAGES = ["generate", "excludes", "verify", "catalog", "zip"]
+
+PACKAGE_DEPENDENCIES = ["react", "vite", "hono", "zod", "tailwindcss", "@cloudflare/workers-types", "zustand", "lucide-react"]
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v]
+
+
+def _file_size(rng: random.Random, min_size: int, max_size: int) -> int:
+    # Log-uniform: mostly small source files with a long tail of large assets
+    return int(round(min_size * (max_size / min_size) ** rng.random()))
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _payload(rng: random.Random, size: int, binary: bool) -> bytes:
+    if binary:
+        return rng.randbytes(size)
+    line = b"export const value = 'synthetic template content';\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def build_synthetic_root(root: Path, templates: int, references: int, files: int, min_size: int, max_size: int,
+                         binary_ratio: float, overlay_ratio: float, exclude_ratio: float, seed: int) -> Dict[str, int]:
+    """
+    Create reference/ and definitions/ trees for a scenario.
+
+    Every reference holds `files` files spread over nested directories plus the
+    files a valid template needs. Each template overlays `overlay_ratio` of its
+    reference's files (half replacements, half new files) and excludes
+    `exclude_ratio` of them.
+
+    Returns:
+        Counts of files written per kind
+    """
+    rng = random.Random(seed)
+    counts = {"reference_files": 0, "overlay_files": 0}
+    reference_files: Dict[str, List[str]] = {}
+
+    for r in range(references):
+        ref_name = f"ref-{r}"
+        ref_dir = root / "reference" / ref_name
+        rels = []
+        for i in range(files):
+            depth = i % 4
+            parts = [f"d{(i // 50) % 20}", f"s{(i // 7) % 9}", f"t{i % 5}"][:depth]
+            binary = rng.random() < binary_ratio
+            rel = '/'.join(parts + [f"f{i:06d}.{'bin' if binary else 'ts'}"])
+            _write(ref_dir / rel, _payload(rng, _file_size(rng, min_size, max_size), binary))
+            rels.append(rel)
+        package = {"name": ref_name, "dependencies": {dep: "^1.0.0" for dep in PACKAGE_DEPENDENCIES}}
+        _write(ref_dir / "package.json", json.dumps(package, indent='\t').encode('utf-8'))
+        _write(ref_dir / "wrangler.jsonc", b'{\n  // synthetic\n  "name": "synthetic"\n}\n')
+        reference_files[ref_name] = rels
+        counts["reference_files"] += len(rels) + 2
+
+    for t in range(templates):
+        name = f"synthetic-{t:04d}"
+        ref_name = f"ref-{t % references}"
+        rels = reference_files[ref_name]
+        overlay_dir = root / "definitions" / name
+        overlay_count = int(len(rels) * overlay_ratio)
+        for rel in rng.sample(rels, min(overlay_count // 2, len(rels))):
+            _write(overlay_dir / rel, _payload(rng, _file_size(rng, min_size, max_size), rel.endswith('.bin')))
+        for i in range(overlay_count - overlay_count // 2):
+            _write(overlay_dir / "src" / "overlay" / f"o{i:05d}.ts", _payload(rng, _file_size(rng, min_size, max_size), False))
+        _write(overlay_dir / "prompts" / "selection.md", f"Use {name} for synthetic benchmark apps.\n".encode('utf-8'))
+        _write(overlay_dir / "prompts" / "usage.md", f"# {name}\n\nRun `bun dev`.\n".encode('utf-8'))
+        counts["overlay_files"] += overlay_count + 2
+
+        excludes = sorted(rng.sample(rels, min(int(len(rels) * exclude_ratio), len(rels))))
+        lines = [f"name: {name}", f"description: Synthetic template {t}", f"base_reference: {ref_name}"]
+        if excludes:
+            lines.append("excludes:")
+            lines.extend(f"  - '{rel}'" for rel in excludes)
+        _write(root / "definitions" / f"{name}.yaml", ('\n'.join(lines) + '\n').encode('utf-8'))
+    return counts
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_scenario(work: Path, params: Dict[str, Any], runs: int = 1) -> Dict[str, Any]:
+    """Build a synthetic root under work and time every stage (best of runs)"""
+    root = work / f"t{params['templates']}-f{params['files']}"
+    counts = build_synthetic_root(
+        root, params["templates"], params["references"], params["files"], params["min_size"], params["max_size"],
+        params["binary_ratio"], params["overlay_ratio"], params["exclude_ratio"], params["seed"],
+    )
+    generator = TemplateGenerator(root)
+    timings: Dict[str, float] = {stage: float('inf') for stage in STAGES}
+    quiet = io.StringIO()
+    catalog_file = root / "template_catalog.json"
+    zips_dir = root / "zips"
+    zips_dir.mkdir()
+
+    def build_catalog() -> None:
+        valid_dirs, _ = find_template_dirs(generator.build_dir)
+        write_catalog_file(catalog_file, serialize_json([process_template(d) for d in valid_dirs], True), False)
+
+    for run in range(runs):
+        # Each run starts cold: no cached source indexes or digests
+        generator.invalidate_source_cache()
+        generator._hash_cache.clear()
+        with contextlib.redirect_stderr(quiet), contextlib.redirect_stdout(quiet):
+            elapsed = _timed(generator.generate_all_templates)
+            timings["generate"] = min(timings["generate"], elapsed)
+            built = sorted(p for p in generator.build_dir.iterdir() if p.is_dir() and not p.name.startswith('.'))
+
+            # Excludes: fresh unexcluded copies so the stage has work to do
+            scratch = root / "excludes-scratch"
+            pending = []
+            for template_dir in built:
+                config = generator.load_definition(generator.definitions_dir / f"{template_dir.name}.yaml")
+                copy_dir = scratch / template_dir.name
+                generator.copy_reference_template(config["base_reference"], copy_dir)
+                pending.append((copy_dir, config.get("excludes") or []))
+            elapsed = _timed(lambda: [generator.apply_excludes(d, patterns) for d, patterns in pending])
+            timings["excludes"] = min(timings["excludes"], elapsed)
+            shutil.rmtree(scratch)
+
+            # Verification compares every file, so originals are an exact copy
+            if run == 0:
+                shutil.copytree(generator.build_dir, generator.originals_dir,
+                                ignore=shutil.ignore_patterns(f"*{generator.STAGING_TAG}*"))
+            generator._hash_cache.clear()
+            timings["verify"] = min(timings["verify"], _timed(lambda: generator.verify_all(summary_only=True)))
+
+            timings["catalog"] = min(timings["catalog"], _timed(build_catalog))
+
+            elapsed = _timed(lambda: [create_zip(d, zips_dir / f"{d.name}.zip") for d in built])
+            timings["zip"] = min(timings["zip"], elapsed)
+        quiet.seek(0)
+        quiet.truncate()
+
+    build_files = sum(len(files) for _, _, files in os.walk(generator.build_dir))
+    zip_bytes = sum(p.stat().st_size for p in zips_dir.iterdir())
+    shutil.rmtree(root)
+    return {
+        "params": params,
+        "runs": runs,
+        "timings": {stage: round(timings[stage], 4) for stage in STAGES},
+        "counts": dict(counts, build_files=build_files, zip_bytes=zip_bytes),
+    }
+
+
+def scenario_key(params: Dict[str, Any]) -> str:
+    return ','.join(f"{k}={params[k]}" for k in sorted(params))
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_seconds: float) -> List[str]:
+    """
+    Find stages that got slower than the baseline by more than threshold.
+
+    Stages faster than min_seconds in both runs are ignored as noise.
+
+    Returns:
+        Human-readable regression descriptions
+    """
+    previous = {scenario_key(s["params"]): s for s in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in results["scenarios"]:
+        base = previous.get(scenario_key(scenario["params"]))
+        if base is None:
+            continue
+        label = f"templates={scenario['params']['templates']} files={scenario['params']['files']}"
+        for stage in STAGES:
+            new, old = scenario["timings"][stage], base["timings"].get(stage)
+            if old is None or max(new, old) < min_seconds:
+                continue
+            ratio = new / old if old else float('inf')
+            if ratio > 1 + threshold:
+                regressions.append(f"{label} {stage}: {old:.3f}s -> {new:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark generation, excludes, verification, catalog and zip at synthetic scale")
+    parser.add_argument("--templates", type=_int_list, default=[10], help="Template counts, comma-separated (default: 10)")
+    parser.add_argument("--files", type=_int_list, default=[100], help="Files per reference, comma-separated (default: 100)")
+    parser.add_argument("--references", type=int, default=2, help="Number of references shared by the templates (default: 2)")
+    parser.add_argument("--min-size", type=int, default=64, help="Smallest file size in bytes (default: 64)")
+    parser.add_argument("--max-size", type=int, default=256 * 1024, help="Largest file size in bytes (default: 262144)")
+    parser.add_argument("--binary-ratio", type=float, default=0.1, help="Fraction of binary (incompressible) files (default: 0.1)")
+    parser.add_argument("--overlay-ratio", type=float, default=0.1, help="Overlay files per template as a fraction of reference files (default: 0.1)")
+    parser.add_argument("--exclude-ratio", type=float, default=0.05, help="Excluded files per template as a fraction of reference files (default: 0.05)")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per scenario; best time per stage is reported (default: 3)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic trees (default: 1)")
+    parser.add_argument("--workdir", help="Directory for synthetic trees (default: system temp)")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a stored results file and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before flagging, as a fraction (default: 0.2)")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore stages faster than this in both runs (default: 0.05)")
+    args = parser.parse_args()
+
+    if args.references < 1 or args.min_size < 1 or args.max_size < args.min_size:
+        parser.error("need --references >= 1 and 1 <= --min-size <= --max-size")
+
+    results: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-", dir=args.workdir) as tmp:
+        for templates in args.templates:
+            for files in args.files:
+                params = {
+                    "templates": templates, "files": files, "references": args.references,
+                    "min_size": args.min_size, "max_size": args.max_size, "binary_ratio": args.binary_ratio,
+                    "overlay_ratio": args.overlay_ratio, "exclude_ratio": args.exclude_ratio, "seed": args.seed,
+                }
+                print(f"templates={templates} files={files} ...", file=sys.stderr)
+                scenario = run_scenario(Path(tmp), params, max(1, args.runs))
+                results["scenarios"].append(scenario)
+                timings = scenario["timings"]
+                print(f"templates={templates:<5} files={files:<6} " +
+                      "  ".join(f"{stage} {timings[stage]:8.3f}s" for stage in STAGES))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Results written to {args.json}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark CLI startup for the generator, catalog and packaging scripts.
+
+Each command is a no-op run (argument parsing only, or a scan of an empty
+directory). It is run once to warm the bytecode and page caches, then timed;
+the best wall time is reported next to the bare interpreter's. The budget
+applies to the time over `python -c pass`, i.e. what the script itself costs,
+so the check means the same on machines whose interpreter starts slower. With
+--importtime, the slowest imports from `python -X importtime` are listed too.
+
+Usage:
+    python3 tools/bench_startup.py [--runs 20] [--budget-ms 50] [--importtime] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def commands(empty_dir: str) -> Dict[str, List[str]]:
+    return {
+        "generate_templates --help": [str(ROOT / "tools" / "generate_templates.py"), "--help"],
+        "generate_template_catalog (empty dir)": [str(ROOT / "generate_template_catalog.py"), "-d", empty_dir, "-o", os.devnull],
+        "create_zip --help": [str(ROOT / "create_zip.py"), "--help"],
+        "template_daemon --help": [str(ROOT / "template_daemon.py"), "--help"],
+    }
+
+
+def best_wall_ms(argv: List[str], runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs + 1):  # the first run only warms caches
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=ROOT)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def slowest_imports(argv: List[str], count: int) -> List[Tuple[str, float]]:
+    """Top-level imports by cumulative time (ms) from -X importtime"""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + argv,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, cwd=ROOT)
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split('|')
+        # Only top-level entries; nested imports are already in their parent's total
+        if not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time")
+    parser.add_argument("--runs", type=int, default=20, help="Repetitions; best time is reported (default: 20)")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Fail if any command takes longer than this over `python -c pass` (default: 50)")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports per command")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as empty_dir:
+        results["python -c pass"] = {"wall_ms": best_wall_ms(["-c", "pass"], args.runs)}
+        for name, argv in commands(empty_dir).items():
+            entry: Dict = {"wall_ms": best_wall_ms(argv, args.runs)}
+            if args.importtime:
+                entry["slowest_imports_ms"] = dict(slowest_imports(argv, 5))
+            results[name] = entry
+
+    baseline_ms = results["python -c pass"]["wall_ms"]
+    over_budget = []
+    for name, entry in results.items():
+        if name == "python -c pass":
+            print(f"{name:<40} {entry['wall_ms']:7.1f} ms")
+            continue
+        entry["over_interpreter_ms"] = entry["wall_ms"] - baseline_ms
+        print(f"{name:<40} {entry['wall_ms']:7.1f} ms  (+{entry['over_interpreter_ms']:.1f} ms)")
+        for module, ms in entry.get("slowest_imports_ms", {}).items():
+            print(f"    {module:<36} {ms:7.1f} ms")
+        if entry["over_interpreter_ms"] > args.budget_ms:
+            over_budget.append(name)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"budget_ms": args.budget_ms, "results": results}, f, indent=2)
+            f.write('\n')
+        print(f"Results written to {args.json}", file=sys.stderr)
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:g} ms budget (beyond {baseline_ms:.1f} ms interpreter start): "
+              f"{', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
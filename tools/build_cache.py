@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Shared build cache for generated templates.
+
+A template's build output is fully determined by its definition YAML, the
+contents of its base reference and overlay directory, and the tooling that
+combines them. build_cache hashes those inputs into a fingerprint and stores
+the artifacts of a build under it, so CI runners (or developers) that share a
+cache skip regenerating, zipping and cataloguing templates whose inputs did
+not change:
+
+    <cache>/v1/<aa>/<fingerprint>/manifest.json   built tree: {"name", "fingerprint", "files": {path: {"sha256", "size", "mode"}}}
+    <cache>/v1/<aa>/<fingerprint>/tree.zip        built tree contents
+    <cache>/v1/<aa>/<fingerprint>/archive.zip     published template zip (packaging step)
+    <cache>/v1/<aa>/<fingerprint>/catalog.json    catalog entry (packaging step)
+
+Backends are chosen by a spec string:
+    dir:<path> or a plain path   local or mounted directory (e.g. actions/cache)
+    http(s)://host/prefix        GET/PUT under a base URL (a 404 is a miss)
+
+Cache problems never fail a build: unreadable or corrupt entries are misses
+and failed pushes are logged and ignored.
+
+Usage:
+    python3 tools/build_cache.py fingerprint [-t template] [--root .]
+    python3 tools/generate_templates.py --build-cache dir:.build-cache
+    python3 deploy_pipeline.py --build-cache https://cache.example.com/templates --uploader ...
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from fastcopy import hash_file
+from generate_templates import TemplateGenerator, log_error, log_warn
+
+CACHE_FORMAT_VERSION = 1
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Everything that turns inputs into artifacts; editing any of these changes
+# every fingerprint
+TOOL_SOURCES = [
+    _REPO_ROOT / "tools" / "generate_templates.py",
+    _REPO_ROOT / "tools" / "fastcopy.py",
+    _REPO_ROOT / "tools" / "tree_index.py",
+    _REPO_ROOT / "tools" / "build_cache.py",
+    _REPO_ROOT / "tools" / "config_patch.py",
+    _REPO_ROOT / "tools" / "template_matrix.py",
+    _REPO_ROOT / "create_zip.py",
+    _REPO_ROOT / "range_zip.py",
+    _REPO_ROOT / "content_pack.py",
+    _REPO_ROOT / "generate_template_catalog.py",
+]
+
+# Fixed timestamp for tree.zip entries so identical trees give identical bytes
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_tool_version: Optional[str] = None
+
+
+def tool_version() -> str:
+    """Digest of the cache format and the generator/packaging sources"""
+    global _tool_version
+    if _tool_version is None:
+        import hashlib
+
+        h = hashlib.sha256(f"build-cache/{CACHE_FORMAT_VERSION}\n".encode())
+        for path in TOOL_SOURCES:
+            h.update(f"{path.relative_to(_REPO_ROOT).as_posix()}\0".encode())
+            h.update(path.read_bytes() if path.exists() else b"")
+            h.update(b"\0")
+        _tool_version = h.hexdigest()
+    return _tool_version
+
+
+class CacheBackend:
+    """Stores opaque objects under relative keys"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Object contents, or None when it is not cached"""
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+
+class DirectoryCache(CacheBackend):
+    """Objects as files under a directory; writes are atomic, so concurrent writers are safe"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.root / key, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        target = self.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+
+class HttpCache(CacheBackend):
+    """Objects at <base_url>/<key>: GET to fetch (404 is a miss), PUT to store"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/{key}", timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code in (403, 404):
+                return None
+            raise
+
+    def put(self, key: str, data: bytes) -> None:
+        request = urllib.request.Request(f"{self.base_url}/{key}", data=data, method='PUT')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"PUT {key} returned HTTP {response.status}")
+
+
+BACKEND_FACTORIES: Dict[str, Callable[[str], CacheBackend]] = {
+    "dir": lambda arg: DirectoryCache(Path(arg)),
+}
+
+
+def make_backend(spec: str) -> CacheBackend:
+    """
+    Create a cache backend from a spec string.
+
+    Args:
+        spec: "dir:<path>", an http(s) base URL, or a plain directory path
+
+    Returns:
+        CacheBackend instance
+
+    Raises:
+        ValueError: for an empty spec or unknown backend kind
+    """
+    if spec.startswith(('http://', 'https://')):
+        return HttpCache(spec)
+    kind, sep, arg = spec.partition(':')
+    if not sep:
+        if not spec:
+            raise ValueError("Empty build cache spec")
+        return DirectoryCache(Path(spec))
+    factory = BACKEND_FACTORIES.get(kind)
+    if factory is None or not arg:
+        raise ValueError(f"Unknown build cache spec: {spec}")
+    return factory(arg)
+
+
+class BuildCache:
+    """Fingerprints template inputs and moves build artifacts to and from a backend"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._file_digests: Dict[tuple, str] = {}
+
+    # ===== Fingerprints =====
+    def _file_digest(self, entry: os.DirEntry) -> str:
+        # Reference files are shared by many templates; hash each once per run
+        # while its stat is unchanged
+        st = entry.stat()
+        key = (entry.path, st.st_size, st.st_mtime_ns, st.st_ino)
+        digest = self._file_digests.get(key)
+        if digest is None:
+            digest = hash_file(entry.path, 'sha256')
+            with self._lock:
+                self._file_digests[key] = digest
+        return digest
+
+    def _hash_tree(self, h, label: str, generator: TemplateGenerator, src: Path) -> None:
+        h.update(f"{label}\0".encode())
+        if not src.is_dir():
+            h.update(b"missing\0")
+            return
+        index = generator.index_source_tree(src)
+        for rel in index.sorted_files():
+            entry = index.files[rel]
+            mode = 0o755 if entry.stat().st_mode & 0o111 else 0o644
+            h.update(f"{rel}\0{mode:o}\0{self._file_digest(entry)}\n".encode())
+
+    def fingerprint(self, generator: TemplateGenerator, yaml_file: Path) -> str:
+        """
+        Fingerprint of everything a template's build depends on.
+
+        Covers the tool version, the raw definition YAML, and every file of the
+        base reference and the definition directory that the generator could
+        copy (DEFAULT_IGNORES applied), by path, executable bit and SHA-256.
+
+        Args:
+            generator: Generator whose reference/ and definitions/ are used
+            yaml_file: Template definition
+
+        Returns:
+            Hex digest
+        """
+        import hashlib
+
+        config = generator.load_definition(yaml_file)
+        template_name = config['name']
+        base_reference = config.get('base_reference', 'shared-reference')
+
+        h = hashlib.sha256(f"tool\0{tool_version()}\n".encode())
+        h.update(b"definition\0")
+        h.update(Path(yaml_file).read_bytes())
+        h.update(b"\n")
+        self._hash_tree(h, f"reference/{base_reference}", generator, generator.reference_dir / base_reference)
+        self._hash_tree(h, f"definitions/{template_name}", generator, generator.definitions_dir / template_name)
+        return h.hexdigest()
+
+    # ===== Backend access =====
+    @staticmethod
+    def _key(fingerprint: str, artifact: str) -> str:
+        return f"v{CACHE_FORMAT_VERSION}/{fingerprint[:2]}/{fingerprint}/{artifact}"
+
+    def get_artifact(self, fingerprint: str, artifact: str) -> Optional[bytes]:
+        """Cached artifact bytes, or None on a miss or backend error"""
+        try:
+            data = self.backend.get(self._key(fingerprint, artifact))
+        except Exception as e:
+            log_warn(f"Build cache read failed for {artifact} ({fingerprint[:12]}): {e}")
+            data = None
+        return data
+
+    def put_artifact(self, fingerprint: str, artifact: str, data: bytes) -> bool:
+        """Store an artifact; returns False (after a warning) if the backend failed"""
+        try:
+            self.backend.put(self._key(fingerprint, artifact), data)
+            return True
+        except Exception as e:
+            log_warn(f"Build cache write failed for {artifact} ({fingerprint[:12]}): {e}")
+            return False
+
+    # ===== Built trees =====
+    def store_tree(self, fingerprint: str, template_name: str, tree_dir: Path) -> bool:
+        """
+        Push a built tree: its contents as tree.zip, then manifest.json.
+
+        The manifest is written last, so readers never see a manifest whose
+        tree.zip is missing.
+
+        Returns:
+            True if both objects were stored
+        """
+        import hashlib
+        from tree_index import index_tree
+
+        index = index_tree(tree_dir)
+        files: Dict[str, Dict[str, Any]] = {}
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            for rel in index.sorted_files():
+                entry = index.files[rel]
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+                mode = entry.stat().st_mode & 0o777
+                info = zipfile.ZipInfo(rel, date_time=_ZIP_DATE_TIME)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = (0o100000 | mode) << 16
+                zf.writestr(info, data)
+                files[rel] = {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data), "mode": mode}
+        manifest = {
+            "version": CACHE_FORMAT_VERSION,
+            "name": template_name,
+            "fingerprint": fingerprint,
+            "files": files,
+        }
+        if not self.put_artifact(fingerprint, "tree.zip", buffer.getvalue()):
+            return False
+        return self.put_artifact(fingerprint, "manifest.json", json.dumps(manifest, sort_keys=True).encode())
+
+    def fetch_tree(self, fingerprint: str, dest_dir: Path) -> bool:
+        """
+        Restore a cached tree into an empty directory, checking every file against the manifest.
+
+        On any mismatch or backend error nothing is trusted: dest_dir may hold
+        partial output and the caller must discard it.
+
+        Returns:
+            True if the tree was restored and verified
+        """
+        import hashlib
+
+        raw_manifest = self.get_artifact(fingerprint, "manifest.json")
+        if raw_manifest is None:
+            return False
+        raw_tree = self.get_artifact(fingerprint, "tree.zip")
+        if raw_tree is None:
+            return False
+        try:
+            manifest = json.loads(raw_manifest)
+            if manifest.get("version") != CACHE_FORMAT_VERSION or manifest.get("fingerprint") != fingerprint:
+                raise ValueError("manifest does not match fingerprint")
+            files = manifest["files"]
+            dest_root = Path(dest_dir).resolve()
+            with zipfile.ZipFile(io.BytesIO(raw_tree)) as zf:
+                names = [n for n in zf.namelist() if not n.endswith('/')]
+                if sorted(names) != sorted(files):
+                    raise ValueError("tree.zip does not match manifest")
+                for rel in names:
+                    target = (dest_root / rel).resolve()
+                    if dest_root not in target.parents:
+                        raise ValueError(f"unsafe path in tree.zip: {rel}")
+                    data = zf.read(rel)
+                    expected = files[rel]
+                    if len(data) != expected["size"] or hashlib.sha256(data).hexdigest() != expected["sha256"]:
+                        raise ValueError(f"content mismatch for {rel}")
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    with open(target, 'wb') as f:
+                        f.write(data)
+                    os.chmod(target, expected["mode"])
+            return True
+        except Exception as e:
+            log_warn(f"Ignoring corrupt build cache entry {fingerprint[:12]}: {e}")
+            return False
+
+
+def make_build_cache(spec: str) -> BuildCache:
+    """BuildCache over the backend described by spec (see make_backend)"""
+    return BuildCache(make_backend(spec))
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Inspect template build cache fingerprints")
+    parser.add_argument("command", choices=["fingerprint"], help="fingerprint: print each template's cache key")
+    parser.add_argument("--root", "-r", default=".", help="Root directory containing reference/ and definitions/")
+    parser.add_argument("--template", "-t", action="append", help="Template (repeatable; default: all definitions)")
+    args = parser.parse_args()
+
+    generator = TemplateGenerator(Path(args.root).resolve())
+    names = args.template or sorted(p.stem for p in generator.definitions_dir.glob("*.yaml"))
+    cache = BuildCache(CacheBackend())
+    ok = True
+    for name in names:
+        yaml_file = generator.definitions_dir / f"{name}.yaml"
+        if not yaml_file.exists():
+            log_error(f"Template definition not found: {yaml_file}")
+            ok = False
+            continue
+        print(f"{cache.fingerprint(generator, yaml_file)}  {name}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Cross-process coordination for a shared build/ workspace.
+
+Writers (template generation, cleaning build/) take fcntl.flock locks on files
+under build/.locks:
+
+    workspace.lock     shared while building any template, exclusive to clean build/
+    <template>.lock    exclusive while building that template
+
+flock locks belong to the open file description, so they also exclude threads
+of the same process that open the lock file separately, and they are released
+by the kernel when a process dies. Where fcntl is unavailable the locks are
+no-ops, as before.
+
+Readers (zip, catalog) take no locks. Finished builds are only ever published
+by renaming a complete staging tree over build/<template>, so a reader notes
+the tree's generation (inode and ctime of the directory; a rename changes
+both) before and after reading and retries if a new build was swapped in
+meanwhile, seqlock-style.
+"""
+
+import contextlib
+import os
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple, TypeVar, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+PathLike = Union[str, Path]
+T = TypeVar('T')
+
+
+@contextlib.contextmanager
+def file_lock(path: PathLike, shared: bool = False, on_wait: Optional[Callable[[], None]] = None) -> Iterator[None]:
+    """
+    Hold an flock on path (created if missing) for the duration of the block.
+
+    Args:
+        path: Lock file
+        shared: Take a shared instead of an exclusive lock
+        on_wait: Called once if the lock is busy, before blocking on it
+    """
+    os.makedirs(os.path.dirname(os.fspath(path)) or '.', exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if on_wait is not None:
+                    on_wait()
+                fcntl.flock(fd, mode)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def tree_generation(path: PathLike) -> Optional[Tuple[int, int]]:
+    """Identity of the tree currently published at path, or None if there is none"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_ctime_ns)
+
+
+class TreeChangedError(RuntimeError):
+    """A published tree kept being replaced while it was read"""
+
+
+def read_stable(path: PathLike, read: Callable[[Path], T], attempts: int = 5) -> T:
+    """
+    Run read(path) without locks, retrying while a new build replaces the tree.
+
+    An OSError from read is only retried when the tree changed underneath it
+    (e.g. a file vanished as the previous build was removed); otherwise it
+    propagates.
+
+    Args:
+        path: Published tree (e.g. build/<template>)
+        read: Function reading the tree; must not have side effects that a retry would repeat
+        attempts: Maximum number of reads
+
+    Returns:
+        Result of the first read that saw a single generation of the tree
+
+    Raises:
+        TreeChangedError: if every attempt overlapped a swap
+    """
+    path = Path(path)
+    for _ in range(attempts):
+        before = tree_generation(path)
+        try:
+            result = read(path)
+        except OSError:
+            if tree_generation(path) == before:
+                raise
+            continue
+        if tree_generation(path) == before:
+            return result
+    raise TreeChangedError(f"{path} was replaced during each of {attempts} reads")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Structured patches for template config files.
+
+JSON and JSONC files (wrangler.jsonc, tsconfig.json, ...) are patched in place
+as text: the file is parsed into value spans, and a merge patch only rewrites
+the spans it changes. Comments, key order, indentation and untouched values
+are kept byte for byte. Patch semantics match package_patches: mappings merge
+recursively, null removes a key, anything else (including arrays) replaces.
+
+Other files take literal or regex replacements:
+
+    {"find": "Hello", "replace": "Hi"}                       every occurrence
+    {"regex": "compat_date = \\"[^\\"]*\\"", "replace": "...", "count": 1}
+
+A rule that matches nothing is an error, so patches fail loudly when the base
+file changes underneath them. apply_file_patches reads and writes each file
+once, whatever mix of operations targets it.
+"""
+
+import functools
+import json
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class PatchError(ValueError):
+    """A patch could not be applied"""
+
+
+class _Node:
+    """Span of a JSON value; objects also keep their members"""
+    __slots__ = ('kind', 'start', 'end', 'members')
+
+    def __init__(self, kind: str, start: int, end: int, members: Optional[List['_Member']] = None):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.members = members
+
+
+class _Member:
+    """Object member: key span, value node and the position of its trailing comma"""
+    __slots__ = ('key', 'key_start', 'value', 'comma')
+
+    def __init__(self, key: str, key_start: int, value: _Node, comma: Optional[int]):
+        self.key = key
+        self.key_start = key_start
+        self.value = value
+        self.comma = comma
+
+
+_LITERAL = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null')
+_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"')
+
+
+def _skip(text: str, i: int) -> int:
+    """Skip whitespace and comments"""
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in ' \t\r\n\ufeff':
+            i += 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end + 1
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            if end < 0:
+                raise PatchError(f"Unterminated comment at offset {i}")
+            i = end + 2
+        else:
+            break
+    return i
+
+
+def _parse_value(text: str, i: int) -> _Node:
+    i = _skip(text, i)
+    if i >= len(text):
+        raise PatchError("Unexpected end of input")
+    c = text[i]
+    if c == '{':
+        start = i
+        members: List[_Member] = []
+        i = _skip(text, i + 1)
+        while text[i:i + 1] != '}':
+            match = _STRING.match(text, i)
+            if match is None:
+                raise PatchError(f"Expected a string key at offset {i}")
+            key = json.loads(match.group())
+            i = _skip(text, match.end())
+            if text[i:i + 1] != ':':
+                raise PatchError(f"Expected ':' at offset {i}")
+            value = _parse_value(text, i + 1)
+            i = _skip(text, value.end)
+            comma = None
+            if text[i:i + 1] == ',':
+                comma = i
+                i = _skip(text, i + 1)
+            elif text[i:i + 1] != '}':
+                raise PatchError(f"Expected ',' or '}}' at offset {i}")
+            members.append(_Member(key, match.start(), value, comma))
+        return _Node('object', start, i + 1, members)
+    if c == '[':
+        start = i
+        i = _skip(text, i + 1)
+        while text[i:i + 1] != ']':
+            value = _parse_value(text, i)
+            i = _skip(text, value.end)
+            if text[i:i + 1] == ',':
+                i = _skip(text, i + 1)
+            elif text[i:i + 1] != ']':
+                raise PatchError(f"Expected ',' or ']' at offset {i}")
+        return _Node('array', start, i + 1)
+    match = (_STRING if c == '"' else _LITERAL).match(text, i)
+    if match is None:
+        raise PatchError(f"Unexpected character {c!r} at offset {i}")
+    return _Node('scalar', i, match.end())
+
+
+def parse_jsonc(text: str) -> _Node:
+    """Parse JSON/JSONC text into value spans (comments and trailing commas allowed)"""
+    root = _parse_value(text, 0)
+    if _skip(text, root.end) != len(text):
+        raise PatchError(f"Unexpected content after the top-level value at offset {_skip(text, root.end)}")
+    return root
+
+
+def _line_start(text: str, i: int) -> int:
+    return text.rfind('\n', 0, i) + 1
+
+
+def _indent_of(text: str, i: int) -> str:
+    """Leading whitespace of the line containing offset i"""
+    start = _line_start(text, i)
+    end = start
+    while end < len(text) and text[end] in ' \t':
+        end += 1
+    return text[start:end]
+
+
+def _indent_unit(text: str, indent: str = '') -> str:
+    """
+    Indentation step for new lines next to a line indented by indent.
+
+    Hand-edited configs may mix tabs and spaces, so the step follows the
+    character of the surrounding indent; without one, the first indented
+    member line decides (comment blocks are often indented by one space).
+    """
+    if not indent:
+        match = re.search(r'^([ \t]+)"', text, re.MULTILINE)
+        if match is None:
+            return '\t'
+        indent = match.group(1)
+    if indent[0] == '\t':
+        return '\t'
+    widths = [len(w) for w in re.findall(r'^( +)"', text, re.MULTILINE)]
+    return ' ' * functools.reduce(math.gcd, widths, len(indent))
+
+
+def _render(value: Any, indent: str, unit: str) -> str:
+    """Serialize a value to sit at a position whose line is indented by indent"""
+    rendered = json.dumps(value, indent=unit, ensure_ascii=False)
+    return rendered.replace('\n', '\n' + indent)
+
+
+def _splice(text: str, start: int, end: int, replacement: str) -> str:
+    return text[:start] + replacement + text[end:]
+
+
+def _remove_member(text: str, obj: _Node, index: int) -> str:
+    member = obj.members[index]
+    start = member.key_start
+    end = member.value.end if member.comma is None else member.comma + 1
+    # Take the whole line when the member is alone on it
+    line_start = _line_start(text, start)
+    rest = text[end:]
+    line_rest = rest.split('\n', 1)[0]
+    if not text[line_start:start].strip() and not line_rest.strip():
+        start = line_start
+        end += len(line_rest) + (1 if len(rest) > len(line_rest) else 0)
+    text = _splice(text, start, end, '')
+    # Dropping the last member must not leave a dangling comma (invalid in strict JSON)
+    if member.comma is None and index > 0:
+        previous = obj.members[index - 1]
+        if previous.comma is not None:
+            text = _splice(text, previous.comma, previous.comma + 1, '')
+    return text
+
+
+def _insert_member(text: str, obj: _Node, key: str, value: Any) -> str:
+    key_json = json.dumps(key, ensure_ascii=False)
+    if not obj.members:
+        indent = _indent_of(text, obj.start)
+        unit = _indent_unit(text, indent)
+        inner = indent + unit
+        return _splice(text, obj.start + 1, obj.end - 1,
+                       f"\n{inner}{key_json}: {_render(value, inner, unit)}\n{indent}")
+    last = obj.members[-1]
+    after_last = last.value.end if last.comma is None else last.comma + 1
+    line_end = text.find('\n', after_last)
+    if line_end < 0 or line_end > obj.end - 1:
+        # Single-line object: stay on one line
+        member = f" {key_json}: {json.dumps(value, ensure_ascii=False)}"
+        if last.comma is None:
+            return _splice(text, last.value.end, last.value.end, ',' + member)
+        return _splice(text, after_last, after_last, member + ',')
+    indent = _indent_of(text, last.key_start)
+    member = f"\n{indent}{key_json}: {_render(value, indent, _indent_unit(text, indent))}"
+    if last.comma is not None:
+        # Keep the object's trailing-comma style
+        return _splice(text, line_end, line_end, member + ',')
+    text = _splice(text, line_end, line_end, member)
+    return _splice(text, last.value.end, last.value.end, ',')
+
+
+def _find_object(text: str, path: List[str]) -> _Node:
+    node = parse_jsonc(text)
+    for key in path:
+        member = next(m for m in node.members if m.key == key)
+        node = member.value
+    return node
+
+
+def _merge(text: str, path: List[str], patch: Dict[str, Any]) -> str:
+    for key, value in patch.items():
+        # Every edit shifts offsets, so the target object is re-parsed each time
+        obj = _find_object(text, path)
+        index = next((i for i, m in enumerate(obj.members) if m.key == key), None)
+        if index is None:
+            if value is not None:
+                text = _insert_member(text, obj, key, value)
+            continue
+        member = obj.members[index]
+        if value is None:
+            text = _remove_member(text, obj, index)
+        elif isinstance(value, dict) and member.value.kind == 'object':
+            text = _merge(text, path + [key], value)
+        else:
+            indent = _indent_of(text, member.key_start)
+            text = _splice(text, member.value.start, member.value.end,
+                           _render(value, indent, _indent_unit(text, indent)))
+    return text
+
+
+def merge_jsonc(text: str, patch: Dict[str, Any]) -> str:
+    """
+    Apply a merge patch to JSON/JSONC text, editing only the changed spans.
+
+    Args:
+        text: File content; the top-level value must be an object
+        patch: Mapping to merge (None removes a key)
+
+    Returns:
+        Patched text
+
+    Raises:
+        PatchError: if the text does not parse or is not an object
+    """
+    if parse_jsonc(text).kind != 'object':
+        raise PatchError("Top-level value is not an object")
+    return _merge(text, [], patch)
+
+
+def apply_replacements(text: str, rules: List[Dict[str, Any]]) -> str:
+    """
+    Apply literal ("find") and regex ("regex") replacement rules in order.
+
+    Each rule may limit replacements with "count" (default: all).
+
+    Raises:
+        PatchError: for a malformed rule or one that matches nothing
+    """
+    for rule in rules:
+        if 'replace' not in rule or ('find' in rule) == ('regex' in rule):
+            raise PatchError(f"Replacement rule needs 'replace' and exactly one of 'find'/'regex': {rule}")
+        count = int(rule.get('count', 0))
+        if 'find' in rule:
+            find = rule['find']
+            if find not in text:
+                raise PatchError(f"Text not found: {find!r}")
+            text = text.replace(find, rule['replace'], count if count > 0 else -1)
+        else:
+            text, replaced = re.subn(rule['regex'], rule['replace'], text, count=count, flags=re.MULTILINE)
+            if not replaced:
+                raise PatchError(f"Pattern not found: {rule['regex']!r}")
+    return text
+
+
+def patch_text(text: str, merges: List[Dict[str, Any]], replacements: List[Dict[str, Any]]) -> str:
+    """All patches for one file: JSON merges first, then text replacements"""
+    for patch in merges:
+        text = merge_jsonc(text, patch)
+    return apply_replacements(text, replacements)
+
+
+def collect_file_patches(wrangler_config: Optional[Dict[str, Any]] = None,
+                         json_patches: Optional[Dict[str, Dict[str, Any]]] = None,
+                         file_replacements: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                         wrangler_file: str = 'wrangler.jsonc') -> Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Group declared patches by file.
+
+    Args:
+        wrangler_config: Merge patch for the wrangler config
+        json_patches: Relative path -> merge patch for other JSON/JSONC files
+        file_replacements: Relative path -> replacement rules
+        wrangler_file: Which wrangler config the template has
+
+    Returns:
+        Relative path -> (merge patches, replacement rules)
+    """
+    grouped: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+    if wrangler_config:
+        grouped.setdefault(wrangler_file, ([], []))[0].append(wrangler_config)
+    for rel, patch in (json_patches or {}).items():
+        grouped.setdefault(rel, ([], []))[0].append(patch)
+    for rel, rules in (file_replacements or {}).items():
+        if isinstance(rules, dict):
+            rules = [rules]
+        grouped.setdefault(rel, ([], []))[1].extend(rules)
+    return grouped
+
+
+def apply_file_patches(target_dir: str, grouped: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]) -> List[str]:
+    """
+    Patch files under target_dir with one read and at most one write each.
+
+    Args:
+        target_dir: Template tree
+        grouped: Output of collect_file_patches
+
+    Returns:
+        Relative paths that changed
+
+    Raises:
+        PatchError: naming the file, if it is missing or a patch does not apply
+    """
+    changed = []
+    for rel, (merges, replacements) in grouped.items():
+        path = os.path.join(target_dir, rel)
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                original = f.read()
+        except FileNotFoundError:
+            raise PatchError(f"{rel}: file not found")
+        try:
+            patched = patch_text(original, merges, replacements)
+        except PatchError as e:
+            raise PatchError(f"{rel}: {e}")
+        if patched != original:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(patched)
+            changed.append(rel)
+    return changed
@@ -6,16 +6,155 @@ Analyzes original templates vs reference templates to extract unique files
 and generate proper YAML configurations with exact patches.
 """
 
+import hashlib
 import json
 import os
 import shutil
-import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Any, Set
+from typing import Dict, List, Any, Optional, Set, Tuple
 import yaml
 
 
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class TreeDiff:
+    """Structured result of comparing a reference tree with an original tree.
+
+    Paths are relative to the tree roots. As with ``diff -r``, a directory that
+    exists on only one side is reported once rather than file by file.
+    """
+    only_in_original: List[str] = field(default_factory=list)
+    only_in_reference: List[str] = field(default_factory=list)
+    differing: List[str] = field(default_factory=list)
+
+    def unique_to_original(self) -> Set[str]:
+        """Paths that must be carried by an overlay: new in original or changed"""
+        return set(self.only_in_original) | set(self.differing)
+
+
+class HashCache:
+    """Thread-safe file digest cache keyed by path, size and mtime.
+
+    Shared across templates so a reference tree used by several templates is
+    hashed once per run.
+    """
+
+    def __init__(self):
+        self._digests: Dict[Tuple[str, int, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path: str, stat: os.stat_result) -> bytes:
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(key)
+        if cached is not None:
+            return cached
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                h.update(chunk)
+        value = h.digest()
+        with self._lock:
+            self._digests[key] = value
+        return value
+
+
+def diff_json(base: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute a patch that turns base into target under deep_merge_with_null.
+    
+    Nested objects are diffed recursively and keys missing from target are set
+    to None (null), which the generator treats as a deletion.
+    
+    Args:
+        base: Reference JSON object
+        target: Desired JSON object
+        
+    Returns:
+        Patch dictionary (empty if the objects are equal)
+    """
+    patch: Dict[str, Any] = {}
+    for key in base:
+        if key not in target:
+            patch[key] = None
+    for key, value in target.items():
+        if key not in base:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(base[key], dict):
+            sub_patch = diff_json(base[key], value)
+            if sub_patch:
+                patch[key] = sub_patch
+        elif base[key] != value:
+            patch[key] = value
+    return patch
+
+
+def compare_trees(reference_path: Path, original_path: Path, hash_cache: Optional[HashCache] = None) -> TreeDiff:
+    """
+    Compare two directory trees in-process, equivalent to ``diff -r --brief``.
+
+    Directories are walked with os.scandir; regular files with different sizes
+    are reported without reading them, and same-size files are compared by
+    chunked digest.
+
+    Args:
+        reference_path: Base reference tree
+        original_path: Original template tree
+        hash_cache: Digest cache to share across comparisons
+
+    Returns:
+        TreeDiff with relative paths, sorted
+    """
+    cache = hash_cache or HashCache()
+    result = TreeDiff()
+
+    def scan(path: str) -> Dict[str, os.DirEntry]:
+        with os.scandir(path) as it:
+            return {entry.name: entry for entry in it}
+
+    stack: List[str] = ['']
+    while stack:
+        rel_dir = stack.pop()
+        ref_entries = scan(os.path.join(reference_path, rel_dir))
+        orig_entries = scan(os.path.join(original_path, rel_dir))
+
+        for name, orig_entry in orig_entries.items():
+            rel = os.path.join(rel_dir, name) if rel_dir else name
+            ref_entry = ref_entries.get(name)
+            if ref_entry is None:
+                result.only_in_original.append(rel)
+                continue
+            orig_is_dir = orig_entry.is_dir()
+            ref_is_dir = ref_entry.is_dir()
+            if orig_is_dir and ref_is_dir:
+                stack.append(rel)
+            elif orig_is_dir != ref_is_dir:
+                # Type changed (file <-> directory): the overlay must carry the original entry
+                result.differing.append(rel)
+            else:
+                orig_stat = orig_entry.stat()
+                ref_stat = ref_entry.stat()
+                if orig_stat.st_size != ref_stat.st_size:
+                    result.differing.append(rel)
+                elif cache.digest(orig_entry.path, orig_stat) != cache.digest(ref_entry.path, ref_stat):
+                    result.differing.append(rel)
+
+        for name in ref_entries:
+            if name not in orig_entries:
+                result.only_in_reference.append(os.path.join(rel_dir, name) if rel_dir else name)
+
+    result.only_in_original.sort()
+    result.only_in_reference.sort()
+    result.differing.sort()
+    return result
+
+
 class TemplateDifferenceExtractor:
     """Extracts differences between original templates and references"""
     
@@ -33,46 +172,15 @@ class TemplateDifferenceExtractor:
             "vite-cf-DO-runner": "vite-reference",
             "vite-cf-DO-KV-runner": "vite-reference"
         }
+        
+        # Shared across templates so common reference trees are hashed once
+        self.hash_cache = HashCache()
     
     def get_unique_files(self, original_path: Path, reference_path: Path) -> Set[str]:
         """
         Get files that exist in original but not in reference, or are different.
         """
-        unique_files = set()
-        
-        # Run diff to find differences
-        try:
-            result = subprocess.run([
-                'diff', '-r', '--brief', str(reference_path), str(original_path)
-            ], capture_output=True, text=True)
-            
-            for line in result.stdout.strip().split('\n'):
-                if not line:
-                    continue
-                    
-                if line.startswith('Only in ' + str(original_path)):
-                    # File only in original
-                    parts = line.split(': ')
-                    if len(parts) == 2:
-                        dir_path = Path(parts[0].replace('Only in ', ''))
-                        file_name = parts[1]
-                        rel_path = (dir_path / file_name).relative_to(original_path)
-                        unique_files.add(str(rel_path))
-                        
-                elif line.startswith('Files ') and ' differ' in line:
-                    # Different files
-                    parts = line.replace('Files ', '').replace(' differ', '').split(' and ')
-                    if len(parts) == 2:
-                        ref_file = Path(parts[0])
-                        orig_file = Path(parts[1])
-                        if orig_file.is_relative_to(original_path):
-                            rel_path = orig_file.relative_to(original_path)
-                            unique_files.add(str(rel_path))
-                            
-        except subprocess.SubprocessError as e:
-            print(f"Error running diff: {e}", file=sys.stderr)
-        
-        return unique_files
+        return compare_trees(reference_path, original_path, self.hash_cache).unique_to_original()
     
     def extract_package_json_diff(self, original_path: Path, reference_path: Path) -> Dict[str, Any]:
         """
@@ -90,37 +198,8 @@ class TemplateDifferenceExtractor:
             with open(ref_pkg, 'r') as f:
                 ref_data = json.load(f)
             
-            # Find differences
-            patches = {}
-            
-            # Compare dependencies
-            orig_deps = orig_data.get('dependencies', {})
-            ref_deps = ref_data.get('dependencies', {})
-            
-            dep_patches = {}
-            for pkg, version in orig_deps.items():
-                if pkg not in ref_deps or ref_deps[pkg] != version:
-                    dep_patches[pkg] = version
-            
-            if dep_patches:
-                patches['dependencies'] = dep_patches
-            
-            # Compare devDependencies
-            orig_dev_deps = orig_data.get('devDependencies', {})
-            ref_dev_deps = ref_data.get('devDependencies', {})
-            
-            dev_dep_patches = {}
-            for pkg, version in orig_dev_deps.items():
-                if pkg not in ref_dev_deps or ref_dev_deps[pkg] != version:
-                    dev_dep_patches[pkg] = version
-            
-            if dev_dep_patches:
-                patches['devDependencies'] = dev_dep_patches
-            
-            # Compare other fields
-            for field in ['name', 'description', 'version']:
-                if field in orig_data and (field not in ref_data or orig_data[field] != ref_data[field]):
-                    patches[field] = orig_data[field]
+            # Full structural diff: nested fields, and deletions expressed as null
+            patches = diff_json(ref_data, orig_data)
             
             return patches
             
@@ -187,7 +266,7 @@ class TemplateDifferenceExtractor:
         except (yaml.YAMLError, FileNotFoundError) as e:
             print(f"Error updating YAML config: {e}", file=sys.stderr)
     
-    def process_template(self, template_name: str) -> None:
+    def process_template(self, template_name: str, tree_diff: Optional[TreeDiff] = None) -> None:
         """
         Process a single template to extract differences.
         """
@@ -211,7 +290,9 @@ class TemplateDifferenceExtractor:
             return
         
         # 1. Get unique files
-        unique_files = self.get_unique_files(original_path, reference_path)
+        if tree_diff is None:
+            tree_diff = compare_trees(reference_path, original_path, self.hash_cache)
+        unique_files = tree_diff.unique_to_original()
         print(f"Found {len(unique_files)} unique files/directories")
         for f in sorted(unique_files):
             print(f"  - {f}")
@@ -219,11 +300,11 @@ class TemplateDifferenceExtractor:
         # 2. Extract package.json differences
         package_patches = self.extract_package_json_diff(original_path, reference_path)
         print(f"Package.json patches: {len(package_patches)} fields")
-        for field, value in package_patches.items():
+        for key, value in package_patches.items():
             if isinstance(value, dict) and len(value) > 3:
-                print(f"  - {field}: {len(value)} items")
+                print(f"  - {key}: {len(value)} items")
             else:
-                print(f"  - {field}: {value}")
+                print(f"  - {key}: {value}")
         
         # 3. Copy unique files
         self.copy_unique_files(template_name, unique_files)
@@ -231,14 +312,48 @@ class TemplateDifferenceExtractor:
         # 4. Update YAML config
         self.update_yaml_config(template_name, package_patches)
     
-    def process_all_templates(self) -> None:
+    def compare_all_templates(self, max_workers: Optional[int] = None) -> Dict[str, TreeDiff]:
+        """
+        Compare every mapped template with its reference in a thread pool.
+        
+        Hashing releases the GIL, so comparisons overlap their I/O and digest
+        work; templates that share a reference reuse its cached digests.
+        
+        Returns:
+            Mapping of template name to TreeDiff (templates with missing trees are omitted)
+        """
+        jobs: Dict[str, Tuple[Path, Path]] = {}
+        for template_name, reference_name in self.template_mapping.items():
+            original_path = self.originals_dir / template_name
+            reference_path = self.reference_dir / reference_name
+            if original_path.is_dir() and reference_path.is_dir():
+                jobs[template_name] = (reference_path, original_path)
+        
+        results: Dict[str, TreeDiff] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                name: pool.submit(compare_trees, ref, orig, self.hash_cache)
+                for name, (ref, orig) in jobs.items()
+            }
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except OSError as e:
+                    print(f"Error comparing {name}: {e}", file=sys.stderr)
+        return results
+    
+    def process_all_templates(self, max_workers: Optional[int] = None) -> None:
         """
         Process all templates to extract differences.
+        
+        Tree comparisons run in parallel; copying and YAML updates then run in
+        mapping order so output stays deterministic.
         """
         print("Starting template difference extraction...")
         
+        diffs = self.compare_all_templates(max_workers)
         for template_name in self.template_mapping.keys():
-            self.process_template(template_name)
+            self.process_template(template_name, diffs.get(template_name))
         
         print("\n=== Template difference extraction complete ===")
 
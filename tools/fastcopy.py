@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Fast copy and hash primitives for the template generator.
+
+- copy_file: in-kernel copy via os.copy_file_range (reflink/server-side copy on
+  filesystems that support it), then os.sendfile, then a large-buffer read/write
+  loop. Only permission bits are copied unless full metadata is requested.
+- copytree: shutil.copytree driven by copy_file.
+- hash_file: single read for small files, mmap for large files so the digest
+  is computed straight from the page cache.
+
+Each primitive falls back automatically when the kernel or filesystem does
+not support the faster path.
+"""
+
+import errno
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+
+PathLike = Union[str, Path]
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+READ_BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 1024 * 1024
+
+# Errors meaning "this syscall can't do this copy", as opposed to real I/O failures
+_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.EPERM}
+
+_HAS_COPY_FILE_RANGE = hasattr(os, 'copy_file_range')
+_HAS_SENDFILE = hasattr(os, 'sendfile')
+
+
+def _copy_file_range(fd_in: int, fd_out: int, size: int) -> bool:
+    global _HAS_COPY_FILE_RANGE
+    offset = 0
+    try:
+        while offset < size:
+            copied = os.copy_file_range(fd_in, fd_out, min(COPY_CHUNK_SIZE, size - offset))
+            if copied == 0:
+                break
+            offset += copied
+    except OSError as e:
+        if e.errno not in _FALLBACK_ERRNOS or offset:
+            raise
+        if e.errno == errno.ENOSYS:
+            _HAS_COPY_FILE_RANGE = False
+        return False
+    return offset >= size
+
+
+def _sendfile(fd_in: int, fd_out: int, size: int) -> bool:
+    global _HAS_SENDFILE
+    offset = 0
+    try:
+        while offset < size:
+            sent = os.sendfile(fd_out, fd_in, offset, min(COPY_CHUNK_SIZE, size - offset))
+            if sent == 0:
+                break
+            offset += sent
+    except OSError as e:
+        if e.errno not in _FALLBACK_ERRNOS or offset:
+            raise
+        if e.errno == errno.ENOSYS:
+            _HAS_SENDFILE = False
+        return False
+    return offset >= size
+
+
+def copy_file(src: PathLike, dst: PathLike, preserve_metadata: bool = False) -> str:
+    """
+    Copy a file's contents and permission bits.
+
+    Compatible with shutil.copytree's copy_function signature.
+
+    Args:
+        src: Source file
+        dst: Destination file (overwritten if it exists)
+        preserve_metadata: Also copy timestamps and flags (like shutil.copy2)
+
+    Returns:
+        Destination path as a string
+    """
+    src = os.fspath(src)
+    dst = os.fspath(dst)
+    with open(src, 'rb') as fin:
+        st = os.fstat(fin.fileno())
+        with open(dst, 'wb') as fout:
+            size = st.st_size
+            done = size == 0
+            if not done and _HAS_COPY_FILE_RANGE:
+                done = _copy_file_range(fin.fileno(), fout.fileno(), size)
+            if not done and _HAS_SENDFILE:
+                fout.seek(0)
+                fout.truncate()
+                done = _sendfile(fin.fileno(), fout.fileno(), size)
+            if not done:
+                fin.seek(0)
+                fout.seek(0)
+                fout.truncate()
+                shutil.copyfileobj(fin, fout, READ_BUFFER_SIZE)
+    if preserve_metadata:
+        shutil.copystat(src, dst)
+    else:
+        os.chmod(dst, st.st_mode & 0o7777)
+    return dst
+
+
+def copytree(src: PathLike, dst: PathLike, ignore: Optional[Callable] = None, preserve_metadata: bool = False) -> None:
+    """
+    Copy a directory tree with copy_file (merging into an existing dst).
+
+    Args:
+        src: Source directory
+        dst: Destination directory
+        ignore: shutil.copytree-style ignore callable
+        preserve_metadata: Also copy file timestamps and flags
+    """
+    def _copy(s: str, d: str) -> str:
+        return copy_file(s, d, preserve_metadata)
+
+    shutil.copytree(src, dst, dirs_exist_ok=True, ignore=ignore, copy_function=_copy)
+
+
+def hash_file(path: PathLike, algorithm: str = 'md5') -> str:
+    """
+    Hex digest of a file.
+
+    Small files are read in a single call; files of MMAP_THRESHOLD bytes or more
+    are memory-mapped and fed to the hash without an intermediate copy.
+
+    Args:
+        path: File to hash
+        algorithm: hashlib algorithm name
+
+    Returns:
+        Hex digest
+    """
+    import hashlib  # only hashing callers pay for the OpenSSL bindings
+
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+                return h.hexdigest()
+            except (OSError, ValueError):
+                # e.g. special files or filesystems without mmap support
+                f.seek(0)
+                for chunk in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+                    h.update(chunk)
+                return h.hexdigest()
+        h.update(f.read())
+    return h.hexdigest()
@@ -4,21 +4,29 @@ Dynamic Template Generator - Updated for new clean structure
 
 Generates templates from YAML configurations and reference templates.
 Uses the clean shared-reference template and template-specific directory structures.
+
+Modules that only some code paths need (yaml, hashlib, difflib, fnmatch,
+subprocess) are imported where they are used to keep CLI startup cheap.
 """
 
+import contextlib
 import json
 import os
 import shutil
 import sys
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import yaml
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import argparse
 import re
-import hashlib
-import difflib
-import fnmatch
-import subprocess
+
+from build_lock import file_lock
+from fastcopy import copy_file, hash_file
+from tree_index import TreeIndex, index_tree, iter_sorted_files, materialize_dirs
+
+GOLDEN_MANIFEST_VERSION = 1
+
+# Definition keys handled by tools/config_patch.py
+CONFIG_PATCH_KEYS = ('wrangler_config', 'json_patches', 'file_replacements')
 
 
 class Colors:
@@ -45,6 +53,34 @@ def log_error(message: str) -> None:
     print(f"{Colors.RED}[ERROR]{Colors.NC} {message}", file=sys.stderr)
 
 
+def deep_merge_with_null(base: dict, patch: dict) -> dict:
+    """Deep-merge patch into base; a None value removes the key"""
+    result = base.copy()
+    for key, value in patch.items():
+        if value is None:
+            # Remove the key if value is null
+            result.pop(key, None)
+        elif key in result and isinstance(result[key], dict) and isinstance(value, dict):
+            result[key] = deep_merge_with_null(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def with_dependencies(package_patches: Optional[dict], additional_dependencies: Optional[dict]) -> Optional[dict]:
+    """Fold additional_dependencies into package.json patches (as a dependencies patch)"""
+    if not additional_dependencies:
+        return package_patches
+    patches = dict(package_patches or {})
+    patches['dependencies'] = {**(patches.get('dependencies') or {}), **additional_dependencies}
+    return patches
+
+
+def render_package_json(data: dict) -> str:
+    """Serialize package.json the way patched files are written (tabs, trailing newline)"""
+    return json.dumps(data, indent='\t', ensure_ascii=False) + '\n'
+
+
 class TemplateGenerator:
     """Clean template generator using shared-reference and template directories"""
     
@@ -54,6 +90,13 @@ class TemplateGenerator:
         self.definitions_dir = root_dir / "definitions" 
         self.build_dir = root_dir / "build"
         self.originals_dir = root_dir / "originals"
+        self.golden_dir = root_dir / "golden"
+        self.locks_dir = self.build_dir / ".locks"
+
+        # Generation writes into hidden sibling directories under build/ and swaps
+        # the finished tree into place, so readers never observe a half-built template
+        self.STAGING_TAG = '.staging-'
+        self.RETIRED_TAG = '.retired-'
 
         # DRY ignore patterns used consistently for copy and verify operations
         # Keep both directory names and recursive forms to support both filtering styles
@@ -80,6 +123,29 @@ class TemplateGenerator:
             'package-lock.json',
             'next-env.d.ts',
         ]
+
+        # Overlay files that are never copied into a build (besides *.yaml definitions)
+        self.OVERLAY_SKIP_NAMES = {'.DS_Store', '.eslintcache', '.template-definition.json'}
+
+        # Source trees (reference/ and definitions/) do not change during a run, so each
+        # is indexed once and shared by every template that copies from it
+        self._source_index_cache: Dict[str, TreeIndex] = {}
+        self._matcher_cache: Dict[tuple, Any] = {}
+
+        # Parsed definitions and file digests, validated against (size, mtime, inode)
+        # on every lookup so long-lived generators never serve stale entries.
+        # Digest caching grows with every verified file, so it is opt-in (the
+        # daemon enables it); one-shot verification keeps memory bounded
+        self._definition_cache: Dict[str, tuple] = {}
+        self._hash_cache: Dict[tuple, tuple] = {}
+        self.cache_digests = False
+
+        # Optional shared build cache (tools/build_cache.py BuildCache). When set,
+        # builds whose inputs fingerprint to a cached entry are restored instead
+        # of regenerated, and fresh builds are pushed. The fingerprint of each
+        # template built in this run is kept for the packaging step
+        self.build_cache = None
+        self.fingerprints: Dict[str, str] = {}
     
     def apply_package_patches(self, target_dir: Path, patches: Dict[str, Any]) -> bool:
         """
@@ -104,24 +170,11 @@ class TemplateGenerator:
                 package_data = json.load(f)
             
             # Apply patches (deep merge, handling null values for removal)
-            def deep_merge_with_null(base: dict, patch: dict) -> dict:
-                result = base.copy()
-                for key, value in patch.items():
-                    if value is None:
-                        # Remove the key if value is null
-                        result.pop(key, None)
-                    elif key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                        result[key] = deep_merge_with_null(result[key], value)
-                    else:
-                        result[key] = value
-                return result
-            
             package_data = deep_merge_with_null(package_data, patches)
             
             # Write updated package.json (preserve original formatting by using tabs like originals)
             with open(package_json_path, 'w', encoding='utf-8') as f:
-                json.dump(package_data, f, indent='\t', ensure_ascii=False)
-                f.write('\n')  # Add trailing newline to match originals
+                f.write(render_package_json(package_data))
             
             log_info(f"Applied package.json patches to {package_json_path}")
             return True
@@ -130,6 +183,38 @@ class TemplateGenerator:
             log_error(f"Failed to patch package.json: {e}")
             return False
 
+    def apply_config_patches(self, target_dir: Path, patches: Dict[str, Any]) -> bool:
+        """
+        Apply wrangler_config, json_patches and file_replacements in place.
+        
+        JSON/JSONC files keep their comments and formatting outside the patched
+        values; each file is read and written once (see config_patch).
+        
+        Args:
+            target_dir: Target template directory
+            patches: Definition entries keyed by CONFIG_PATCH_KEYS
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        from config_patch import PatchError, apply_file_patches, collect_file_patches
+
+        wrangler_file = 'wrangler.jsonc'
+        if patches.get('wrangler_config') and not (target_dir / wrangler_file).exists():
+            if not (target_dir / 'wrangler.json').exists():
+                log_error("wrangler_config needs a wrangler.jsonc or wrangler.json in the template")
+                return False
+            wrangler_file = 'wrangler.json'
+        grouped = collect_file_patches(patches.get('wrangler_config'), patches.get('json_patches'),
+                                       patches.get('file_replacements'), wrangler_file)
+        try:
+            for rel in apply_file_patches(os.fspath(target_dir), grouped):
+                log_info(f"Patched {rel}")
+            return True
+        except PatchError as e:
+            log_error(f"Failed to patch {e}")
+            return False
+
     def copy_reference_template(self, reference_name: str, target_dir: Path) -> bool:
         """
         Copy reference template to target directory.
@@ -148,12 +233,8 @@ class TemplateGenerator:
             return False
         
         try:
-            # Remove target if exists
-            if target_dir.exists():
-                shutil.rmtree(target_dir)
-            
-            # Create target directory
-            target_dir.mkdir(parents=True)
+            # Target is a fresh staging directory; create it if the caller did not
+            target_dir.mkdir(parents=True, exist_ok=True)
             
             # Copy reference template with ignore patterns
             self.copytree_with_ignores(reference_path, target_dir)
@@ -163,6 +244,139 @@ class TemplateGenerator:
         except Exception as e:
             log_error(f"Failed to copy reference template: {e}")
             return False
+
+    # ===== Staged build support =====
+    def create_staging_dir(self, template_name: str) -> Path:
+        """
+        Create an empty staging directory for a template build.
+        
+        The directory lives next to build/<template_name> (same filesystem) so the
+        finished tree can be moved into place with a single rename. The owning PID
+        is part of the name so stale directories from crashed runs can be detected.
+        
+        Args:
+            template_name: Name of the template being built
+            
+        Returns:
+            Path to the new staging directory
+        """
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+        staging_dir = self.build_dir / f".{template_name}{self.STAGING_TAG}{os.getpid()}-{os.urandom(4).hex()}"
+        # Plain mkdir (not mkdtemp) so the published tree keeps umask-derived permissions
+        staging_dir.mkdir()
+        return staging_dir
+
+    def swap_into_place(self, staging_dir: Path, target_dir: Path) -> None:
+        """
+        Publish a finished staging directory as target_dir.
+        
+        rename(2) cannot replace a non-empty directory, so an existing build is
+        first renamed aside, the staging tree is moved in with os.replace, and the
+        retired tree is removed afterwards. Both renames are metadata-only, so the
+        target is never observed partially written, but the swap is not atomic:
+        between the two renames target_dir briefly does not exist. Readers must
+        either hold template_lock or read through build_lock.read_stable, which
+        retries a read that overlapped a swap.
+        
+        Args:
+            staging_dir: Fully generated staging directory
+            target_dir: Final build/<template_name> path
+        """
+        retired_dir: Optional[Path] = None
+        if target_dir.exists():
+            retired_dir = target_dir.with_name(
+                f".{target_dir.name}{self.RETIRED_TAG}{os.getpid()}-{os.urandom(4).hex()}"
+            )
+            os.replace(target_dir, retired_dir)
+        try:
+            os.replace(staging_dir, target_dir)
+        except Exception:
+            # Put the previous build back so a failed swap never leaves the target missing
+            if retired_dir is not None and not target_dir.exists():
+                os.replace(retired_dir, target_dir)
+            raise
+        if retired_dir is not None:
+            shutil.rmtree(retired_dir, ignore_errors=True)
+
+    @contextlib.contextmanager
+    def template_lock(self, template_name: str) -> Iterator[None]:
+        """
+        Serialize builds of one template across processes.
+        
+        Also holds the workspace lock shared, so clean_build_dir waits for
+        in-flight builds. Readers of finished builds need no lock (see
+        build_lock.read_stable).
+        
+        Args:
+            template_name: Template about to be written
+        """
+        with file_lock(self.locks_dir / "workspace.lock", shared=True,
+                       on_wait=lambda: log_info("Waiting for build/ to be cleaned by another process...")):
+            with file_lock(self.locks_dir / f"{template_name}.lock",
+                           on_wait=lambda: log_info(f"Waiting for another process building {template_name}...")):
+                yield
+
+    def clean_build_dir(self) -> None:
+        """Remove every build under the exclusive workspace lock, keeping the lock files"""
+        with file_lock(self.locks_dir / "workspace.lock",
+                       on_wait=lambda: log_info("Waiting for other processes to finish building...")):
+            for entry in self.build_dir.iterdir():
+                if entry == self.locks_dir:
+                    continue
+                if entry.is_dir() and not entry.is_symlink():
+                    shutil.rmtree(entry)
+                else:
+                    entry.unlink()
+
+    def collect_stale_staging(self) -> int:
+        """
+        Remove staging and retired directories left behind by dead processes.
+        
+        Directories owned by a live PID are left alone so concurrent generator
+        runs sharing the same build/ folder do not delete each other's work.
+        
+        Returns:
+            Number of directories removed
+        """
+        if not self.build_dir.exists():
+            return 0
+        removed = 0
+        for entry in self.build_dir.iterdir():
+            name = entry.name
+            if not name.startswith('.') or not entry.is_dir():
+                continue
+            tag = self.STAGING_TAG if self.STAGING_TAG in name else self.RETIRED_TAG if self.RETIRED_TAG in name else None
+            if tag is None:
+                continue
+            template_name, _, owner = name[1:].rpartition(tag)
+            pid_str = owner.split('-', 1)[0]
+            if pid_str.isdigit() and self._pid_alive(int(pid_str)):
+                continue
+            # A crash between the two renames of swap_into_place leaves only the retired tree
+            target_dir = self.build_dir / template_name
+            if tag == self.RETIRED_TAG and not target_dir.exists():
+                os.replace(entry, target_dir)
+                log_warn(f"Restored interrupted build for {template_name}")
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+        if removed:
+            log_info(f"Removed {removed} stale staging director{'y' if removed == 1 else 'ies'}")
+        return removed
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+        return True
     
     def apply_template_specific_files(self, template_name: str, target_dir: Path, specific_files: List[str] = None) -> bool:
         """
@@ -196,7 +410,7 @@ class TemplateGenerator:
                         # Copy single file
                         dst_path = target_dir / file_pattern
                         dst_path.parent.mkdir(parents=True, exist_ok=True)
-                        shutil.copy2(src_path, dst_path)
+                        copy_file(src_path, dst_path)
                         log_info(f"Applied template file: {file_pattern}")
                     else:
                         # Copy directory (respecting ignore patterns)
@@ -207,32 +421,13 @@ class TemplateGenerator:
                         log_info(f"Applied template directory: {file_pattern}")
             else:
                 # Copy all files from template directory to target (excluding YAML config)
-                for root, dirs, files in os.walk(template_dir):
-                    root_path = Path(root)
-                    rel_root = root_path.relative_to(template_dir)
-                    
-                    # Filter ignored directories in-place for performance
-                    dirs[:] = [d for d in dirs if not self._is_ignored(str((root_path / d).relative_to(template_dir)), self.DEFAULT_IGNORES)]
-
-                    # Create directories in target
-                    target_root = target_dir / rel_root if str(rel_root) != '.' else target_dir
-                    target_root.mkdir(parents=True, exist_ok=True)
-                    
-                    # Copy files
-                    for file in files:
-                        # Skip certain files that shouldn't be copied
-                        if file in ['.DS_Store', '.eslintcache', '.template-definition.json'] or file.endswith('.yaml'):
-                            continue
-                        
-                        src_file = root_path / file
-                        dst_file = target_root / file
-                        rel_file = str(src_file.relative_to(template_dir))
-                        if self._is_ignored(rel_file, self.DEFAULT_IGNORES):
-                            continue
-                        
-                        # Copy file, overwriting if it exists
-                        shutil.copy2(src_file, dst_file)
-                        log_info(f"Applied template file: {rel_root / file if str(rel_root) != '.' else file}")
+                index = self.index_source_tree(template_dir, overlay=True)
+                materialize_dirs(index, target_dir)
+                target_root = os.fspath(target_dir)
+                for rel, entry in index.files.items():
+                    # Copy file, overwriting if it exists
+                    copy_file(entry.path, os.path.join(target_root, rel))
+                    log_info(f"Applied template file: {rel}")
             
             return True
             
@@ -252,35 +447,65 @@ class TemplateGenerator:
         """
         try:
             # Load YAML configuration
-            with open(yaml_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = self.load_definition(yaml_file)
             
             template_name = config['name']
             base_reference = config.get('base_reference', 'shared-reference')
             template_specific_files = config.get('template_specific_files')
             excludes = config.get('excludes', [])
-            package_patches = config.get('package_patches')
+            package_patches = with_dependencies(config.get('package_patches'), config.get('additional_dependencies'))
+            file_patches = {key: config[key] for key in CONFIG_PATCH_KEYS if config.get(key)}
             
             log_info(f"Generating template: {template_name}")
             
             target_dir = self.build_dir / template_name
-            
-            # Step 1: Copy reference template
-            if not self.copy_reference_template(base_reference, target_dir):
-                return False
-            
-            # Step 2: Apply template-specific files from template directory
-            if not self.apply_template_specific_files(template_name, target_dir, template_specific_files):
-                return False
-            
-            # Step 3: Apply package.json patches if specified
-            if package_patches:
-                if not self.apply_package_patches(target_dir, package_patches):
-                    return False
-            
-            # Step 4: Apply excludes (remove files introduced by reference or overlays)
-            if excludes:
-                self.apply_excludes(target_dir, excludes)
+            # Concurrent runs sharing build/ build the same template one at a time
+            with self.template_lock(template_name):
+                staging_dir = self.create_staging_dir(template_name)
+                
+                try:
+                    fingerprint = None
+                    if self.build_cache is not None:
+                        fingerprint = self.build_cache.fingerprint(self, yaml_file)
+                        self.fingerprints[template_name] = fingerprint
+                        if self.build_cache.fetch_tree(fingerprint, staging_dir):
+                            self.swap_into_place(staging_dir, target_dir)
+                            log_info(f"✅ Restored template from build cache: {template_name} ({fingerprint[:12]})")
+                            return True
+                        # A miss or corrupt entry may leave partial output behind
+                        shutil.rmtree(staging_dir, ignore_errors=True)
+                        staging_dir.mkdir(parents=True)
+                    
+                    # Step 1: Copy reference template
+                    if not self.copy_reference_template(base_reference, staging_dir):
+                        return False
+                    
+                    # Step 2: Apply template-specific files from template directory
+                    if not self.apply_template_specific_files(template_name, staging_dir, template_specific_files):
+                        return False
+                    
+                    # Step 3: Apply package.json patches if specified
+                    if package_patches:
+                        if not self.apply_package_patches(staging_dir, package_patches):
+                            return False
+                    
+                    # Step 3b: Patch wrangler config and other files in place
+                    if file_patches:
+                        if not self.apply_config_patches(staging_dir, file_patches):
+                            return False
+                    
+                    # Step 4: Apply excludes (remove files introduced by reference or overlays)
+                    if excludes:
+                        self.apply_excludes(staging_dir, excludes)
+                    
+                    if fingerprint is not None:
+                        self.build_cache.store_tree(fingerprint, template_name, staging_dir)
+                    
+                    # Step 5: Publish the finished tree in one rename
+                    self.swap_into_place(staging_dir, target_dir)
+                finally:
+                    if staging_dir.exists():
+                        shutil.rmtree(staging_dir, ignore_errors=True)
             
             log_info(f"✅ Successfully generated template: {template_name}")
             return True
@@ -289,6 +514,33 @@ class TemplateGenerator:
             log_error(f"Failed to generate template from {yaml_file}: {e}")
             return False
     
+    @staticmethod
+    def _stat_key(path: Path) -> tuple:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def load_definition(self, yaml_file: Path) -> Dict[str, Any]:
+        """
+        Load a YAML definition, reusing the parsed result while the file is unchanged.
+        
+        Args:
+            yaml_file: Path to YAML configuration file
+            
+        Returns:
+            Parsed configuration (shared; do not mutate)
+        """
+        key = os.path.abspath(yaml_file)
+        stat_key = self._stat_key(yaml_file)
+        cached = self._definition_cache.get(key)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        import yaml
+
+        with open(yaml_file, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        self._definition_cache[key] = (stat_key, config)
+        return config
+
     def generate_all_templates(self) -> bool:
         """
         Generate all templates from YAML definition files.
@@ -300,6 +552,7 @@ class TemplateGenerator:
         
         # Ensure build directory exists
         self.build_dir.mkdir(exist_ok=True)
+        self.collect_stale_staging()
         
         success_count = 0
         failure_count = 0
@@ -330,58 +583,101 @@ class TemplateGenerator:
             log_error(f"Template configuration not found: {yaml_file}")
             return False
         
+        self.collect_stale_staging()
         return self.generate_template_from_yaml(yaml_file)
     
     # ===== Verification utilities =====
     def _iter_files(self, base: Path, ignores: List[str]) -> List[str]:
-        files: List[str] = []
-        for root, dirs, filenames in os.walk(base):
-            root_path = Path(root)
-            for name in filenames:
-                rel = str((root_path / name).relative_to(base))
-                if self._is_ignored(rel, ignores):
-                    continue
-                files.append(rel)
-        return sorted(files)
+        is_default_ignored = self._ignore_matcher([])
+        is_ignored = self._ignore_matcher(ignores)
+        # Only DEFAULT_IGNORES prune directories (they list recursive forms); extra
+        # ignores are matched per file as before
+        index = index_tree(
+            base,
+            skip_dir=lambda rel, name: is_default_ignored(rel),
+            skip_file=lambda rel, name: is_ignored(rel),
+        )
+        return index.sorted_files()
+
+    def _ignore_matcher(self, ignores: List[str]):
+        """Return a predicate matching DEFAULT_IGNORES plus ignores with one precompiled regex"""
+        key = tuple(ignores or [])
+        matcher = self._matcher_cache.get(key)
+        if matcher is None:
+            import fnmatch
+
+            patterns = self.DEFAULT_IGNORES + list(key)
+            matcher = re.compile('|'.join(f"(?:{fnmatch.translate(p)})" for p in patterns)).match
+            self._matcher_cache[key] = matcher
+        return matcher
 
     def _is_ignored(self, rel_path: str, ignores: List[str]) -> bool:
-        patterns = self.DEFAULT_IGNORES + (ignores or [])
-        return any(fnmatch.fnmatch(rel_path, pat) for pat in patterns)
+        return self._ignore_matcher(ignores)(rel_path) is not None
+
+    def index_source_tree(self, src: Path, overlay: bool = False) -> TreeIndex:
+        """
+        Index a reference or overlay tree once per run, applying DEFAULT_IGNORES.
+        
+        Args:
+            src: Tree root
+            overlay: Also skip files that are never copied from a definition overlay
+            
+        Returns:
+            Cached TreeIndex
+        """
+        key = f"{'overlay' if overlay else 'tree'}:{os.path.abspath(src)}"
+        index = self._source_index_cache.get(key)
+        if index is None:
+            is_ignored = self._ignore_matcher([])
+            skip_names = self.OVERLAY_SKIP_NAMES
+
+            def skip_file(rel: str, name: str) -> bool:
+                if overlay and (name in skip_names or name.endswith('.yaml')):
+                    return True
+                return is_ignored(rel) is not None
+
+            index = index_tree(src, skip_dir=lambda rel, name: is_ignored(rel) is not None, skip_file=skip_file)
+            self._source_index_cache[key] = index
+        return index
+
+    def invalidate_source_cache(self) -> None:
+        """Forget cached source tree indexes (call when reference/ or definitions/ change)"""
+        self._source_index_cache.clear()
 
     def copytree_with_ignores(self, src: Path, dst: Path) -> None:
         """Copy a directory tree while ignoring DEFAULT_IGNORES patterns.
 
-        Uses shutil.copytree with an ignore callable compatible with our glob patterns,
-        keeping a single source of truth for ignore rules.
+        Uses the cached single-pass index of src, so repeated copies of the same
+        reference do not rescan it, and copies files with fastcopy.copy_file.
         """
-        base = Path(src)
+        index = self.index_source_tree(src)
+        materialize_dirs(index, dst)
+        dst_root = os.fspath(dst)
+        for rel, entry in index.files.items():
+            copy_file(entry.path, os.path.join(dst_root, rel))
 
-        def _ignore(this_src: str, names: List[str]):  # type: ignore[override]
-            rels: List[str] = []
-            for name in names:
-                p = Path(this_src) / name
-                try:
-                    rel = str(Path(p).relative_to(base))
-                except Exception:
-                    rel = name
-                rels.append(rel)
-            # Decide which names to ignore
-            ignored: List[str] = []
-            for name, rel in zip(names, rels):
-                if self._is_ignored(rel, []):
-                    ignored.append(name)
-            return set(ignored)
-
-        shutil.copytree(src, dst, dirs_exist_ok=True, ignore=_ignore)
+    def _cached_digest(self, path: Path, kind: str, compute) -> str:
+        if not self.cache_digests:
+            return compute(path)
+        try:
+            stat_key = self._stat_key(path)
+        except OSError:
+            return compute(path)
+        key = (os.fspath(path), kind)
+        cached = self._hash_cache.get(key)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        digest = compute(path)
+        self._hash_cache[key] = (stat_key, digest)
+        return digest
 
     def _md5(self, path: Path) -> str:
-        h = hashlib.md5()
-        with open(path, 'rb') as f:
-            for chunk in iter(lambda: f.read(8192), b''):
-                h.update(chunk)
-        return h.hexdigest()
+        return self._cached_digest(path, 'raw', lambda p: hash_file(p, 'md5'))
 
     def _md5_text_normalized(self, path: Path) -> str:
+        return self._cached_digest(path, 'text', self._compute_md5_text_normalized)
+
+    def _compute_md5_text_normalized(self, path: Path) -> str:
         """Compute MD5 of text with normalized EOL and without a final trailing newline.
 
         - Converts CRLF to LF
@@ -396,6 +692,8 @@ class TemplateGenerator:
             # Remove a single trailing newline
             if s.endswith('\n'):
                 s = s[:-1]
+            import hashlib
+
             h = hashlib.md5()
             h.update(s.encode('utf-8'))
             return h.hexdigest()
@@ -411,75 +709,182 @@ class TemplateGenerator:
         except Exception:
             return False
 
-    def verify_template(self, template_name: str, show_diffs: bool = False, summary_only: bool = False, ignores: List[str] = None) -> bool:
+    def _iter_sorted_files(self, base: Path, ignores: List[str]) -> Iterator[str]:
+        """Stream relative file paths under base in sorted order, filtered like _iter_files"""
+        is_default_ignored = self._ignore_matcher([])
+        is_ignored = self._ignore_matcher(ignores)
+        for rel, _ in iter_sorted_files(
+            base,
+            skip_dir=lambda rel, name: is_default_ignored(rel),
+            skip_file=lambda rel, name: is_ignored(rel),
+        ):
+            yield rel
+
+    @staticmethod
+    def _merge_join(orig_items: Iterator[tuple], build_items: Iterator[tuple]) -> Iterator[Tuple[str, tuple, tuple]]:
+        """
+        Merge two streams of tuples sorted by their first element (the relative path).
+        
+        Yields:
+            (kind, orig_item, build_item): 'removed' for paths only in orig_items,
+            'added' for paths only in build_items and 'common' for paths in both,
+            in path order (the missing side is None)
+        """
+        orig = next(orig_items, None)
+        build = next(build_items, None)
+        while orig is not None or build is not None:
+            if build is None or (orig is not None and orig[0] < build[0]):
+                yield 'removed', orig, None
+                orig = next(orig_items, None)
+            elif orig is None or build[0] < orig[0]:
+                yield 'added', None, build
+                build = next(build_items, None)
+            else:
+                yield 'common', orig, build
+                orig = next(orig_items, None)
+                build = next(build_items, None)
+
+    def _same_content(self, orig: Path, build: Path) -> bool:
+        if self._is_text(orig) and self._is_text(build):
+            return self._md5_text_normalized(orig) == self._md5_text_normalized(build)
+        return self._md5(orig) == self._md5(build)
+
+    def _print_diff(self, template_name: str, rel: str, orig: Path, build: Path) -> None:
+        import difflib
+
+        if self._is_text(orig) and self._is_text(build):
+            try:
+                with open(orig, 'r', encoding='utf-8') as fo, open(build, 'r', encoding='utf-8') as fb:
+                    o_lines = fo.readlines()
+                    b_lines = fb.readlines()
+                diff = difflib.unified_diff(o_lines, b_lines, fromfile=f"originals/{template_name}/{rel}", tofile=f"build/{template_name}/{rel}")
+                print(''.join(diff))
+            except Exception as e:
+                log_warn(f"Failed to diff {rel}: {e}")
+        else:
+            print(f"    (binary or non-text difference) {rel}")
+
+    # ===== Golden manifests =====
+    def golden_manifest_path(self, template_name: str) -> Path:
+        return self.golden_dir / f"{template_name}.jsonl"
+
+    def _golden_entry(self, path: Path, rel: str) -> list:
+        """[rel, size, 't' or 'b', digest] using the same comparison rules as verification"""
+        if self._is_text(path):
+            return [rel, os.path.getsize(path), 't', self._md5_text_normalized(path)]
+        return [rel, os.path.getsize(path), 'b', self._md5(path)]
+
+    def record_golden_manifest(self, template_name: str) -> bool:
+        """
+        Record golden/<template>.jsonl from originals/<template>.
+        
+        The manifest is a header line followed by one [path, size, kind, md5] line
+        per file in sorted path order, where kind is 't' (md5 of EOL-normalized
+        text) or 'b' (md5 of the raw bytes). It is written and read as a stream.
+        
+        Returns:
+            True if the manifest was written
+        """
         orig_dir = self.originals_dir / template_name
-        build_dir = self.build_dir / template_name
         if not orig_dir.exists():
             log_error(f"Original template not found: {orig_dir}")
             return False
-        if not build_dir.exists():
-            log_error(f"Build template not found: {build_dir}")
-            return False
+        manifest_path = self.golden_manifest_path(template_name)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = manifest_path.with_name(f".{manifest_path.name}.tmp-{os.getpid()}")
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"version": GOLDEN_MANIFEST_VERSION, "name": template_name}) + '\n')
+            for rel in self._iter_sorted_files(orig_dir, []):
+                f.write(json.dumps(self._golden_entry(orig_dir / rel, rel), ensure_ascii=False) + '\n')
+                count += 1
+        os.replace(tmp_path, manifest_path)
+        log_info(f"Recorded golden manifest {manifest_path} ({count} files)")
+        return True
 
-        orig_files = self._iter_files(orig_dir, ignores or [])
-        build_files = self._iter_files(build_dir, ignores or [])
+    def _iter_golden(self, manifest_path: Path, ignores: List[str]) -> Iterator[list]:
+        """Stream manifest entries in path order, skipping ignored paths"""
+        is_ignored = self._ignore_matcher(ignores)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline() or 'null')
+            if not isinstance(header, dict) or header.get("version") != GOLDEN_MANIFEST_VERSION:
+                raise ValueError(f"Unsupported golden manifest: {manifest_path}")
+            for line in f:
+                entry = json.loads(line)
+                if is_ignored(entry[0]) is None:
+                    yield entry
 
-        orig_set = set(orig_files)
-        build_set = set(build_files)
+    def _matches_golden(self, entry: list, path: Path) -> bool:
+        _, size, kind, digest = entry
+        if (kind == 't') != self._is_text(path):
+            # One side decodes as text and the other does not, so the bytes differ
+            return False
+        if kind == 't':
+            return self._md5_text_normalized(path) == digest
+        return os.path.getsize(path) == size and self._md5(path) == digest
 
-        added = sorted(list(build_set - orig_set))
-        removed = sorted(list(orig_set - build_set))
-        common = sorted(list(orig_set & build_set))
+    def verify_template(self, template_name: str, show_diffs: bool = False, summary_only: bool = False, ignores: List[str] = None) -> bool:
+        """
+        Compare build/<template> with its golden manifest or originals/<template>.
+        
+        The golden manifest is used when it exists, so originals/ is not needed;
+        originals/<template> is read instead when there is no manifest or when
+        diffs are requested.
+        """
+        orig_dir = self.originals_dir / template_name
+        build_dir = self.build_dir / template_name
+        manifest_path = self.golden_manifest_path(template_name)
+        use_originals = orig_dir.exists() and (show_diffs or not manifest_path.exists())
+        if not use_originals and not manifest_path.exists():
+            log_error(f"Original template not found: {orig_dir} (and no golden manifest at {manifest_path})")
+            return False
+        if not build_dir.exists():
+            log_error(f"Build template not found: {build_dir}")
+            return False
+        if show_diffs and not orig_dir.exists():
+            log_warn(f"--diffs needs {orig_dir}; verifying against the golden manifest without diffs")
 
-        modified: List[str] = []
-        for rel in common:
-            o = orig_dir / rel
-            b = build_dir / rel
-            if self._is_text(o) and self._is_text(b):
-                if self._md5_text_normalized(o) != self._md5_text_normalized(b):
-                    modified.append(rel)
-            else:
-                if self._md5(o) != self._md5(b):
-                    modified.append(rel)
+        counts = {'added': 0, 'removed': 0, 'modified': 0}
+        markers = {'added': '+', 'removed': '-', 'modified': '~'}
 
-        ok = not (added or removed or modified)
+        if use_originals:
+            header = f"Verification for {template_name}:"
+            orig_items = ((rel,) for rel in self._iter_sorted_files(orig_dir, ignores or []))
+        else:
+            header = f"Verification for {template_name} (golden manifest):"
+            orig_items = self._iter_golden(manifest_path, ignores or [])
+        build_items = ((rel,) for rel in self._iter_sorted_files(build_dir, ignores or []))
 
-        header = f"Verification for {template_name}:"
         print(f"{Colors.BLUE}{header}{Colors.NC}")
+        # Both sides are streamed in sorted order and merge-joined, so differences
+        # are reported as they are found and memory does not grow with tree size
+        for kind, orig_item, build_item in self._merge_join(orig_items, build_items):
+            rel = (orig_item or build_item)[0]
+            if kind == 'common':
+                if use_originals:
+                    same = self._same_content(orig_dir / rel, build_dir / rel)
+                else:
+                    same = self._matches_golden(orig_item, build_dir / rel)
+                if same:
+                    continue
+                kind = 'modified'
+            counts[kind] += 1
+            if summary_only:
+                continue
+            print(f"    {markers[kind]} {rel}")
+            if kind == 'modified' and show_diffs and use_originals:
+                self._print_diff(template_name, rel, orig_dir / rel, build_dir / rel)
+
+        ok = not any(counts.values())
         if ok:
             print(f"  {Colors.GREEN}✓ No differences{Colors.NC}")
         else:
-            if added:
-                print(f"  {Colors.YELLOW}+ Added ({len(added)}):{Colors.NC}")
-                if not summary_only:
-                    for a in added:
-                        print(f"    + {a}")
-            if removed:
-                print(f"  {Colors.YELLOW}- Removed ({len(removed)}):{Colors.NC}")
-                if not summary_only:
-                    for r in removed:
-                        print(f"    - {r}")
-            if modified:
-                print(f"  {Colors.RED}~ Modified ({len(modified)}):{Colors.NC}")
-                if not summary_only:
-                    for m in modified:
-                        print(f"    ~ {m}")
-
-        if show_diffs and modified and not summary_only:
-            for rel in modified:
-                o = orig_dir / rel
-                b = build_dir / rel
-                if self._is_text(o) and self._is_text(b):
-                    try:
-                        with open(o, 'r', encoding='utf-8') as fo, open(b, 'r', encoding='utf-8') as fb:
-                            o_lines = fo.readlines()
-                            b_lines = fb.readlines()
-                        diff = difflib.unified_diff(o_lines, b_lines, fromfile=f"originals/{template_name}/{rel}", tofile=f"build/{template_name}/{rel}")
-                        print(''.join(diff))
-                    except Exception as e:
-                        log_warn(f"Failed to diff {rel}: {e}")
-                else:
-                    print(f"    (binary or non-text difference) {rel}")
+            if counts['added']:
+                print(f"  {Colors.YELLOW}+ Added ({counts['added']}){Colors.NC}")
+            if counts['removed']:
+                print(f"  {Colors.YELLOW}- Removed ({counts['removed']}){Colors.NC}")
+            if counts['modified']:
+                print(f"  {Colors.RED}~ Modified ({counts['modified']}){Colors.NC}")
 
         return ok
 
@@ -488,9 +893,12 @@ class TemplateGenerator:
         if only_template:
             names = [only_template]
         else:
-            names = [p.name for p in self.originals_dir.iterdir() if p.is_dir()]
+            # Templates with an originals/ tree or a golden manifest
+            names = [p.name for p in self.originals_dir.iterdir() if p.is_dir()] if self.originals_dir.exists() else []
+            if self.golden_dir.exists():
+                names += [p.stem for p in self.golden_dir.glob("*.jsonl")]
         any_failed = False
-        for name in sorted(names):
+        for name in sorted(set(names)):
             ok = self.verify_template(name, show_diffs=show_diffs, summary_only=summary_only, ignores=ignores or [])
             if not ok:
                 any_failed = True
@@ -498,32 +906,33 @@ class TemplateGenerator:
 
     # ===== Excludes support =====
     def apply_excludes(self, target_dir: Path, patterns: List[str]) -> None:
-        # Collect matches via os.walk + fnmatch
-        to_remove: List[Path] = []
-        rel_paths: List[str] = []
-        for root, dirs, files in os.walk(target_dir):
-            root_path = Path(root)
-            for name in files:
-                rel = str((root_path / name).relative_to(target_dir))
-                if any(fnmatch.fnmatch(rel, pat) for pat in patterns):
-                    rel_paths.append(rel)
-                    to_remove.append(root_path / name)
+        if not patterns:
+            return
+        import fnmatch
+
+        # Collect matches in one scandir pass with a single precompiled matcher
+        is_excluded = re.compile('|'.join(f"(?:{fnmatch.translate(p)})" for p in patterns)).match
+        index = index_tree(target_dir, skip_file=lambda rel, name: is_excluded(rel) is None)
         # Remove files
-        for p in to_remove:
+        for rel, entry in index.files.items():
             try:
-                p.unlink(missing_ok=True)
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
             except Exception as e:
-                log_warn(f"Failed to remove excluded file {p}: {e}")
-        # Clean up empty directories
-        for root, dirs, files in os.walk(target_dir, topdown=False):
-            if not dirs and not files:
-                try:
-                    Path(root).rmdir()
-                except Exception:
-                    pass
+                log_warn(f"Failed to remove excluded file {entry.path}: {e}")
+        # Clean up empty directories, deepest first
+        root = os.fspath(target_dir)
+        for rel in reversed(index.dirs):
+            try:
+                os.rmdir(os.path.join(root, rel))
+            except OSError:
+                pass
 
     # ===== Bun viability checks =====
     def _run_cmd(self, cmd: List[str], cwd: Path) -> int:
+        import subprocess
+
         try:
             proc = subprocess.run(cmd, cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
             print(proc.stdout)
@@ -562,7 +971,7 @@ class TemplateGenerator:
             names = [only_template]
         else:
             # Prefer templates present in build directory
-            names = [p.name for p in self.build_dir.iterdir() if p.is_dir()]
+            names = [p.name for p in self.build_dir.iterdir() if p.is_dir() and not p.name.startswith('.')]
         any_failed = False
         for name in sorted(names):
             if not self.run_bun_checks_for_template(name):
@@ -620,18 +1029,107 @@ def main() -> None:
         action="store_true",
         help="Skip Bun install/lint/build viability checks"
     )
+    parser.add_argument(
+        "--record-golden",
+        action="store_true",
+        help="Record golden/<template>.jsonl manifests from originals/ (all, or --template) and exit; "
+             "verification then works without originals/ except for --diffs"
+    )
+    parser.add_argument(
+        "--build-cache",
+        help="Shared build cache: dir:<path> or an http(s) base URL. Templates whose definition, "
+             "reference and overlay are unchanged are restored from it instead of regenerated"
+    )
+    parser.add_argument(
+        "--rev",
+        help="Build from reference/ and definitions/ at this git revision, read from the object "
+             "store without a checkout (output still goes to build/)"
+    )
+    parser.add_argument(
+        "--rev-cache",
+        help="Blob cache and materialized sources for --rev (default: <root>/.rev-cache)"
+    )
+    parser.add_argument(
+        "--matrix",
+        "-m",
+        action="append",
+        help="Build every variant of a matrix definition (see tools/template_matrix.py) instead of definitions/*.yaml; "
+             "repeatable, combine with --template to build one variant"
+    )
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="With --matrix: hardlink unchanged source files into variant builds instead of copying them "
+             "(the builds then share files with reference/ and definitions/ and must not be edited)"
+    )
     args = parser.parse_args()
     
     root_dir = Path(args.root).resolve()
     generator = TemplateGenerator(root_dir)
     
+    # Locks held until the process exits
+    held_locks = contextlib.ExitStack()
+    if args.rev:
+        from git_source import GitSourceError, RevisionSources
+
+        sources = RevisionSources(root_dir, Path(args.rev_cache).resolve() if args.rev_cache else root_dir / ".rev-cache")
+        # The materialized sources must not switch revisions under this run
+        held_locks.enter_context(sources.lock())
+        try:
+            commit, stats = sources.checkout(args.rev)
+        except GitSourceError as e:
+            log_error(str(e))
+            sys.exit(1)
+        log_info(f"Sources at {args.rev} ({commit[:12]}): {stats['written']} written "
+                 f"({stats['fetched']} read from git), {stats['removed']} removed, {stats['unchanged']} unchanged")
+        generator.reference_dir = sources.tree_dir / "reference"
+        generator.definitions_dir = sources.tree_dir / "definitions"
+    
+    if args.build_cache:
+        from build_cache import make_build_cache
+
+        try:
+            generator.build_cache = make_build_cache(args.build_cache)
+        except ValueError as e:
+            log_error(str(e))
+            sys.exit(1)
+    
+    if args.record_golden:
+        if args.template:
+            names = [args.template]
+        elif generator.originals_dir.exists():
+            names = sorted(p.name for p in generator.originals_dir.iterdir() if p.is_dir())
+        else:
+            names = []
+        if not names:
+            log_error(f"No templates found in {generator.originals_dir}")
+            sys.exit(1)
+        results = [generator.record_golden_manifest(name) for name in names]
+        sys.exit(0 if all(results) else 1)
+    
     # Note: Verification will only run when --verify is explicitly provided.
 
     # Clean build directory if requested
     if args.clean and generator.build_dir.exists():
         log_info("Cleaning build directory...")
-        shutil.rmtree(generator.build_dir)
-        generator.build_dir.mkdir(parents=True)
+        generator.clean_build_dir()
+    
+    if args.matrix:
+        from template_matrix import MatrixBuilder, load_matrix
+
+        variants = []
+        for matrix_file in args.matrix:
+            try:
+                variants.extend(load_matrix(Path(matrix_file)))
+            except (OSError, ValueError) as e:
+                log_error(f"{matrix_file}: {e}")
+                sys.exit(1)
+        if args.template:
+            variants = [v for v in variants if v.config.name == args.template]
+            if not variants:
+                log_error(f"No matrix variant named {args.template}")
+                sys.exit(1)
+        sys.exit(0 if MatrixBuilder(generator, link=args.link).build_all(variants) else 1)
     
     if args.template:
         # Generate specific template
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Generator sources (reference/ and definitions/) read from a git revision.
+
+Instead of checking out a revision, the paths and object ids under the source
+directories are listed with `git ls-tree`, and every blob not yet cached is
+read through a single `git cat-file --batch` stream into a cache keyed by
+object id:
+
+    <cache>/objects/<aa>/<oid>     blob contents, written once
+    <cache>/tree/                  reference/ and definitions/ of the last revision built
+    <cache>/tree/.state.json       {"commit", "files": {path: [oid, mode]}}
+    <cache>/tree/.pending          present while the tree is being updated
+
+The tree is updated in place: files whose object id and mode are unchanged are
+left alone (so their stat-keyed caches stay valid), changed files are replaced
+by a hardlink to the cached blob, and removed files are deleted. Switching
+between revisions therefore costs about as much as an incremental build.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from build_lock import file_lock
+
+SOURCE_DIRS = ("reference", "definitions")
+
+STATE_FILE = ".state.json"
+
+PENDING_FILE = ".pending"
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+class GitSourceError(RuntimeError):
+    """A git command failed or returned unexpected output"""
+
+
+def _git(repo_dir: Path, *args: str) -> bytes:
+    proc = subprocess.run(["git", "-C", os.fspath(repo_dir), *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise GitSourceError(f"git {args[0]} failed: {proc.stderr.decode(errors='replace').strip()}")
+    return proc.stdout
+
+
+def resolve_commit(repo_dir: Path, rev: str) -> str:
+    """Full commit id for a revision (branch, tag, abbreviated id, HEAD~3, ...)"""
+    return _git(repo_dir, "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}").decode().strip()
+
+
+def list_source_files(repo_dir: Path, commit: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Blobs under SOURCE_DIRS of repo_dir (which may be a subdirectory of the repository) at a commit.
+
+    Returns:
+        Mapping of path relative to repo_dir to (object id, mode); submodules are skipped
+    """
+    prefix = _git(repo_dir, "rev-parse", "--show-prefix").decode().strip()
+    out = _git(repo_dir, "ls-tree", "-r", "-z", "--full-tree", commit, "--", *(prefix + d for d in SOURCE_DIRS))
+    files: Dict[str, Tuple[str, str]] = {}
+    for record in out.split(b'\0'):
+        if not record:
+            continue
+        meta, _, path = record.partition(b'\t')
+        mode, obj_type, oid = meta.decode().split(' ')
+        if obj_type == "blob":
+            files[path.decode('utf-8', 'surrogateescape')[len(prefix):]] = (oid, mode)
+    return files
+
+
+def iter_blobs(repo_dir: Path, oids: List[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Stream blob contents through one `git cat-file --batch` process.
+
+    Yields:
+        (object id, contents) in request order
+    """
+    if not oids:
+        return
+    proc = subprocess.Popen(["git", "-C", os.fspath(repo_dir), "cat-file", "--batch"],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Requests are written from a thread so a full stdout pipe cannot deadlock us
+    def feed() -> None:
+        try:
+            proc.stdin.write(''.join(f"{oid}\n" for oid in oids).encode())
+        finally:
+            proc.stdin.close()
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        for oid in oids:
+            header = proc.stdout.readline().split()
+            if len(header) != 3 or header[1] != b"blob":
+                raise GitSourceError(f"cat-file returned {b' '.join(header).decode()!r} for {oid}")
+            size = int(header[2])
+            data = proc.stdout.read(size)
+            proc.stdout.read(1)  # trailing newline
+            if len(data) != size:
+                raise GitSourceError(f"cat-file output truncated for {oid}")
+            yield header[0].decode(), data
+    finally:
+        writer.join()
+        proc.stdout.close()
+        proc.stderr.close()
+        proc.wait()
+
+
+class RevisionSources:
+    """reference/ and definitions/ of any revision, materialized from a blob cache"""
+
+    def __init__(self, repo_dir: Path, cache_dir: Path):
+        self.repo_dir = Path(repo_dir)
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.tree_dir = self.cache_dir / "tree"
+
+    def lock(self):
+        """Exclusive lock on the materialized tree; hold it while building from it"""
+        return file_lock(self.cache_dir / "tree.lock")
+
+    def _object_path(self, oid: str) -> Path:
+        return self.objects_dir / oid[:2] / oid
+
+    def _load_state(self) -> Dict[str, List[str]]:
+        try:
+            with open(self.tree_dir / STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f).get("files", {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, commit: str, files: Dict[str, Tuple[str, str]]) -> None:
+        state_path = self.tree_dir / STATE_FILE
+        tmp_path = state_path.with_name(f"{STATE_FILE}.tmp-{os.getpid()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"commit": commit, "files": {p: list(v) for p, v in sorted(files.items())}}, f)
+        os.replace(tmp_path, state_path)
+
+    def fetch_objects(self, oids: List[str]) -> int:
+        """Add missing blobs to the object cache; returns how many were read from git"""
+        missing = sorted({oid for oid in oids if not self._object_path(oid).exists()})
+        for oid, data in iter_blobs(self.repo_dir, missing):
+            path = self._object_path(oid)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{oid}.tmp-{os.getpid()}")
+            # Default (umask-derived) permissions, as a checkout would create
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return len(missing)
+
+    def _place(self, rel: str, oid: str, mode: str) -> None:
+        target = self.tree_dir / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.is_symlink() or target.exists():
+            target.unlink()
+        source = self._object_path(oid)
+        if mode == "120000":
+            os.symlink(source.read_bytes().decode('utf-8', 'surrogateescape'), target)
+            return
+        if mode == "100644":
+            # Generator only reads sources, so sharing the cached blob's inode is safe
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+        if mode == "100755":
+            os.chmod(target, 0o777 & ~_umask())
+
+    def checkout(self, rev: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Bring the materialized tree to a revision. Call with lock() held.
+
+        Args:
+            rev: Any git revision
+
+        Returns:
+            (commit id, counts of "fetched", "written", "removed", "unchanged" files)
+
+        Raises:
+            GitSourceError: for an unknown revision or git failure
+        """
+        try:
+            commit = resolve_commit(self.repo_dir, rev)
+        except GitSourceError:
+            raise GitSourceError(f"Unknown revision: {rev}")
+        files = list_source_files(self.repo_dir, commit)
+        pending_path = self.tree_dir / PENDING_FILE
+        # After an interrupted update the tree matches neither state; without a
+        # trusted state every path is rewritten and stale ones are found on disk
+        previous = {} if pending_path.exists() else self._load_state()
+        changed = {rel: meta for rel, meta in files.items() if tuple(previous.get(rel, ())) != meta}
+        stats = {
+            "fetched": self.fetch_objects([oid for oid, _ in changed.values()]),
+            "written": len(changed),
+            "removed": 0,
+            "unchanged": len(files) - len(changed),
+        }
+        self.tree_dir.mkdir(parents=True, exist_ok=True)
+        # The old state stays in place; the marker says it no longer describes the tree
+        pending_path.touch()
+        stale = [rel for rel in previous if rel not in files] if previous else self._untracked(files)
+        for rel in stale:
+            self._remove(rel)
+            stats["removed"] += 1
+        for rel, (oid, mode) in sorted(changed.items()):
+            self._place(rel, oid, mode)
+        self._save_state(commit, files)
+        pending_path.unlink()
+        return commit, stats
+
+    def _untracked(self, files: Dict[str, Tuple[str, str]]) -> List[str]:
+        """Paths on disk under the tree that are not in files (bookkeeping files excluded)"""
+        untracked = []
+        for root, dirs, names in os.walk(self.tree_dir):
+            rel_root = os.path.relpath(root, self.tree_dir)
+            for name in names + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+                rel = name if rel_root == '.' else f"{rel_root}/{name}".replace(os.sep, '/')
+                if rel not in files and rel not in (STATE_FILE, PENDING_FILE):
+                    untracked.append(rel)
+        return sorted(untracked)
+
+    def _remove(self, rel: str) -> None:
+        path = self.tree_dir / rel
+        if path.is_symlink() or path.exists():
+            path.unlink()
+        # Drop directories the removal left empty
+        parent = path.parent
+        while parent != self.tree_dir:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Minimal Overlay Optimizer
+
+Computes the smallest definition overlay that still generates the same template.
+For each definition the target tree (the current generator output, or
+originals/<template> with --from-originals) is compared with its base reference:
+
+- overlay files whose bytes match the reference are dropped
+- reference files missing from the target become `excludes` entries
+- package.json differences (nested fields, deletions as null) become `package_patches`
+
+Every proposal is regenerated in a scratch directory and compared byte-for-byte
+with the target before it is reported as valid or written back.
+
+Usage:
+    python3 tools/optimize_overlays.py                  # report bytes saved per template
+    python3 tools/optimize_overlays.py -t vite-cf-DO-runner --write
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set
+
+import yaml
+
+from generate_templates import TemplateGenerator, deep_merge_with_null, render_package_json, log_info, log_warn, log_error
+from extract_template_differences import HashCache, compare_trees, diff_json
+
+
+@dataclass
+class OverlayPlan:
+    """Minimal overlay for one template"""
+    template_name: str
+    current_files: List[str] = field(default_factory=list)
+    overlay_files: List[str] = field(default_factory=list)
+    excludes: List[str] = field(default_factory=list)
+    package_patches: Dict[str, Any] = field(default_factory=dict)
+    current_bytes: int = 0
+    optimized_bytes: int = 0
+    verified: bool = False
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.current_bytes - self.optimized_bytes
+
+
+class OverlayOptimizer:
+    """Computes and applies minimal overlays for template definitions"""
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = root_dir
+        self.generator = TemplateGenerator(root_dir)
+        self.hash_cache = HashCache()
+
+    def _overlay_copyable(self, rel: str) -> bool:
+        name = os.path.basename(rel)
+        if name in self.generator.OVERLAY_SKIP_NAMES or name.endswith('.yaml'):
+            return False
+        return not self.generator._is_ignored(rel, [])
+
+    def _tree_bytes(self, base: Path, files: List[str]) -> int:
+        return sum((base / rel).stat().st_size for rel in files)
+
+    def _same_bytes(self, a: Path, b: Path) -> bool:
+        sa, sb = a.stat(), b.stat()
+        if sa.st_size != sb.st_size:
+            return False
+        return self.hash_cache.digest(str(a), sa) == self.hash_cache.digest(str(b), sb)
+
+    def _compact_excludes(self, removed: Set[str], reference_files: List[str], target_files: Set[str],
+                          existing: Optional[List[str]] = None) -> List[str]:
+        """
+        Exclude patterns for the removed reference files.
+
+        Existing patterns are kept as written (in order) while they match no file
+        of the target, so globs like `tsconfig*.json` keep covering files added to
+        the reference later. Removed files they do not cover get new patterns,
+        with fully removed reference directories collapsed into `dir/**`.
+        """
+        import fnmatch
+
+        kept: List[str] = []
+        for pattern in existing or []:
+            matches = re.compile(fnmatch.translate(pattern)).match
+            if not any(matches(rel) for rel in target_files):
+                kept.append(pattern)
+        if kept:
+            is_covered = re.compile('|'.join(f"(?:{fnmatch.translate(p)})" for p in kept)).match
+            uncovered = {rel for rel in removed if not is_covered(rel)}
+        else:
+            uncovered = set(removed)
+
+        files_by_dir: Dict[str, List[str]] = {}
+        for rel in reference_files:
+            parts = rel.split('/')
+            for depth in range(1, len(parts)):
+                files_by_dir.setdefault('/'.join(parts[:depth]), []).append(rel)
+        target_dirs: Set[str] = set()
+        for rel in target_files:
+            parts = rel.split('/')
+            for depth in range(1, len(parts)):
+                target_dirs.add('/'.join(parts[:depth]))
+
+        patterns: List[str] = []
+        covered: Set[str] = set()
+        for directory in sorted(files_by_dir, key=lambda d: (d.count('/'), d)):
+            if any(directory.startswith(c + '/') for c in covered):
+                continue
+            if directory in target_dirs:
+                continue
+            dir_files = files_by_dir[directory]
+            if all(rel in removed for rel in dir_files) and any(rel in uncovered for rel in dir_files):
+                patterns.append(f"{directory}/**")
+                covered.add(directory)
+        for rel in sorted(uncovered):
+            if not any(rel.startswith(c + '/') for c in covered):
+                patterns.append(rel)
+        return kept + sorted(patterns)
+
+    def plan(self, template_name: str, target_dir: Path, config: Dict[str, Any]) -> OverlayPlan:
+        """
+        Compute the minimal overlay that reproduces target_dir.
+
+        Args:
+            template_name: Template name
+            target_dir: Tree the definition must generate
+            config: Parsed definition YAML
+
+        Returns:
+            OverlayPlan (not yet verified)
+        """
+        reference_dir = self.generator.reference_dir / config.get('base_reference', 'shared-reference')
+        overlay_dir = self.generator.definitions_dir / template_name
+        result = OverlayPlan(template_name)
+
+        reference_files = self.generator._iter_files(reference_dir, [])
+        target_files = self.generator._iter_files(target_dir, [])
+        reference_set = set(reference_files)
+        target_set = set(target_files)
+
+        if overlay_dir.is_dir():
+            result.current_files = [rel for rel in self.generator._iter_files(overlay_dir, []) if self._overlay_copyable(rel)]
+            result.current_bytes = self._tree_bytes(overlay_dir, result.current_files)
+
+        overlay: List[str] = []
+        for rel in target_files:
+            if rel in reference_set and self._same_bytes(reference_dir / rel, target_dir / rel):
+                continue
+            overlay.append(rel)
+
+        # Express package.json as patches when the generator reproduces it byte-for-byte
+        if 'package.json' in overlay and 'package.json' in reference_set:
+            try:
+                with open(reference_dir / 'package.json', 'r', encoding='utf-8') as f:
+                    ref_pkg = json.load(f)
+                with open(target_dir / 'package.json', 'r', encoding='utf-8') as f:
+                    target_text = f.read()
+                patches = diff_json(ref_pkg, json.loads(target_text))
+                if render_package_json(deep_merge_with_null(ref_pkg, patches)) == target_text:
+                    result.package_patches = patches
+                    overlay.remove('package.json')
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                log_warn(f"{template_name}: keeping package.json in overlay ({e})")
+
+        for rel in overlay:
+            if not self._overlay_copyable(rel):
+                log_warn(f"{template_name}: {rel} cannot be carried by an overlay")
+
+        removed = reference_set - target_set
+        result.excludes = self._compact_excludes(removed, reference_files, target_set, config.get('excludes'))
+        result.overlay_files = overlay
+        result.optimized_bytes = self._tree_bytes(target_dir, overlay)
+        return result
+
+    def _optimized_config(self, config: Dict[str, Any], overlay_plan: OverlayPlan) -> Dict[str, Any]:
+        new_config = dict(config)
+        new_config.pop('package_patches', None)
+        new_config.pop('excludes', None)
+        if overlay_plan.package_patches:
+            new_config['package_patches'] = overlay_plan.package_patches
+        if overlay_plan.excludes:
+            new_config['excludes'] = overlay_plan.excludes
+        return new_config
+
+    def _write_definition(self, definitions_dir: Path, target_dir: Path, overlay_plan: OverlayPlan, config: Dict[str, Any]) -> None:
+        """Write overlay files and YAML; files the generator never copies (lockfiles etc.) are left alone"""
+        overlay_dir = definitions_dir / overlay_plan.template_name
+        keep = set(overlay_plan.overlay_files)
+        if overlay_dir.is_dir():
+            for rel in self.generator._iter_files(overlay_dir, []):
+                if self._overlay_copyable(rel) and rel not in keep:
+                    (overlay_dir / rel).unlink()
+            for root, dirs, files in os.walk(overlay_dir, topdown=False):
+                if not dirs and not files and Path(root) != overlay_dir:
+                    Path(root).rmdir()
+        for rel in overlay_plan.overlay_files:
+            dst = overlay_dir / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(target_dir / rel, dst)
+        # yaml.dump does not preserve comments; keys keep their original order
+        with open(definitions_dir / f"{overlay_plan.template_name}.yaml", 'w', encoding='utf-8') as f:
+            yaml.dump(self._optimized_config(config, overlay_plan), f, default_flow_style=False, sort_keys=False)
+
+    def verify(self, overlay_plan: OverlayPlan, target_dir: Path, config: Dict[str, Any]) -> bool:
+        """Regenerate from the proposed definition in a scratch root and compare with target_dir"""
+        with tempfile.TemporaryDirectory(prefix='overlay-verify-') as tmp:
+            scratch = TemplateGenerator(self.root_dir)
+            scratch.definitions_dir = Path(tmp) / 'definitions'
+            scratch.build_dir = Path(tmp) / 'build'
+            self._write_definition(scratch.definitions_dir, target_dir, overlay_plan, config)
+            yaml_file = scratch.definitions_dir / f"{overlay_plan.template_name}.yaml"
+            if not scratch.generate_template_from_yaml(yaml_file):
+                return False
+            diff = compare_trees(scratch.build_dir / overlay_plan.template_name, target_dir, self.hash_cache)
+            # Ignored paths (lockfiles, caches) are never generated, so only compare tracked files
+            relevant = [p for p in diff.only_in_original + diff.only_in_reference + diff.differing
+                        if not self.generator._is_ignored(p, [])]
+            for rel in relevant:
+                log_warn(f"{overlay_plan.template_name}: optimized overlay differs at {rel}")
+            return not relevant
+
+    def optimize(self, template_name: str, from_originals: bool = False, write: bool = False) -> Optional[OverlayPlan]:
+        """
+        Plan, verify and optionally write the minimal overlay for one template.
+
+        Args:
+            template_name: Template name
+            from_originals: Use originals/<template> as the target instead of the current generator output
+            write: Rewrite definitions/<template>/ and its YAML when verification passes
+
+        Returns:
+            Verified OverlayPlan, or None on failure
+        """
+        yaml_file = self.generator.definitions_dir / f"{template_name}.yaml"
+        if not yaml_file.exists():
+            log_error(f"Template configuration not found: {yaml_file}")
+            return None
+        with open(yaml_file, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        if config.get('template_specific_files'):
+            log_warn(f"{template_name}: template_specific_files is set; skipping")
+            return None
+
+        with tempfile.TemporaryDirectory(prefix='overlay-target-') as tmp:
+            if from_originals:
+                target_dir = self.generator.originals_dir / template_name
+                if not target_dir.is_dir():
+                    log_error(f"Original template not found: {target_dir}")
+                    return None
+            else:
+                builder = TemplateGenerator(self.root_dir)
+                builder.build_dir = Path(tmp)
+                if not builder.generate_template_from_yaml(yaml_file):
+                    return None
+                target_dir = builder.build_dir / template_name
+
+            overlay_plan = self.plan(template_name, target_dir, config)
+            overlay_plan.verified = self.verify(overlay_plan, target_dir, config)
+            if not overlay_plan.verified:
+                log_error(f"{template_name}: optimized definition does not reproduce the target; not writing")
+                return None
+            # Rewriting re-serializes the YAML (dropping comments and quoting), so only do it for a real saving
+            if write and overlay_plan.bytes_saved <= 0:
+                log_info(f"{template_name}: definition already minimal; not rewriting")
+            elif write:
+                self._write_definition(self.generator.definitions_dir, target_dir, overlay_plan, config)
+                log_info(f"Wrote optimized definition for {template_name}")
+            return overlay_plan
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compute minimal overlays for template definitions")
+    parser.add_argument("--root", "-r", default=".", help="Root directory containing reference/ and definitions/")
+    parser.add_argument("--template", "-t", action="append", help="Template to optimize (repeatable; default: all)")
+    parser.add_argument("--from-originals", action="store_true", help="Use originals/<template> as the target tree")
+    parser.add_argument("--write", action="store_true", help="Rewrite definitions with the verified minimal overlay")
+    args = parser.parse_args()
+
+    optimizer = OverlayOptimizer(Path(args.root).resolve())
+    names = args.template or sorted(p.stem for p in optimizer.generator.definitions_dir.glob("*.yaml"))
+
+    total_saved = 0
+    failed = False
+    for name in names:
+        overlay_plan = optimizer.optimize(name, from_originals=args.from_originals, write=args.write)
+        if overlay_plan is None:
+            failed = True
+            continue
+        total_saved += overlay_plan.bytes_saved
+        print(f"{name}: {len(overlay_plan.overlay_files)} overlay files, {len(overlay_plan.excludes)} excludes, "
+              f"{len(overlay_plan.package_patches)} package patch fields; "
+              f"{overlay_plan.current_bytes} -> {overlay_plan.optimized_bytes} bytes (saved {overlay_plan.bytes_saved})")
+    print(f"Total bytes saved: {total_saved}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
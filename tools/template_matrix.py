@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Matrix definitions: many template variants from one YAML file.
+
+A matrix file declares shared settings plus parameter axes. Every combination
+of axis values is one variant; its settings are the shared ones with each
+value's fragment merged in, axis order first to last (mappings merge
+recursively, lists are concatenated without duplicates, scalars replace):
+
+    matrix: 1
+    name: "vite-{integrations}-runner"          # {axis} is the value's key
+    display_name: "Vite + {integrations}"
+    description: "Vite/React with {integrations}"
+    base_reference: vite-reference
+    framework: {type: react, bundler: vite}
+    cloudflare: {deployment: workers}
+    overlays: [vite-common]                     # definitions/<dir> applied in order
+    axes:
+      integrations:
+        do:    {cloudflare: {integrations: [durable-objects]}, overlays: [vite-cf-DO-runner]}
+        do-kv: {cloudflare: {integrations: [durable-objects, kv]}, overlays: [vite-cf-DO-KV-runner]}
+    exclude:                                    # combinations to skip
+      - {integrations: do-kv}
+
+Besides the TemplateConfig fields (tools/template_schema.py), a fragment may
+set `overlays` and `excludes` (glob patterns removed from the result, as in
+definition YAMLs). overrides.package_json_patches is applied like a
+definition's package_patches; overrides.wrangler_config, json_patches,
+file_replacements and additional_dependencies like the definition keys of the
+same names (tools/config_patch.py).
+
+definitions/matrices/vite.yaml is a working example: the Durable Objects,
+Durable Objects + KV and Agents overlays as one integrations axis.
+
+MatrixBuilder plans the build around shared layers: each distinct prefix of
+(base reference, overlays...) is indexed and resolved into a file map once,
+and its package.json parsed once, so per-variant work is only copying the
+resolved files (or hardlinking them, with link=True), rendering a patched
+package.json and skipping excludes.
+
+Usage:
+    python3 tools/template_matrix.py expand definitions/matrices/vite.yaml [--json]
+    python3 tools/generate_templates.py --matrix definitions/matrices/vite.yaml
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import re
+import shutil
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from template_schema import TemplateConfig, validate_template_config
+from config_patch import PatchError, collect_file_patches, patch_text
+from generate_templates import (TemplateGenerator, deep_merge_with_null, log_error, log_info, render_package_json,
+                                with_dependencies)
+from fastcopy import copy_file
+
+MATRIX_VERSION = 1
+
+# Keys of a matrix file that are not variant settings
+_MATRIX_KEYS = ("matrix", "axes", "exclude")
+
+# Variant settings that may contain {axis} placeholders
+_FORMATTED_KEYS = ("name", "display_name", "description")
+
+
+@dataclass
+class MatrixVariant:
+    """One expanded combination of axis values"""
+    config: TemplateConfig
+    axes: Dict[str, str]
+    overlays: List[str] = field(default_factory=list)
+    excludes: List[str] = field(default_factory=list)
+
+    @property
+    def layers(self) -> Tuple[str, ...]:
+        """Base reference followed by overlay directories, in application order"""
+        return (self.config.base_reference, *self.overlays)
+
+
+def merge_fragment(base: Dict[str, Any], fragment: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge an axis value's fragment into variant settings (returns a new dict)"""
+    result = dict(base)
+    for key, value in fragment.items():
+        current = result.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            result[key] = merge_fragment(current, value)
+        elif isinstance(current, list) and isinstance(value, list):
+            result[key] = current + [item for item in value if item not in current]
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+def expand_matrix(data: Dict[str, Any]) -> List[MatrixVariant]:
+    """
+    Expand a parsed matrix definition into validated variants.
+
+    Args:
+        data: Parsed matrix YAML
+
+    Returns:
+        Variants in axis order (last axis varies fastest)
+
+    Raises:
+        ValueError: for an unsupported format, invalid variant configs or duplicate names
+    """
+    if data.get("matrix") != MATRIX_VERSION:
+        raise ValueError(f"Not a version {MATRIX_VERSION} matrix definition (missing 'matrix: {MATRIX_VERSION}')")
+    axes: Dict[str, Dict[str, Any]] = data.get("axes") or {}
+    if not axes or not all(isinstance(values, dict) and values for values in axes.values()):
+        raise ValueError("'axes' must map each axis name to a non-empty mapping of values")
+    skip_rules: List[Dict[str, str]] = data.get("exclude") or []
+    shared = {key: value for key, value in data.items() if key not in _MATRIX_KEYS}
+
+    variants: List[MatrixVariant] = []
+    errors: List[str] = []
+    seen: Dict[str, Dict[str, str]] = {}
+    for combo in itertools.product(*(list(values.items()) for values in axes.values())):
+        keys = {axis: str(key) for axis, (key, _) in zip(axes, combo)}
+        if any(all(keys.get(axis) == str(value) for axis, value in rule.items()) for rule in skip_rules):
+            continue
+        settings = shared
+        for _, fragment in combo:
+            settings = merge_fragment(settings, fragment or {})
+        settings = dict(settings)
+        for key in _FORMATTED_KEYS:
+            if isinstance(settings.get(key), str):
+                settings[key] = settings[key].format_map(keys)
+        overlays = settings.pop("overlays", None) or []
+        excludes = settings.pop("excludes", None) or []
+        try:
+            config = TemplateConfig.from_dict(settings)
+        except KeyError as e:
+            errors.append(f"{keys}: missing required field {e} (set it in the shared settings or every axis value)")
+            continue
+        except TypeError as e:
+            errors.append(f"{keys}: invalid settings ({e})")
+            continue
+        problems = validate_template_config(config)
+        if config.name in seen:
+            problems.append(f"name also produced by {seen[config.name]}")
+        if problems:
+            errors.append(f"{config.name}: {'; '.join(problems)}")
+            continue
+        seen[config.name] = keys
+        variants.append(MatrixVariant(config=config, axes=keys, overlays=list(overlays), excludes=list(excludes)))
+    if errors:
+        raise ValueError("Invalid matrix variants:\n  " + "\n  ".join(errors))
+    return variants
+
+
+def load_matrix(matrix_file: Path) -> List[MatrixVariant]:
+    """Read and expand a matrix YAML file (see expand_matrix)"""
+    import yaml
+
+    with open(matrix_file, 'r', encoding='utf-8') as f:
+        return expand_matrix(yaml.safe_load(f) or {})
+
+
+class _Layer:
+    """Resolved file map of a layer stack"""
+    __slots__ = ('files', 'dirs', 'package_json')
+
+    def __init__(self, files: Dict[str, os.DirEntry], dirs: List[str]):
+        self.files = files
+        self.dirs = dirs
+        self.package_json: Optional[dict] = None
+
+
+class MatrixBuilder:
+    """Builds matrix variants into build/, resolving each shared layer stack once"""
+
+    def __init__(self, generator: TemplateGenerator, link: bool = False):
+        """
+        Args:
+            generator: Generator providing reference/, definitions/, build/ and locking
+            link: Hardlink unchanged source files into builds instead of copying them,
+                so a variant costs only its directory entries and patched files. Builds
+                then share inodes with reference/ and definitions/ and must be treated
+                as read-only.
+        """
+        self.generator = generator
+        self.link = link
+        self._layers: Dict[Tuple[str, ...], _Layer] = {}
+        self._exclude_matchers: Dict[Tuple[str, ...], Any] = {}
+
+    def resolve(self, layers: Tuple[str, ...]) -> _Layer:
+        """
+        File map of a base reference plus overlays, memoized per prefix.
+
+        Variants sharing (reference, overlay A) reuse that map and only pay for
+        the overlays they add on top.
+        """
+        layer = self._layers.get(layers)
+        if layer is not None:
+            return layer
+        if len(layers) == 1:
+            source = self.generator.reference_dir / layers[0]
+            if not source.is_dir():
+                raise FileNotFoundError(f"Reference template not found: {source}")
+            index = self.generator.index_source_tree(source)
+            layer = _Layer(dict(index.files), list(index.dirs))
+        else:
+            parent = self.resolve(layers[:-1])
+            source = self.generator.definitions_dir / layers[-1]
+            if not source.is_dir():
+                raise FileNotFoundError(f"Overlay directory not found: {source}")
+            index = self.generator.index_source_tree(source, overlay=True)
+            files = dict(parent.files)
+            files.update(index.files)
+            known = set(parent.dirs)
+            layer = _Layer(files, parent.dirs + [d for d in index.dirs if d not in known])
+        if 'package.json' in layer.files:
+            with open(layer.files['package.json'].path, 'r', encoding='utf-8') as f:
+                layer.package_json = json.load(f)
+        self._layers[layers] = layer
+        return layer
+
+    def _exclude_matcher(self, patterns: List[str]):
+        key = tuple(patterns)
+        matcher = self._exclude_matchers.get(key)
+        if matcher is None:
+            import fnmatch
+
+            matcher = re.compile('|'.join(f"(?:{fnmatch.translate(p)})" for p in patterns)).match
+            self._exclude_matchers[key] = matcher
+        return matcher
+
+    def _write_variant(self, variant: MatrixVariant, layer: _Layer, staging_dir: Path) -> None:
+        files = layer.files
+        dirs = layer.dirs
+        if variant.excludes:
+            is_excluded = self._exclude_matcher(variant.excludes)
+            files = {rel: entry for rel, entry in files.items() if is_excluded(rel) is None}
+            # Like apply_excludes, which prunes every directory left empty
+            kept = set()
+            for rel in files:
+                parent = rel.rpartition('/')[0]
+                while parent and parent not in kept:
+                    kept.add(parent)
+                    parent = parent.rpartition('/')[0]
+            dirs = [d for d in dirs if d in kept]
+        root = os.fspath(staging_dir)
+        for rel in dirs:
+            os.makedirs(os.path.join(root, rel), exist_ok=True)
+        overrides = variant.config.overrides
+        patches = with_dependencies(overrides.package_json_patches, overrides.additional_dependencies)
+        file_patches = {}
+        if overrides.wrangler_config or overrides.json_patches or overrides.file_replacements:
+            wrangler_file = 'wrangler.jsonc' if 'wrangler.jsonc' in files or 'wrangler.json' not in files else 'wrangler.json'
+            file_patches = collect_file_patches(overrides.wrangler_config, overrides.json_patches,
+                                                overrides.file_replacements, wrangler_file)
+            missing = sorted(rel for rel in file_patches if rel not in files)
+            if missing:
+                raise PatchError(f"{missing[0]}: file not found")
+        for rel, entry in files.items():
+            if rel == 'package.json' and patches and layer.package_json is not None:
+                with open(os.path.join(root, rel), 'w', encoding='utf-8') as f:
+                    f.write(render_package_json(deep_merge_with_null(layer.package_json, patches)))
+            elif rel in file_patches:
+                # Patched files are written, never linked to the shared source
+                with open(entry.path, 'r', encoding='utf-8', newline='') as f:
+                    text = f.read()
+                try:
+                    text = patch_text(text, *file_patches[rel])
+                except PatchError as e:
+                    raise PatchError(f"{rel}: {e}")
+                with open(os.path.join(root, rel), 'w', encoding='utf-8', newline='') as f:
+                    f.write(text)
+                shutil.copymode(entry.path, os.path.join(root, rel))
+            elif self.link:
+                try:
+                    os.link(entry.path, os.path.join(root, rel))
+                except OSError:
+                    # e.g. build/ on another filesystem
+                    copy_file(entry.path, os.path.join(root, rel))
+            else:
+                copy_file(entry.path, os.path.join(root, rel))
+
+    def build(self, variant: MatrixVariant) -> bool:
+        """Build one variant into build/<name> (staged and swapped like regular templates)"""
+        generator = self.generator
+        name = variant.config.name
+        try:
+            layer = self.resolve(variant.layers)
+            with generator.template_lock(name):
+                staging_dir = generator.create_staging_dir(name)
+                try:
+                    self._write_variant(variant, layer, staging_dir)
+                    generator.swap_into_place(staging_dir, generator.build_dir / name)
+                finally:
+                    if staging_dir.exists():
+                        shutil.rmtree(staging_dir, ignore_errors=True)
+            return True
+        except Exception as e:
+            log_error(f"Failed to build matrix variant {name}: {e}")
+            return False
+
+    def build_all(self, variants: List[MatrixVariant], jobs: Optional[int] = None) -> bool:
+        """
+        Build variants, resolving every layer stack first and then writing variants in parallel.
+
+        Writing a variant is file creation and copying, which releases the GIL,
+        so threads keep several cores and the disk busy.
+
+        Args:
+            variants: Variants to build
+            jobs: Concurrent variant writes (default: CPU count)
+
+        Returns:
+            True if every variant was built
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.generator.build_dir.mkdir(parents=True, exist_ok=True)
+        self.generator.collect_stale_staging()
+        ordered = sorted(variants, key=lambda v: (v.layers, v.config.name))
+        for variant in ordered:
+            try:
+                self.resolve(variant.layers)
+            except (OSError, ValueError):
+                pass  # reported by build()
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 4) as pool:
+            failures = sum(1 for ok in pool.map(self.build, ordered) if not ok)
+        log_info(f"Matrix build complete: {len(variants) - failures} variants built, {failures} failed "
+                 f"({len(self._layers)} layer stacks resolved)")
+        return failures == 0
+
+
+def variant_summary(variant: MatrixVariant) -> Dict[str, Any]:
+    config = variant.config
+    return {
+        "name": config.name,
+        "axes": variant.axes,
+        "base_reference": config.base_reference,
+        "overlays": variant.overlays,
+        "framework": config.framework.type,
+        "integrations": config.cloudflare.integrations,
+        "excludes": variant.excludes,
+    }
+
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Expand matrix template definitions")
+    parser.add_argument("command", choices=["expand"], help="expand: list the variants a matrix file produces")
+    parser.add_argument("matrix_file", help="Matrix definition YAML")
+    parser.add_argument("--json", action="store_true", help="Print variants as JSON")
+    args = parser.parse_args()
+
+    try:
+        variants = load_matrix(Path(args.matrix_file))
+    except (OSError, ValueError) as e:
+        log_error(str(e))
+        sys.exit(1)
+    if args.json:
+        print(json.dumps([variant_summary(v) for v in variants], indent=2))
+    else:
+        for variant in variants:
+            print(f"{variant.config.name}  <- {' + '.join(variant.layers)}")
+    log_info(f"{len(variants)} variants")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,8 +31,9 @@ class CloudflareConfig:
 class OverrideConfig:
     """Template override configuration"""
     package_json_patches: Dict[str, Any] = field(default_factory=dict)
-    wrangler_config: Dict[str, Any] = field(default_factory=dict)
-    file_replacements: Dict[str, str] = field(default_factory=dict)
+    wrangler_config: Dict[str, Any] = field(default_factory=dict)  # merge patch, comments preserved
+    json_patches: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # path -> merge patch
+    file_replacements: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)  # path -> find/regex rules
     additional_dependencies: Dict[str, str] = field(default_factory=dict)
 
 
@@ -51,8 +52,11 @@ class TemplateConfig:
     @classmethod
     def from_yaml(cls, yaml_content: str) -> 'TemplateConfig':
         """Create TemplateConfig from YAML string"""
-        data = yaml.safe_load(yaml_content)
-        
+        return cls.from_dict(yaml.safe_load(yaml_content))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TemplateConfig':
+        """Create TemplateConfig from parsed YAML data"""
         # Convert framework config
         framework_data = data.get('framework', {})
         framework = FrameworkConfig(**framework_data)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Single-pass directory indexer for the template generator.
+
+Walks a tree once with os.scandir and records every kept file and directory
+by its relative POSIX path string together with its os.DirEntry, whose
+is_dir()/stat() results are cached by the OS layer. Callers decide what to skip
+through plain string predicates, so no Path objects or relative_to() calls
+are made per entry. iter_sorted_files streams the same walk in sorted order
+without building an index.
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+
+PathLike = Union[str, Path]
+RelPredicate = Callable[[str, str], bool]
+
+
+class TreeIndex:
+    """Files and directories under a root, keyed by relative path"""
+
+    # A plain class rather than a dataclass: importing dataclasses (and inspect)
+    # costs more than the rest of the generator's startup
+    __slots__ = ('root', 'files', 'dirs')
+
+    def __init__(self, root: str, files: Optional[Dict[str, os.DirEntry]] = None, dirs: Optional[List[str]] = None):
+        self.root = root
+        self.files: Dict[str, os.DirEntry] = files if files is not None else {}
+        self.dirs: List[str] = dirs if dirs is not None else []
+
+    def __repr__(self) -> str:
+        return f"TreeIndex(root={self.root!r}, files={len(self.files)}, dirs={len(self.dirs)})"
+
+    def sorted_files(self) -> List[str]:
+        return sorted(self.files)
+
+    def path(self, rel: str) -> str:
+        """Absolute path of a file in the index"""
+        return self.files[rel].path
+
+    def stat(self, rel: str) -> os.stat_result:
+        """Cached stat of a file in the index (follows symlinks)"""
+        return self.files[rel].stat()
+
+
+def index_tree(root: PathLike, skip_dir: Optional[RelPredicate] = None, skip_file: Optional[RelPredicate] = None) -> TreeIndex:
+    """
+    Index a directory tree in a single scandir pass.
+
+    Predicates receive (relative path, entry name). A skipped directory is not
+    descended into. Symlinks to directories are followed, matching os.walk's
+    handling of the entries it yields and shutil.copytree's default.
+
+    Args:
+        root: Directory to index
+        skip_dir: Return True to prune a directory
+        skip_file: Return True to leave a file out
+
+    Returns:
+        TreeIndex with directories in pre-order (parents before children)
+    """
+    root_str = os.fspath(root)
+    index = TreeIndex(root_str)
+    stack: List[tuple] = [(root_str, '')]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            rel = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if skip_dir is not None and skip_dir(rel, name):
+                    continue
+                index.dirs.append(rel)
+                subdirs.append((entry.path, rel))
+            else:
+                if skip_file is not None and skip_file(rel, name):
+                    continue
+                index.files[rel] = entry
+        # Reverse so the stack pops subdirectories in name order
+        stack.extend(reversed(subdirs))
+    return index
+
+
+def iter_sorted_files(root: PathLike, skip_dir: Optional[RelPredicate] = None,
+                      skip_file: Optional[RelPredicate] = None) -> Iterator[Tuple[str, os.DirEntry]]:
+    """
+    Yield (relative path, entry) for every file under root in sorted path order.
+
+    Unlike index_tree nothing is accumulated: only the entries of the
+    directories on the current path are held, so memory is bounded by tree
+    depth and directory width rather than file count. Siblings are ordered by
+    name, with directories keyed as "name/", which makes the depth-first order
+    identical to sorting the full relative path strings.
+
+    Args:
+        root: Directory to walk
+        skip_dir: Return True to prune a directory
+        skip_file: Return True to leave a file out
+    """
+    def scan(dir_path: str, rel_dir: str) -> Iterator[Tuple[str, os.DirEntry]]:
+        try:
+            with os.scandir(dir_path) as it:
+                keyed = []
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    keyed.append((entry.name + '/' if is_dir else entry.name, is_dir, entry))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        keyed.sort(key=lambda item: item[0])
+        for _, is_dir, entry in keyed:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if is_dir:
+                if skip_dir is None or not skip_dir(rel, entry.name):
+                    yield from scan(entry.path, rel)
+            elif skip_file is None or not skip_file(rel, entry.name):
+                yield rel, entry
+
+    yield from scan(os.fspath(root), '')
+
+
+def materialize_dirs(index: TreeIndex, dst: PathLike) -> None:
+    """Create every indexed directory under dst (parents are listed first)"""
+    dst_str = os.fspath(dst)
+    os.makedirs(dst_str, exist_ok=True)
+    for rel in index.dirs:
+        os.makedirs(os.path.join(dst_str, rel), exist_ok=True)
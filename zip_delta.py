@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Delta updates between template archive versions.
+
+Alongside each full archive, packaging keeps an archive manifest
+(`<zip>.manifest.json`: path -> sha256/size/mode plus a tree hash). When a
+template is re-packaged, the previous manifest is compared with the new tree
+and a delta archive is written to `<delta-dir>/<template>/<base-tree-hash>.zip`:
+
+    delta.json      base/target tree hashes, added/changed/removed paths,
+                    base hashes of changed/removed files, new file metadata
+    files/<path>    new contents of every added or changed file
+
+A consumer that extracted the previous archive applies the delta in place:
+
+    python3 zip_delta.py apply ./my-template deltas/vite-cfagents-runner/<hash>.zip --full-archive vite-cfagents-runner.zip
+
+The base tree is checked before anything is written and the result is checked
+afterwards; on any mismatch the full archive is extracted instead.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import stat
+import sys
+import urllib.request
+import zipfile
+from pathlib import Path
+
+from create_zip import iter_archive_files
+
+MANIFEST_VERSION = 1
+DELTA_VERSION = 1
+
+
+def tree_hash(files):
+    """
+    Hash identifying a tree version: SHA-256 over sorted (path, content hash) pairs.
+
+    File modes are deliberately left out because extractors do not restore them
+    consistently.
+
+    Args:
+        files: Mapping of relative path to {"sha256", ...}
+    """
+    h = hashlib.sha256()
+    for path in sorted(files):
+        h.update(path.encode('utf-8'))
+        h.update(b'\0')
+        h.update(files[path]["sha256"].encode('ascii'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def build_manifest(source_dir, name=None, exclude_patterns=None):
+    """
+    Build an archive manifest for a template directory.
+
+    Args:
+        source_dir: Template directory (build output or an extracted archive)
+        name: Template name (defaults to the directory name)
+        exclude_patterns: Archive exclusion patterns (defaults to create_zip's)
+
+    Returns:
+        Manifest dictionary
+    """
+    source_path = Path(source_dir)
+    files = {}
+    for file_path, arc_path in iter_archive_files(source_path, exclude_patterns):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        files[arc_path.as_posix()] = {
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "size": len(data),
+            "mode": stat.S_IMODE(os.stat(file_path).st_mode),
+        }
+    return {
+        "version": MANIFEST_VERSION,
+        "name": name or source_path.name,
+        "tree_hash": tree_hash(files),
+        "files": {path: files[path] for path in sorted(files)},
+    }
+
+
+def load_manifest(manifest_path):
+    """Load an archive manifest, or return None if it is missing or unreadable"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(manifest, manifest_path):
+    """Write an archive manifest atomically"""
+    manifest_path = Path(manifest_path)
+    tmp_path = manifest_path.with_name(f".{manifest_path.name}.tmp-{os.getpid()}")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, manifest_path)
+
+
+def create_delta(base_manifest, target_manifest, source_dir, delta_dir):
+    """
+    Write the delta archive that turns base_manifest's tree into source_dir.
+
+    Args:
+        base_manifest: Manifest of the previously published archive
+        target_manifest: Manifest of source_dir (see build_manifest)
+        source_dir: Template directory holding the new contents
+        delta_dir: Root directory for delta archives
+
+    Returns:
+        Path to the delta archive, or None if the trees are identical
+    """
+    if base_manifest["tree_hash"] == target_manifest["tree_hash"]:
+        return None
+
+    base_files = base_manifest["files"]
+    target_files = target_manifest["files"]
+    added = sorted(p for p in target_files if p not in base_files)
+    removed = sorted(p for p in base_files if p not in target_files)
+    changed = sorted(p for p in target_files
+                     if p in base_files and base_files[p]["sha256"] != target_files[p]["sha256"])
+
+    delta = {
+        "version": DELTA_VERSION,
+        "name": target_manifest["name"],
+        "base_tree_hash": base_manifest["tree_hash"],
+        "target_tree_hash": target_manifest["tree_hash"],
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "base_files": {p: base_files[p]["sha256"] for p in changed + removed},
+        "files": {p: target_files[p] for p in added + changed},
+    }
+
+    delta_path = Path(delta_dir) / target_manifest["name"] / f"{base_manifest['tree_hash']}.zip"
+    delta_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = delta_path.with_name(f".{delta_path.name}.tmp-{os.getpid()}")
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
+        zipf.writestr("delta.json", json.dumps(delta, indent=2, ensure_ascii=False))
+        for path in added + changed:
+            zipf.write(Path(source_dir) / path, f"files/{path}")
+    os.replace(tmp_path, delta_path)
+    return delta_path
+
+
+def _open_archive(location):
+    """Open a zip from a local path or an http(s) URL"""
+    location = str(location)
+    if location.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(location) as response:
+            return zipfile.ZipFile(io.BytesIO(response.read()))
+    return zipfile.ZipFile(location)
+
+
+def _current_files(template_dir):
+    return {
+        path: {"sha256": info["sha256"]}
+        for path, info in build_manifest(template_dir)["files"].items()
+    }
+
+
+def _safe_target(template_dir, path):
+    if os.path.isabs(path) or '..' in Path(path).parts:
+        raise ValueError(f"Unsafe path in delta: {path}")
+    return Path(template_dir) / path
+
+
+def _write_file(target, data, mode):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp-{os.getpid()}")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, target)
+
+
+def extract_full(template_dir, archive):
+    """
+    Replace the archive-tracked files in template_dir with the full archive.
+
+    Untracked content such as node_modules/ is left in place.
+    """
+    for file_path, _ in iter_archive_files(Path(template_dir)):
+        file_path.unlink()
+    with _open_archive(archive) as zipf:
+        for info in zipf.infolist():
+            if info.is_dir():
+                continue
+            target = _safe_target(template_dir, info.filename)
+            mode = (info.external_attr >> 16) & 0o777 or 0o644
+            _write_file(target, zipf.read(info), mode)
+
+
+def apply_delta(template_dir, delta_archive, full_archive=None):
+    """
+    Update an extracted template in place from a delta archive.
+
+    The current tree must hash to the delta's base; every written file is
+    checked against its expected hash and the final tree must hash to the
+    target. On any mismatch the full archive is extracted when provided.
+
+    Args:
+        template_dir: Directory holding the previously extracted template
+        delta_archive: Delta zip path or URL
+        full_archive: Full archive path or URL used as fallback
+
+    Returns:
+        "delta" if the delta was applied, "full" if the fallback was used
+
+    Raises:
+        ValueError: if the delta cannot be applied and no fallback was given
+    """
+    try:
+        with _open_archive(delta_archive) as zipf:
+            delta = json.loads(zipf.read("delta.json").decode('utf-8'))
+            if delta.get("version") != DELTA_VERSION:
+                raise ValueError(f"Unsupported delta version: {delta.get('version')}")
+            current = _current_files(template_dir)
+            if tree_hash(current) != delta["base_tree_hash"]:
+                raise ValueError("template does not match the delta base")
+
+            payload = {}
+            for path in delta["added"] + delta["changed"]:
+                data = zipf.read(f"files/{path}")
+                if hashlib.sha256(data).hexdigest() != delta["files"][path]["sha256"]:
+                    raise ValueError(f"delta content for {path} failed integrity check")
+                payload[path] = data
+
+        # All inputs are verified before the first write
+        for path in delta["removed"]:
+            target = _safe_target(template_dir, path)
+            target.unlink(missing_ok=True)
+            # Drop directories the removal emptied, stopping at the template root
+            parent = target.parent
+            while parent != Path(template_dir) and parent.is_dir() and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+        for path, data in payload.items():
+            _write_file(_safe_target(template_dir, path), data, delta["files"][path].get("mode", 0o644))
+
+        if tree_hash(_current_files(template_dir)) != delta["target_tree_hash"]:
+            raise ValueError("updated template does not match the delta target")
+        return "delta"
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        if full_archive is None:
+            raise ValueError(f"Cannot apply delta: {e}") from e
+        print(f"⚠️  Delta not applicable ({e}); extracting full archive", file=sys.stderr)
+        extract_full(template_dir, full_archive)
+        return "full"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply template archive deltas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    apply_parser = subparsers.add_parser("apply", help="Update an extracted template in place")
+    apply_parser.add_argument("template_dir", help="Directory holding the extracted template")
+    apply_parser.add_argument("delta", help="Delta archive path or URL")
+    apply_parser.add_argument("--full-archive", help="Full archive path or URL to fall back to")
+
+    hash_parser = subparsers.add_parser("tree-hash", help="Print the tree hash of a template directory")
+    hash_parser.add_argument("template_dir", help="Template directory")
+    args = parser.parse_args()
+
+    if args.command == "tree-hash":
+        print(build_manifest(args.template_dir)["tree_hash"])
+        return
+
+    try:
+        mode = apply_delta(args.template_dir, args.delta, args.full_archive)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ Updated {args.template_dir} ({'delta' if mode == 'delta' else 'full archive'})")
+
+
+if __name__ == "__main__":
+    main()